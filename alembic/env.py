@@ -29,7 +29,9 @@ target_metadata = Base.metadata
 
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
-config.set_main_option("sqlalchemy.url", str(settings.db.url))
+# async_url — с драйвером asyncpg (онлайн-режим идёт через async engine);
+# % экранируется для configparser
+config.set_main_option("sqlalchemy.url", settings.db.async_url.replace("%", "%%"))
 # ... etc.
 
 
@@ -0,0 +1,85 @@
+"""payment events, outbox and user activity
+
+Revision ID: 5b2e7c41d9a3
+Revises:
+Create Date: 2026-10-18 21:30:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5b2e7c41d9a3"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# BIGSERIAL в Postgres, INTEGER PRIMARY KEY (autoincrement) в SQLite
+BigId = sa.BigInteger().with_variant(sa.Integer(), "sqlite")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "paymentevents",
+        sa.Column("id", BigId, primary_key=True),
+        sa.Column("payment_id", sa.String(64), nullable=False),
+        sa.Column("status", sa.String(32), nullable=False),
+        sa.Column("order_id", sa.String(64), nullable=False),
+        sa.Column("amount", sa.BigInteger(), nullable=False),
+        sa.Column("success", sa.Boolean(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.UniqueConstraint("payment_id", "status", name="uq_payment_event_status"),
+    )
+    op.create_index("ix_paymentevents_order_id", "paymentevents", ["order_id"])
+
+    op.create_table(
+        "outboxmessages",
+        sa.Column("id", BigId, primary_key=True),
+        sa.Column("kind", sa.String(64), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.Column(
+            "available_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_outbox_pending", "outboxmessages", ["sent_at", "available_at"])
+
+    op.create_table(
+        "useractivitys",
+        # id пользователя Telegram — без последовательности
+        sa.Column("user_id", sa.BigInteger(), primary_key=True, autoincrement=False),
+        sa.Column("last_seen", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("messages", sa.Integer(), nullable=False),
+        sa.Column("callbacks", sa.Integer(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("useractivitys")
+    op.drop_index("ix_outbox_pending", table_name="outboxmessages")
+    op.drop_table("outboxmessages")
+    op.drop_index("ix_paymentevents_order_id", table_name="paymentevents")
+    op.drop_table("paymentevents")
@@ -0,0 +1,98 @@
+"""
+Минимальный in-process ASGI-драйвер для бенчмарков: без сокетов и HTTP-клиента,
+чтобы в замерах оставалась только стоимость самого приложения.
+"""
+
+import asyncio, statistics, time
+from typing import Awaitable, Callable
+
+
+async def call(
+    app,
+    method: str = "GET",
+    path: str = "/",
+    body: bytes = b"",
+    headers: list[tuple[bytes, bytes]] | None = None,
+) -> int:
+    """Один HTTP-запрос в ASGI-приложение, возвращает статус ответа."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"bench.local"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            *(headers or []),
+        ],
+        "client": ("127.0.0.1", 40000),
+        "server": ("bench.local", 80),
+    }
+    sent = False
+    status = 0
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.sleep(3600)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+async def load(
+    request: Callable[[int], Awaitable[int]],
+    total: int,
+    concurrency: int,
+) -> dict:
+    """
+    Гоняет total запросов с заданным параллелизмом.
+    request(i) — корутина, выполняющая i-й запрос и возвращающая статус.
+    """
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            t0 = time.perf_counter()
+            status = await request(i)
+            latencies.append(time.perf_counter() - t0)
+            if status >= 500:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": total,
+        "errors": errors,
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+    }
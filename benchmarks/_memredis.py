@@ -0,0 +1,366 @@
+"""
+In-memory стенд Redis для бенчмарков: ровно те команды (и Lua-скрипты
+RedisLease), которые нужны Broadcaster и UpdateStreamConsumer, — чтобы
+проверки шли без сервера. Стримы — как в Redis 7: XAUTOCLAIM не отдаёт
+записи, вытесненные MAXLEN, а снимает их из pending и возвращает третьим
+элементом.
+Ответы — как у клиента с decode_responses=True. Вместо него можно передать
+настоящий redis.asyncio.Redis (флаг --redis у бенчмарков).
+"""
+
+import asyncio, time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from redis.exceptions import ResponseError
+
+from services.leader import _RELEASE, _RENEW
+
+
+def _s(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _id(value) -> tuple[int, int]:
+    ms, _, seq = _s(value).partition("-")
+    return int(ms), int(seq or 0)
+
+
+@dataclass
+class _Group:
+    last: tuple[int, int]
+    # id записи -> [консьюмер, время выдачи]
+    pending: dict = field(default_factory=dict)
+
+
+@dataclass
+class _Stream:
+    entries: dict = field(default_factory=dict)  # id -> поля, по порядку XADD
+    groups: dict = field(default_factory=dict)
+    last: tuple[int, int] = (0, 0)
+
+
+class MemoryRedis:
+    def __init__(self):
+        self.data: dict[str, object] = {}
+        self.expires: dict[str, float] = {}
+
+    # --- служебное ---
+
+    def _alive(self, key: str) -> bool:
+        deadline = self.expires.get(key)
+        if deadline is not None and time.monotonic() >= deadline:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def _get(self, key: str, factory):
+        if not self._alive(key):
+            self.data[key] = factory()
+        return self.data[key]
+
+    def _peek(self, key: str, default):
+        return self.data[key] if self._alive(key) else default
+
+    def _gc(self, key: str) -> None:
+        # Пустые коллекции в Redis не существуют
+        if key in self.data and not self.data[key] and self.data[key] != "":
+            del self.data[key]
+            self.expires.pop(key, None)
+
+    # --- ключи и строки ---
+
+    async def exists(self, *keys) -> int:
+        return sum(self._alive(_s(k)) for k in keys)
+
+    async def delete(self, *keys) -> int:
+        removed = 0
+        for key in map(_s, keys):
+            if self._alive(key):
+                removed += 1
+                del self.data[key]
+                self.expires.pop(key, None)
+        return removed
+
+    async def get(self, key) -> Optional[str]:
+        return self._peek(_s(key), None)
+
+    async def set(self, key, value, nx: bool = False, px: Optional[int] = None):
+        key = _s(key)
+        if nx and self._alive(key):
+            return None
+        self.data[key] = _s(value)
+        self.expires.pop(key, None)
+        if px:
+            self.expires[key] = time.monotonic() + px / 1000
+        return True
+
+    async def pexpire(self, key, ms: int) -> int:
+        key = _s(key)
+        if not self._alive(key):
+            return 0
+        self.expires[key] = time.monotonic() + ms / 1000
+        return 1
+
+    # --- списки ---
+
+    async def rpush(self, key, *values) -> int:
+        items = self._get(_s(key), list)
+        items.extend(_s(v) for v in values)
+        return len(items)
+
+    async def llen(self, key) -> int:
+        return len(self._peek(_s(key), []))
+
+    async def lmove(self, src, dst, wherefrom: str, whereto: str):
+        items = self._peek(_s(src), [])
+        if not items:
+            return None
+        value = items.pop(0 if wherefrom == "LEFT" else -1)
+        self._gc(_s(src))
+        target = self._get(_s(dst), list)
+        if whereto == "LEFT":
+            target.insert(0, value)
+        else:
+            target.append(value)
+        return value
+
+    async def lrem(self, key, count: int, value) -> int:
+        items = self._peek(_s(key), [])
+        value, removed = _s(value), 0
+        while value in items and (count == 0 or removed < abs(count)):
+            items.remove(value)
+            removed += 1
+        self._gc(_s(key))
+        return removed
+
+    # --- хэши и множества ---
+
+    async def hset(self, key, field=None, value=None, mapping=None) -> int:
+        fields = self._get(_s(key), dict)
+        updates = dict(mapping or {})
+        if field is not None:
+            updates[field] = value
+        added = sum(_s(f) not in fields for f in updates)
+        fields.update({_s(f): _s(v) for f, v in updates.items()})
+        return added
+
+    async def hsetnx(self, key, field, value) -> int:
+        fields = self._get(_s(key), dict)
+        if _s(field) in fields:
+            return 0
+        fields[_s(field)] = _s(value)
+        return 1
+
+    async def hget(self, key, field) -> Optional[str]:
+        return self._peek(_s(key), {}).get(_s(field))
+
+    async def hgetall(self, key) -> dict:
+        return dict(self._peek(_s(key), {}))
+
+    async def hincrby(self, key, field, amount: int = 1) -> int:
+        fields = self._get(_s(key), dict)
+        value = int(fields.get(_s(field), 0)) + amount
+        fields[_s(field)] = str(value)
+        return value
+
+    async def sadd(self, key, *members) -> int:
+        items = self._get(_s(key), set)
+        before = len(items)
+        items.update(map(_s, members))
+        return len(items) - before
+
+    async def srem(self, key, *members) -> int:
+        items = self._peek(_s(key), set())
+        before = len(items)
+        items.difference_update(map(_s, members))
+        self._gc(_s(key))
+        return before - len(items)
+
+    async def smembers(self, key) -> set:
+        return set(self._peek(_s(key), set()))
+
+    # --- упорядоченные множества ---
+
+    async def zadd(self, key, mapping: dict) -> int:
+        items = self._get(_s(key), dict)
+        added = sum(_s(m) not in items for m in mapping)
+        items.update({_s(m): float(score) for m, score in mapping.items()})
+        return added
+
+    async def zremrangebyscore(self, key, low, high) -> int:
+        items = self._peek(_s(key), {})
+        doomed = [m for m, score in items.items() if low <= score <= high]
+        for member in doomed:
+            del items[member]
+        self._gc(_s(key))
+        return len(doomed)
+
+    async def zcard(self, key) -> int:
+        return len(self._peek(_s(key), {}))
+
+    async def zrem(self, key, *members) -> int:
+        items = self._peek(_s(key), {})
+        removed = sum(items.pop(_s(m), None) is not None for m in members)
+        self._gc(_s(key))
+        return removed
+
+    # --- стримы ---
+
+    def _stream(self, key) -> _Stream:
+        stream = self._peek(_s(key), None)
+        if stream is None:
+            raise ResponseError("NOGROUP No such key or consumer group")
+        return stream
+
+    def _group(self, key, group) -> _Group:
+        found = self._stream(key).groups.get(_s(group))
+        if found is None:
+            raise ResponseError("NOGROUP No such key or consumer group")
+        return found
+
+    async def xadd(
+        self, key, fields: dict, maxlen: Optional[int] = None, approximate=True
+    ) -> str:
+        stream = self._get(_s(key), _Stream)
+        ms = int(time.time() * 1000)
+        entry = (ms, 0) if ms > stream.last[0] else (stream.last[0], stream.last[1] + 1)
+        stream.last = entry
+        stream.entries[entry] = {_s(k): _s(v) for k, v in fields.items()}
+        while maxlen is not None and len(stream.entries) > maxlen:
+            del stream.entries[next(iter(stream.entries))]
+        return f"{entry[0]}-{entry[1]}"
+
+    async def xlen(self, key) -> int:
+        stream = self._peek(_s(key), None)
+        return len(stream.entries) if stream else 0
+
+    async def xrange(self, key) -> list:
+        stream = self._peek(_s(key), None)
+        entries = stream.entries.items() if stream else ()
+        return [(f"{i[0]}-{i[1]}", dict(fields)) for i, fields in entries]
+
+    async def xgroup_create(self, key, group, id="$", mkstream=False) -> bool:
+        if mkstream:
+            stream = self._get(_s(key), _Stream)
+        else:
+            stream = self._stream(key)
+        if _s(group) in stream.groups:
+            raise ResponseError("BUSYGROUP Consumer Group name already exists")
+        last = stream.last if _s(id) == "$" else _id(id)
+        stream.groups[_s(group)] = _Group(last)
+        return True
+
+    async def xreadgroup(
+        self, group, consumer, streams: dict, count=None, block=None, noack=False
+    ) -> list:
+        deadline = time.monotonic() + (block or 0) / 1000
+        while True:
+            response = []
+            for key, start in streams.items():
+                if _s(start) != ">":
+                    raise NotImplementedError("only '>' is emulated by MemoryRedis")
+                found = self._group(key, group)
+                stream = self._stream(key)
+                fresh = [i for i in stream.entries if i > found.last][:count]
+                for entry in fresh:
+                    found.pending[entry] = [_s(consumer), time.monotonic()]
+                if fresh:
+                    found.last = fresh[-1]
+                    response.append(
+                        [
+                            _s(key),
+                            [
+                                (f"{i[0]}-{i[1]}", dict(stream.entries[i]))
+                                for i in fresh
+                            ],
+                        ]
+                    )
+            if response or block is None or time.monotonic() >= deadline:
+                return response
+            await asyncio.sleep(0.005)
+
+    async def xautoclaim(
+        self, key, group, consumer, min_idle_time, start_id="0-0", count=None
+    ) -> list:
+        found = self._group(key, group)
+        stream = self._stream(key)
+        now, limit = time.monotonic(), count or 100
+        candidates = sorted(i for i in found.pending if i >= _id(start_id))
+        claimed, deleted, scanned = [], [], 0
+        for entry in candidates:
+            if scanned >= limit:
+                return [f"{entry[0]}-{entry[1]}", claimed, deleted]
+            scanned += 1
+            if (now - found.pending[entry][1]) * 1000 < min_idle_time:
+                continue
+            if entry not in stream.entries:
+                del found.pending[entry]
+                deleted.append(f"{entry[0]}-{entry[1]}")
+                continue
+            found.pending[entry] = [_s(consumer), now]
+            claimed.append((f"{entry[0]}-{entry[1]}", dict(stream.entries[entry])))
+        return ["0-0", claimed, deleted]
+
+    async def xack(self, key, group, *ids) -> int:
+        found = self._group(key, group)
+        return sum(found.pending.pop(_id(i), None) is not None for i in ids)
+
+    async def xpending(self, key, group) -> dict:
+        return {"pending": len(self._group(key, group).pending)}
+
+    # --- скрипты и pipeline ---
+
+    def register_script(self, source: str):
+        scripts = {_RENEW: self._renew, _RELEASE: self._release}
+        if source not in scripts:
+            raise NotImplementedError("script is not emulated by MemoryRedis")
+        handler = scripts[source]
+
+        async def call(keys=(), args=()):
+            return handler(list(map(_s, keys)), list(args))
+
+        return call
+
+    def _renew(self, keys, args) -> int:
+        if self._peek(keys[0], None) != _s(args[0]):
+            return 0
+        self.expires[keys[0]] = time.monotonic() + int(args[1]) / 1000
+        return 1
+
+    def _release(self, keys, args) -> int:
+        if self._peek(keys[0], None) != _s(args[0]):
+            return 0
+        del self.data[keys[0]]
+        self.expires.pop(keys[0], None)
+        return 1
+
+    def pipeline(self, transaction: bool = True) -> "_Pipeline":
+        return _Pipeline(self)
+
+
+class _Pipeline:
+    """Команды копятся и выполняются подряд в execute — без await между ними."""
+
+    def __init__(self, redis: MemoryRedis):
+        self.redis = redis
+        self.calls: list = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name: str):
+        method = getattr(self.redis, name)
+
+        def queue(*args, **kwargs):
+            self.calls.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self) -> list:
+        calls, self.calls = self.calls, []
+        return [await method(*args, **kwargs) for method, args, kwargs in calls]
@@ -0,0 +1,133 @@
+"""
+Локальные заменители внешних систем для бенчмарков приложения:
+Bot API (сессия без сети), Postgres (файловая SQLite) и синтетические апдейты.
+Redis не нужен: FSM — MemoryStorage, дедупликация выключена.
+"""
+
+import asyncio, json, os, random, tempfile, time
+from collections import Counter
+from typing import Any
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.types import Chat, Message, User
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from core.models import Base
+
+BOT_USER = User(id=42, is_bot=True, first_name="Bench Bot", username="bench_bot")
+
+
+class FakeSession(BaseSession):
+    """
+    Сессия Bot API без сети: отвечает правдоподобными объектами и считает
+    вызовы по методам. latency — искусственная задержка ответа Telegram.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+
+    async def make_request(
+        self, bot: Bot, method: TelegramMethod[Any], timeout: int | None = None
+    ) -> Any:
+        name = type(method).__name__
+        self.calls[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        returning = method.__returning__
+        if returning is bool:
+            return True
+        if returning is User:
+            return BOT_USER
+        if returning is Message:
+            chat_id = getattr(method, "chat_id", 0)
+            return Message(
+                message_id=self.calls[name],
+                date=int(time.time()),
+                chat=Chat(
+                    id=chat_id if isinstance(chat_id, int) else 0, type="private"
+                ),
+                from_user=BOT_USER,
+                text=getattr(method, "text", None),
+            )
+        return None
+
+    async def stream_content(
+        self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True
+    ):
+        raise NotImplementedError
+        yield b""  # pragma: no cover
+
+    async def close(self) -> None:
+        pass
+
+
+async def sqlite_session_factory(name: str = "bench") -> async_sessionmaker:
+    """Файловая SQLite со всеми таблицами проекта вместо Postgres."""
+    path = os.path.join(tempfile.mkdtemp(), f"{name}.sqlite3")
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{path}", connect_args={"timeout": 30}
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+class UpdateFactory:
+    """
+    Синтетические апдейты: сообщения (команды и текст) и callback-запросы
+    от users разных пользователей; уникальный update_id на каждый вызов.
+    """
+
+    def __init__(self, users: int = 1000, callback_share: float = 0.3, seed: int = 1):
+        self.users = users
+        self.callback_share = callback_share
+        self.random = random.Random(seed)
+        self.update_id = 100_000_000
+        self.message_id = 0
+
+    def _user(self, user_id: int) -> dict:
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+
+    def _message(self, user_id: int, text: str) -> dict:
+        self.message_id += 1
+        message = {
+            "message_id": self.message_id,
+            "from": self._user(user_id),
+            "chat": {"id": user_id, "type": "private", "first_name": f"User{user_id}"},
+            "date": 1724995200,
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [
+                {"offset": 0, "length": len(text.split()[0]), "type": "bot_command"}
+            ]
+        return message
+
+    def __call__(self) -> bytes:
+        self.update_id += 1
+        user_id = self.random.randint(1, self.users)
+        if self.random.random() < self.callback_share:
+            update = {
+                "update_id": self.update_id,
+                "callback_query": {
+                    "id": str(self.update_id),
+                    "from": self._user(user_id),
+                    "chat_instance": str(user_id),
+                    "message": {
+                        **self._message(user_id, "menu"),
+                        "from": BOT_USER.model_dump(exclude_none=True),
+                    },
+                    "data": f"item:{self.random.randint(1, 50)}",
+                },
+            }
+        else:
+            text = self.random.choice(("/start", "/help", "привет", "каталог"))
+            update = {
+                "update_id": self.update_id,
+                "message": self._message(user_id, text),
+            }
+        return json.dumps(update, ensure_ascii=False).encode()
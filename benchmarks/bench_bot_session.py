@@ -0,0 +1,95 @@
+"""
+Исходящие вызовы Bot API через utils.bot_session против фейкового сервера
+(fake_telegram.py) с подмешанными flood-wait и 5xx: сколько вызовов дошли,
+сколько было повторов, латентность и число TCP-соединений.
+Для сравнения — сессия aiogram по умолчанию (без повторов и метрик).
+
+Запуск:
+  python benchmarks/bench_bot_session.py [--calls 2000 --concurrency 50 --flood 0.02 --errors 0.02]
+"""
+
+import argparse, asyncio, time
+
+import _env  # noqa: F401
+import _asgi
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from core.config import settings
+from fake_telegram import FakeTelegram
+from utils.bot_session import API_RETRIES, build_session
+
+
+async def run(name: str, session, server: FakeTelegram, args) -> None:
+    bot = Bot(token=settings.bot.token, session=session)
+    server.calls.clear()
+    server.connections.clear()
+    latencies: list[float] = []
+    failed = 0
+
+    async def call(i: int) -> None:
+        nonlocal failed
+        t0 = time.perf_counter()
+        try:
+            await bot.send_message(i % 1000 + 1, f"message {i}")
+        except Exception:
+            failed += 1
+        latencies.append(time.perf_counter() - t0)
+
+    queue = iter(range(args.calls))
+
+    async def worker():
+        for i in queue:
+            await call(i)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    await bot.session.close()
+    retries = sum(child.value for child in API_RETRIES._children.values())
+    print(
+        f"{name:8} calls {args.calls}  failed {failed}  rps {args.calls / elapsed:7.1f}  "
+        f"p50 {_asgi.percentile(latencies, 50) * 1000:6.1f} ms  "
+        f"p99 {_asgi.percentile(latencies, 99) * 1000:7.1f} ms  "
+        f"http {sum(v for k, v in server.calls.items() if not k[0].isdigit())}  "
+        f"429 {server.calls['429']}  5xx {server.calls['5xx']}  "
+        f"retries {int(retries)}  tcp {len(server.connections)}"
+    )
+    for child in API_RETRIES._children.values():
+        child.value = 0
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=5.0, help="ms")
+    parser.add_argument("--flood", type=float, default=0.02)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--errors", type=float, default=0.02)
+    args = parser.parse_args()
+
+    server = await FakeTelegram(
+        port=18081,
+        latency=args.latency / 1000,
+        flood=args.flood,
+        retry_after=args.retry_after,
+        errors=args.errors,
+    ).start()
+    cfg = settings.bot.model_copy(update={"api_server": server.url})
+    try:
+        await run(
+            "default",
+            AiohttpSession(api=TelegramAPIServer.from_base(server.url)),
+            server,
+            args,
+        )
+        await run("tuned", build_session(cfg), server, args)
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
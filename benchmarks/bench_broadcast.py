@@ -0,0 +1,208 @@
+"""
+Рассылка services.broadcast.Broadcaster против фейкового Bot API
+(fake_telegram.py) с подмешанными flood-wait (429) и 5xx. Проверяет по
+журналу запросов сервера:
+  rates    — глобальный лимит и лимит на чат, пауза после RetryAfter,
+             каждый получатель ровно столько раз, сколько он в списке;
+  replicas — две реплики запускают одну рассылку: ведёт одна (аренда);
+  handoff  — штатная остановка посреди рассылки и продолжение на другой
+             реплике: без дублей;
+  crash    — владелец умер с непустым inflight: новая реплика ждёт истечения
+             аренды, затем доставляет оставшееся ровно по разу.
+
+Redis — in-memory стенд (_memredis.py) или настоящий (--redis URL, база
+будет очищена). Запуск:
+  python benchmarks/bench_broadcast.py [--chats 60 --repeat 3 --flood 0.03]
+"""
+
+import argparse, asyncio, time
+from collections import Counter
+
+import _env  # noqa: F401
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from _memredis import MemoryRedis
+from core.config import settings
+from fake_telegram import FakeTelegram
+from services.broadcast import Broadcaster
+
+PAYLOAD = {"text": "broadcast"}
+
+
+def max_in_window(times: list[float], window: float) -> int:
+    times = sorted(times)
+    best, lo = 0, 0
+    for hi, t in enumerate(times):
+        while t - times[lo] >= window:
+            lo += 1
+        best = max(best, hi - lo + 1)
+    return best
+
+
+def make(bot: Bot, redis, args, **options) -> Broadcaster:
+    options = {
+        "global_rate": args.global_rate,
+        "per_chat_rate": args.per_chat_rate,
+        "concurrency": args.concurrency,
+        "progress_interval": 3600,
+        **options,
+    }
+    return Broadcaster(bot, redis, **options)
+
+
+def delivered(server: FakeTelegram) -> Counter:
+    return Counter(chat_id for _, chat_id in server.sent)
+
+
+async def check_rates(bot, redis, server, args) -> None:
+    chats = list(range(1, args.chats + 1))
+    broadcaster = make(bot, redis, args)
+    # Повторы одного чата подряд: отправители берут их одновременно,
+    # и разводит их только лимит на чат
+    recipients = [chat_id for chat_id in chats for _ in range(args.repeat)]
+    await broadcaster.create("rates", recipients, PAYLOAD)
+    started = time.monotonic()
+    progress = await broadcaster.run("rates")
+    elapsed = time.monotonic() - started
+
+    times = [t for t, _ in server.sent]
+    rate = args.global_rate
+    # Token bucket: за окно W не больше capacity + rate * W (capacity = rate)
+    for window in (1.0, 5.0):
+        observed = max_in_window(times, window)
+        assert observed <= rate + rate * window + 1, (window, observed)
+
+    per_chat: dict[int, list[float]] = {}
+    for t, chat_id in server.sent:
+        per_chat.setdefault(chat_id, []).append(t)
+    min_gap = min(
+        (b - a for ts in per_chat.values() for a, b in zip(sorted(ts), sorted(ts)[1:])),
+        default=float("inf"),
+    )
+    assert min_gap >= 1 / args.per_chat_rate - 0.05, min_gap
+
+    # После 429 с retry_after=r новых отправок нет r секунд (с допуском на
+    # ответы, которые уже были в пути)
+    slack = args.latency / 1000 * 2 + 0.05
+    for flood_at, retry_after in server.floods:
+        early = [t for t in times if flood_at + slack <= t < flood_at + retry_after]
+        assert not early, (flood_at, early[:3])
+
+    counts = delivered(server)
+    assert max(counts.values()) <= args.repeat, "duplicate deliveries"
+    assert progress["sent"] == len(server.sent)
+    assert progress["sent"] + progress["failed"] == len(chats) * args.repeat
+    print(
+        f"rates     sent {progress['sent']:4}  failed {progress['failed']:3}  "
+        f"{elapsed:5.1f}s  max/1s {max_in_window(times, 1.0):3} "
+        f"(limit {rate:g})  min chat gap {min_gap:5.2f}s "
+        f"(limit {1 / args.per_chat_rate:.2f}s)  429 {len(server.floods)}  "
+        f"5xx {server.calls['5xx']}"
+    )
+
+
+async def check_replicas(bot, redis, server, args) -> None:
+    chats = list(range(1, args.chats + 1))
+    first, second = make(bot, redis, args), make(bot, redis, args)
+    await first.create("replicas", chats, PAYLOAD)
+    results = await asyncio.gather(first.run("replicas"), second.run("replicas"))
+    assert sum(result is not None for result in results) == 1, results
+    counts = delivered(server)
+    assert max(counts.values()) == 1, "duplicate deliveries"
+    print(f"replicas  runs {sum(r is not None for r in results)}  sent {len(counts)}")
+
+
+async def check_handoff(bot, redis, server, args) -> None:
+    chats = list(range(1, args.chats + 1))
+    first, second = make(bot, redis, args), make(bot, redis, args)
+    await first.create("handoff", chats, PAYLOAD)
+    first.start("handoff")
+    while len(server.sent) < len(chats) // 3:
+        await asyncio.sleep(0.01)
+    await first.stop()
+    stopped_at = len(server.sent)
+    progress = await second.run("handoff")
+    counts = delivered(server)
+    assert max(counts.values()) == 1, "duplicate deliveries"
+    assert progress["sent"] == len(server.sent)
+    assert progress["sent"] + progress["failed"] == len(chats)
+    print(
+        f"handoff   sent {progress['sent']:4} ({stopped_at} before stop)  "
+        f"failed {progress['failed']:3} (in flight at stop)"
+    )
+
+
+async def check_crash(bot, redis, server, args) -> None:
+    chats = list(range(1, args.chats + 1))
+    broadcaster = make(bot, redis, args, lease_ttl=args.lease_ttl)
+    await broadcaster.create("crash", chats, PAYLOAD)
+    # Умерший владелец: аренда ещё жива, часть чатов осталась «в полёте»
+    lost = chats[:5]
+    for chat_id in lost:
+        await redis.lmove("bc:crash:pending", "bc:crash:inflight", "LEFT", "RIGHT")
+    await redis.set("bc:crash:lease", "dead-owner", px=int(args.lease_ttl * 1000))
+
+    assert await broadcaster.run("crash") is None, "ran while the lease was held"
+    assert await redis.llen("bc:crash:inflight") == len(lost), "inflight touched"
+    await asyncio.sleep(args.lease_ttl)
+    progress = await broadcaster.run("crash")
+    counts = delivered(server)
+    assert all(counts[chat_id] == 1 for chat_id in chats), "lost or duplicated"
+    assert progress["sent"] + progress["failed"] == len(chats)
+    print(
+        f"crash     sent {progress['sent']:4}  recovered in flight {len(lost)} "
+        f"after lease expiry ({args.lease_ttl:g}s)"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--global-rate", type=float, default=40.0)
+    parser.add_argument("--per-chat-rate", type=float, default=2.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=5.0, help="ms")
+    parser.add_argument("--flood", type=float, default=0.03)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--errors", type=float, default=0.02)
+    parser.add_argument("--lease-ttl", type=float, default=1.0)
+    parser.add_argument("--redis", default=None, help="redis:// URL вместо стенда")
+    args = parser.parse_args()
+
+    if args.redis:
+        from redis.asyncio import Redis
+
+        redis = Redis.from_url(args.redis, decode_responses=True)
+    else:
+        redis = MemoryRedis()
+
+    server = await FakeTelegram(
+        port=18082,
+        latency=args.latency / 1000,
+        flood=args.flood,
+        retry_after=args.retry_after,
+        errors=args.errors,
+    ).start()
+    bot = Bot(
+        token=settings.bot.token,
+        session=AiohttpSession(api=TelegramAPIServer.from_base(server.url)),
+    )
+    try:
+        for check in (check_rates, check_replicas, check_handoff, check_crash):
+            if args.redis:
+                await redis.flushdb()
+            server.sent.clear()
+            server.floods.clear()
+            server.calls.clear()
+            await check(bot, redis, server, args)
+    finally:
+        await bot.session.close()
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""
+Round trip'ы в Redis на один шаг диалога (get_state + get_data +
+update_data + set_state): RedisStorage против CachedRedisStorage.
+Redis заменён in-memory стендом, который считает сетевые вызовы
+(pipeline.execute — один вызов).
+
+Запуск: python benchmarks/bench_fsm_storage.py [--updates 1000]
+"""
+
+import argparse, asyncio
+
+import _env  # noqa: F401
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+
+from core.storage.fsm import CachedRedisStorage
+
+
+class CountingRedis:
+    def __init__(self):
+        self.data: dict[str, str] = {}
+        self.roundtrips = 0
+
+    async def get(self, key):
+        self.roundtrips += 1
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.roundtrips += 1
+        self.data[key] = value
+
+    async def delete(self, *keys):
+        self.roundtrips += 1
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def publish(self, channel, message):
+        self.roundtrips += 1
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+
+class _Pipeline:
+    def __init__(self, redis: CountingRedis):
+        self.redis = redis
+        self.ops = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def get(self, key):
+        self.ops.append(lambda: self.redis.data.get(key))
+
+    def set(self, key, value, ex=None):
+        self.ops.append(lambda: self.redis.data.__setitem__(key, value))
+
+    def delete(self, key):
+        self.ops.append(lambda: self.redis.data.pop(key, None))
+
+    def publish(self, channel, message):
+        self.ops.append(lambda: 0)
+
+    async def execute(self):
+        self.redis.roundtrips += 1
+        return [op() for op in self.ops]
+
+
+async def dialog_step(storage, key: StorageKey, step: int) -> None:
+    fsm = FSMContext(storage=storage, key=key)
+    await fsm.get_state()
+    data = await fsm.get_data()
+    await fsm.update_data(step=step, answers=[*data.get("answers", []), step])
+    await fsm.set_state(f"Form:step{step % 5}")
+
+
+async def run(name: str, storage, redis: CountingRedis, updates: int) -> None:
+    for i in range(updates):
+        key = StorageKey(bot_id=1, chat_id=i % 50, user_id=i % 50)
+        await dialog_step(storage, key, i)
+    print(f"{name:<8} {redis.roundtrips / updates:5.2f} redis round trips/update")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=1000)
+    args = parser.parse_args()
+
+    redis = CountingRedis()
+    await run("redis", RedisStorage(redis=redis), redis, args.updates)
+
+    redis = CountingRedis()
+    # Почти нулевой TTL: каждый апдейт начинает с холодного кэша, как в проде,
+    # где между сообщениями пользователя проходят секунды
+    cached = CachedRedisStorage(RedisStorage(redis=redis), ttl=0.0001)
+    await run("cached", cached, redis, args.updates)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
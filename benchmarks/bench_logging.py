@@ -0,0 +1,51 @@
+"""
+Накладные расходы на одно лог-событие в потоке event loop:
+default (callsite + синхронная запись) против production (без callsite,
+запись через фоновый поток). Каждый режим — в отдельном процессе, вывод
+уходит в /dev/null.
+
+Запуск: python benchmarks/bench_logging.py [--events 50000]
+"""
+
+import argparse, os, subprocess, sys, time
+
+import _env  # noqa: F401
+
+
+def measure(mode: str, events: int) -> None:
+    sys.stdout = open(os.devnull, "w")
+    from utils.logger import setup_logging, get_logger, stop_logging
+
+    setup_logging("bench", env="prod", production=(mode == "production"))
+    log = get_logger("aiogram").bind(
+        request_id="abcdef123456", chat_id=111111111, user_id=111111111
+    )
+    for _ in range(1000):  # прогрев
+        log.info("handler_done", duration_ms=1.23, update_type="message")
+
+    start = time.perf_counter()
+    for _ in range(events):
+        log.info("handler_done", duration_ms=1.23, update_type="message")
+    elapsed = time.perf_counter() - start
+    stop_logging()
+    sys.__stdout__.write(f"{mode:<11} {elapsed / events * 1e6:8.2f} us/event\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--mode", choices=("default", "production"))
+    args = parser.parse_args()
+
+    if args.mode:
+        measure(args.mode, args.events)
+        return
+    for mode in ("default", "production"):
+        subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--events", str(args.events)],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Почта через services.mailer против «наивной» отправки smtplib прямо в
+хендлере (новое соединение на письмо, event loop стоит на время отправки).
+Сервер — fake_smtp.py в отдельном потоке со своей задержкой ответа.
+
+Метрики: сколько хендлер ждёт отправки, максимальная задержка event loop,
+время доставки всех писем и число SMTP-соединений.
+
+Запуск:
+  python benchmarks/bench_mailer.py [--mails 300 --latency 5 --errors 0.02]
+"""
+
+import argparse, asyncio, os, smtplib, sys, threading, time
+
+import _env  # noqa: F401
+
+# Логи повторов не мешают таблице результатов
+_stdout = sys.stdout
+sys.stdout = open(os.devnull, "w")
+
+import _asgi
+
+from core.config import settings
+from fake_smtp import FakeSMTP
+from services.mailer import Mailer
+
+
+def serve_in_thread(server: FakeSMTP) -> None:
+    # Наивный вариант блокирует loop — сервер не может жить в нём же
+    ready = threading.Event()
+
+    def run():
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(server.start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+
+
+async def lag_probe(stop: asyncio.Event, lags: list[float]) -> None:
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(0.005)
+        lags.append(time.perf_counter() - t0 - 0.005)
+
+
+def naive_send(cfg, mailer: Mailer, i: int) -> None:
+    with smtplib.SMTP(cfg.host, cfg.port, timeout=cfg.timeout) as smtp:
+        smtp.login(cfg.name, cfg.pwd)
+        smtp.send_message(mailer.build(f"user{i}@example.com", f"mail {i}", "hello"))
+
+
+async def run(name: str, server: FakeSMTP, cfg, args) -> None:
+    server.calls.clear()
+    server.messages.clear()
+    mailer = Mailer(cfg)
+    handler_times: list[float] = []
+    lags: list[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(lag_probe(stop, lags))
+    await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    if name == "naive":
+        for i in range(args.mails):
+            t0 = time.perf_counter()
+            try:
+                naive_send(cfg, mailer, i)
+            except smtplib.SMTPException:
+                pass  # без повторов письмо просто теряется
+            handler_times.append(time.perf_counter() - t0)
+            await asyncio.sleep(0)
+    else:
+        mailer.start()
+        for i in range(args.mails):
+            t0 = time.perf_counter()
+            await mailer.send(f"user{i}@example.com", f"mail {i}", "hello")
+            handler_times.append(time.perf_counter() - t0)
+        await mailer.stop(timeout=120)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    print(
+        f"{name:7} mails {args.mails}  delivered {len(server.messages)}  "
+        f"handler p50 {_asgi.percentile(handler_times, 50) * 1000:6.2f} ms  "
+        f"p99 {_asgi.percentile(handler_times, 99) * 1000:6.2f} ms  "
+        f"loop lag p99 {_asgi.percentile(lags, 99) * 1000:6.1f} ms  max {max(lags, default=0) * 1000:6.1f} ms  "
+        f"total {elapsed:5.2f} s  smtp connections {server.calls['connections']}  "
+        f"451 {server.calls['451']}",
+        file=_stdout,
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mails", type=int, default=300)
+    parser.add_argument(
+        "--latency", type=float, default=5.0, help="ms на ответ сервера"
+    )
+    parser.add_argument("--errors", type=float, default=0.02)
+    parser.add_argument("--pool", type=int, default=2)
+    args = parser.parse_args()
+
+    server = FakeSMTP(port=18025, latency=args.latency / 1000, errors=args.errors)
+    serve_in_thread(server)
+    cfg = settings.email.model_copy(
+        update={
+            "host": server.host,
+            "port": server.port,
+            "use_ssl": False,
+            "pool_size": args.pool,
+            "retry_delay": 0.05,
+        }
+    )
+    await run("naive", server, cfg, args)
+    await run("mailer", server, cfg, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""
+Нагрузочный прогон /payments/callback: пачки дублирующихся уведомлений
+(как при агрессивных ретраях провайдера) против локальной SQLite вместо
+Postgres. Проверяет, что на каждый PaymentId+Status ровно одна запись
+и одно сообщение в outbox, и печатает rps/латентность.
+
+Нужен aiosqlite. Запуск:
+  python benchmarks/bench_payments.py [--payments 500 --duplicates 5 --concurrency 16]
+"""
+
+import argparse, asyncio, json, os, random, tempfile
+
+import _env  # noqa: F401
+import _asgi
+
+from fastapi import FastAPI
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from core.config import settings
+from core.models import Base, OutboxMessage, PaymentEvent
+from core.storage import db_helper as db_module
+from services.payments import tinkoff_token
+from web.routes.payments import router as payments_router
+
+
+def notification(payment_id: int, status: str) -> bytes:
+    payload = {
+        "TerminalKey": settings.pay.tinkoff_terminal_key,
+        "OrderId": f"{100000 + payment_id}-{payment_id}",
+        "Success": status == "CONFIRMED",
+        "Status": status,
+        "PaymentId": payment_id,
+        "ErrorCode": "0",
+        "Amount": 99000,
+        "Pan": "430000******0777",
+    }
+    payload["Token"] = tinkoff_token(payload, settings.pay.tinkoff_secret)
+    return json.dumps(payload).encode()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--payments", type=int, default=500)
+    parser.add_argument("--duplicates", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    # Файловая БД: у :memory: одно соединение на всех, конкуренции не будет
+    db_path = os.path.join(tempfile.mkdtemp(), "payments.sqlite3")
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{db_path}", connect_args={"timeout": 30}
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    db_module.db_helper.session_factory = async_sessionmaker(
+        engine, expire_on_commit=False
+    )
+
+    app = FastAPI()
+    app.include_router(payments_router)
+
+    bodies = [
+        notification(pid, status)
+        for pid in range(1, args.payments + 1)
+        for status in ("AUTHORIZED", "CONFIRMED")
+    ]
+    burst = [b for b in bodies for _ in range(args.duplicates)]
+    random.shuffle(burst)
+
+    result = await _asgi.load(
+        lambda i: _asgi.call(app, "POST", "/payments/callback", burst[i]),
+        len(burst),
+        args.concurrency,
+    )
+    print("callbacks ", result)
+
+    async with db_module.db_helper.session_factory() as session:
+        events = await session.scalar(select(func.count()).select_from(PaymentEvent))
+        outbox = await session.scalar(select(func.count()).select_from(OutboxMessage))
+    print(f"unique    {len(bodies)}  events {events}  outbox {outbox}")
+    assert events == outbox == len(bodies), "idempotency violated"
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
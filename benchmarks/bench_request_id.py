@@ -0,0 +1,83 @@
+"""
+RequestIDMiddleware: BaseHTTPMiddleware (старый вариант) против чистого ASGI.
+Одна и та же ручка и одинаковая нагрузка; логи рендерятся, но не пишутся.
+
+Запуск: python benchmarks/bench_request_id.py [--requests 20000 --concurrency 64]
+"""
+
+import argparse, asyncio, time, uuid
+
+import _env  # noqa: F401
+import _asgi
+
+import structlog
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from middlewares.logging_ctx import request_id_var
+
+# Логгер RequestIDMiddleware: варианты отличаются только устройством
+# middleware, а не логированием
+from middlewares.request_id import RequestIDMiddleware, logger
+
+
+class LegacyRequestIDMiddleware(BaseHTTPMiddleware):
+    """Копия реализации до перехода на чистый ASGI."""
+
+    async def dispatch(self, request, call_next):
+        rid = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:12]
+        request_id_var.set(rid)
+        start = time.perf_counter()
+        resp = await call_next(request)
+        dur_ms = round((time.perf_counter() - start) * 1000, 2)
+        resp.headers["X-Request-ID"] = rid
+        logger.info(
+            "http_access",
+            method=request.method,
+            path=request.url.path,
+            status=resp.status_code,
+            duration_ms=dur_ms,
+            request_id=rid,
+        )
+        return resp
+
+
+async def webhook(request):
+    await request.body()
+    return JSONResponse({"ok": True})
+
+
+def build_app(middleware_cls) -> Starlette:
+    app = Starlette(routes=[Route("/telegram/webhook", webhook, methods=["POST"])])
+    app.add_middleware(middleware_cls)
+    return app
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    structlog.configure(
+        processors=[structlog.processors.JSONRenderer()],
+        logger_factory=structlog.ReturnLoggerFactory(),
+        cache_logger_on_first_use=True,
+    )
+    body = _env.load_updates()[0]
+
+    for name, cls in (
+        ("base_http", LegacyRequestIDMiddleware),
+        ("pure_asgi", RequestIDMiddleware),
+    ):
+        app = build_app(cls)
+        request = lambda i: _asgi.call(app, "POST", "/telegram/webhook", body)
+        await _asgi.load(request, 500, args.concurrency)  # прогрев
+        result = await _asgi.load(request, args.requests, args.concurrency)
+        print(f"{name:<10} {result}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
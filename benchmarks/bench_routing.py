@@ -0,0 +1,151 @@
+"""
+Стоимость маршрутизации апдейта в зависимости от числа хендлеров:
+обычный перебор фильтров aiogram против индекса routers/index.py.
+
+На каждый размер — N команд (Command) и N callback-хендлеров (половина на
+CallbackData, половина F.data.startswith + флаг callback_prefix), разложенных
+по роутерам по 50, плюс catch-all F.text в конце. Апдейты адресованы
+случайным хендлерам; заодно проверяется, что оба варианта выбирают одни и
+те же хендлеры.
+
+Запуск:
+  python benchmarks/bench_routing.py [--sizes 10 100 1000 --updates 5000]
+"""
+
+import argparse, asyncio, os, random, sys, time
+from collections import Counter
+
+import _env  # noqa: F401
+
+_stdout = sys.stdout
+sys.stdout = open(os.devnull, "w")
+
+import _standins
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.filters import Command
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import Update
+
+from routers.index import install_fast_routing
+
+PER_ROUTER = 50
+
+
+def out(*args) -> None:
+    print(*args, file=_stdout, flush=True)
+
+
+def build_dp(size: int, hits: Counter, indexed: bool) -> Dispatcher:
+    dp = Dispatcher()
+    routers = [Router(name=f"r{i}") for i in range(max(1, size // PER_ROUTER))]
+
+    def handler(tag: str):
+        async def callback(event) -> None:
+            hits[tag] += 1
+
+        return callback
+
+    for i in range(size):
+        router = routers[i % len(routers)]
+        router.message.register(handler(f"cmd{i}"), Command(f"cmd{i}"))
+        if i % 2:
+            cb = type(
+                f"Item{i}",
+                (CallbackData,),
+                {"__annotations__": {"id": int}},
+                prefix=f"it{i}",
+            )
+            router.callback_query.register(handler(f"cb{i}"), cb.filter())
+        else:
+            router.callback_query.register(
+                handler(f"cb{i}"),
+                F.data.startswith(f"menu{i}:"),
+                flags={"callback_prefix": f"menu{i}:"},
+            )
+    tail = Router(name="tail")
+    tail.message.register(handler("text"), F.text)
+    dp.include_routers(*routers, tail)
+    if indexed:
+        install_fast_routing(dp)
+    return dp
+
+
+def make_updates(size: int, count: int, bot: Bot, seed: int = 1) -> list[Update]:
+    rnd = random.Random(seed)
+    updates = []
+    for n in range(count):
+        i = rnd.randrange(size)
+        user = {"id": 1000 + n % 100, "is_bot": False, "first_name": "U"}
+        chat = {"id": user["id"], "type": "private"}
+        kind = rnd.random()
+        if kind < 0.45:
+            text = f"/cmd{i} arg"
+            body = {
+                "message": {
+                    "message_id": n,
+                    "date": 0,
+                    "chat": chat,
+                    "from": user,
+                    "text": text,
+                }
+            }
+        elif kind < 0.9:
+            data = f"it{i}:{n}" if i % 2 else f"menu{i}:{n}"
+            body = {
+                "callback_query": {
+                    "id": str(n),
+                    "from": user,
+                    "chat_instance": "1",
+                    "data": data,
+                }
+            }
+        else:
+            body = {
+                "message": {
+                    "message_id": n,
+                    "date": 0,
+                    "chat": chat,
+                    "from": user,
+                    "text": "hello",
+                }
+            }
+        updates.append(
+            Update.model_validate({"update_id": n, **body}, context={"bot": bot})
+        )
+    return updates
+
+
+async def measure(dp: Dispatcher, bot: Bot, updates: list[Update]) -> float:
+    for update in updates[:200]:  # прогрев: индекс, кэш bot.me()
+        await dp.feed_update(bot, update)
+    started = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - started) / len(updates) * 1e6
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--updates", type=int, default=5000)
+    args = parser.parse_args()
+
+    bot = Bot(token="123456:" + "x" * 35, session=_standins.FakeSession())
+    out(f"{'handlers':>9} {'aiogram µs/upd':>15} {'indexed µs/upd':>15} {'speedup':>8}")
+    for size in args.sizes:
+        updates = make_updates(size, args.updates, bot)
+        results, hits = [], []
+        for indexed in (False, True):
+            counter = Counter()
+            dp = build_dp(size, counter, indexed)
+            results.append(await measure(dp, bot, updates))
+            hits.append(counter)
+        assert hits[0] == hits[1], "indexed routing picked different handlers"
+        out(
+            f"{size:>9} {results[0]:>15.1f} {results[1]:>15.1f} {results[0] / results[1]:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
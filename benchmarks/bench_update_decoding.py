@@ -0,0 +1,59 @@
+"""
+Сравнение путей декодирования апдейта вебхука:
+  legacy   — json.loads (аналог request.json()) + Update.model_validate
+  pydantic — Update.model_validate_json прямо из байтов
+  orjson   — orjson.loads + Update.model_validate (если установлен)
+
+Запуск: python benchmarks/bench_update_decoding.py [--rounds 2000]
+"""
+
+import argparse, json, os, time
+
+import _env  # noqa: F401
+
+from aiogram import Bot
+from aiogram.types import Update
+
+from web.decoding import decode_update, orjson
+
+
+def legacy(body: bytes, bot: Bot) -> Update:
+    return Update.model_validate(json.loads(body), context={"bot": bot})
+
+
+def run(name: str, fn, bodies: list[bytes], bot: Bot, rounds: int) -> None:
+    for body in bodies:  # прогрев
+        fn(body, bot)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for body in bodies:
+            fn(body, bot)
+    total = time.perf_counter() - start
+    per_update_us = total / (rounds * len(bodies)) * 1e6
+    print(f"{name:<10} {per_update_us:8.2f} us/update")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    bodies = _env.load_updates()
+    bot = Bot(token=os.environ["BOT_CONFIG__BOT__TOKEN"])
+
+    run("legacy", legacy, bodies, bot, args.rounds)
+    run("pydantic", lambda b, bot: decode_update(b, bot), bodies, bot, args.rounds)
+    if orjson is not None:
+        run(
+            "orjson",
+            lambda b, bot: decode_update(b, bot, "orjson"),
+            bodies,
+            bot,
+            args.rounds,
+        )
+    else:
+        print("orjson      не установлен, пропускаем")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Режим ingest=stream (services/update_stream.py): несколько
+UpdateStreamConsumer в одном процессе над общим Redis, апдейты пишет
+UpdateStreamProducer. По журналу хендлера проверяется:
+  order   — два воркера, непрерывный поток: апдейты каждого чата обработаны
+            ровно по разу, по порядку и никогда не параллельно;
+  handoff — второй воркер подключается посреди потока, затем первый штатно
+            останавливается: партиции переезжают без дублей и нахлёстов;
+  reclaim — владелец партиции умер, не подтвердив прочитанное: новый
+            владелец ждёт истечения аренды и забирает pending-записи
+            XAUTOCLAIM раньше новых;
+  dead    — апдейт, на котором хендлер упал, уходит в {prefix}:dead,
+            подтверждается и не блокирует следующие апдейты чата.
+
+Redis — in-memory стенд (_memredis.py) или настоящий (--redis URL, база
+будет очищена). Запуск:
+  python benchmarks/bench_update_stream.py [--chats 40 --updates 400]
+"""
+
+import argparse, asyncio, json, os, random, sys, time
+from dataclasses import dataclass
+
+import _env  # noqa: F401
+
+# Логи воркеров (захват партиций, упавший хендлер) не нужны в отчёте
+_stdout = sys.stdout
+sys.stdout = open(os.devnull, "w")
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message, Update
+
+from _memredis import MemoryRedis
+from core.config import IngestConfig, settings
+from services.update_stream import UpdateStreamConsumer, UpdateStreamProducer
+
+
+def out(*args) -> None:
+    print(*args, file=_stdout, flush=True)
+
+
+@dataclass(slots=True)
+class Record:
+    chat_id: int
+    seq: int
+    worker: str
+    started: float
+    finished: float
+
+
+def build_dp(worker: str, journal: list[Record], latency: float) -> Dispatcher:
+    dp = Dispatcher()
+
+    @dp.message()
+    async def handler(message: Message) -> None:
+        started = time.monotonic()
+        if message.text.endswith("boom"):
+            raise RuntimeError("boom")
+        await asyncio.sleep(random.uniform(0, latency))
+        journal.append(
+            Record(
+                message.chat.id,
+                int(message.text),
+                worker,
+                started,
+                time.monotonic(),
+            )
+        )
+
+    return dp
+
+
+class Feed:
+    """Апдейты по чатам с номером по порядку внутри чата."""
+
+    def __init__(self, producer: UpdateStreamProducer):
+        self.producer = producer
+        self.update_id = 0
+        self.sent: dict[int, int] = {}
+
+    async def publish(self, chat_id: int, boom: bool = False) -> None:
+        self.update_id += 1
+        seq = self.sent.get(chat_id, 0)
+        if not boom:
+            self.sent[chat_id] = seq + 1
+        raw = {
+            "update_id": self.update_id,
+            "message": {
+                "message_id": self.update_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": "U"},
+                "text": f"{seq} boom" if boom else str(seq),
+            },
+        }
+        await self.producer.publish(
+            Update.model_validate(raw), json.dumps(raw).encode()
+        )
+
+    async def stream(self, chats: list[int], count: int, pause: float) -> None:
+        for n in range(count):
+            await self.publish(chats[n % len(chats)])
+            await asyncio.sleep(pause)
+
+
+def verify(journal: list[Record], feed: Feed) -> None:
+    by_chat: dict[int, list[Record]] = {}
+    for record in sorted(journal, key=lambda r: r.started):
+        by_chat.setdefault(record.chat_id, []).append(record)
+    assert by_chat.keys() == feed.sent.keys(), "chats lost"
+    for chat_id, records in by_chat.items():
+        seqs = [r.seq for r in records]
+        assert seqs == list(range(feed.sent[chat_id])), (chat_id, seqs)
+        for prev, record in zip(records, records[1:]):
+            assert record.started >= prev.finished, ("overlap", chat_id, prev, record)
+
+
+async def wait_for(predicate, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+
+async def pending(redis, cfg: IngestConfig) -> int:
+    total = 0
+    for partition in range(cfg.partitions):
+        stream = f"{cfg.stream_prefix}:{partition}"
+        if await redis.exists(stream):
+            total += (await redis.xpending(stream, cfg.group))["pending"]
+    return total
+
+
+def make_cfg(name: str, args) -> IngestConfig:
+    return IngestConfig(
+        mode="stream",
+        partitions=args.partitions,
+        stream_prefix=f"bench:{name}",
+        batch=8,
+        block_ms=50,
+        lease_ttl=args.lease_ttl,
+    )
+
+
+class Workers:
+    def __init__(self, bot: Bot, redis, cfg: IngestConfig, args):
+        self.bot, self.redis, self.cfg, self.args = bot, redis, cfg, args
+        self.journal: list[Record] = []
+        self.running: dict[str, UpdateStreamConsumer] = {}
+
+    def start(self, name: str) -> None:
+        dp = build_dp(name, self.journal, self.args.latency / 1000)
+        consumer = UpdateStreamConsumer(self.bot, dp, self.redis, self.cfg)
+        consumer.start()
+        self.running[name] = consumer
+
+    async def stop(self, name: str) -> None:
+        await self.running.pop(name).stop()
+
+    async def close(self) -> None:
+        for name in list(self.running):
+            await self.stop(name)
+
+    def done(self, feed: Feed) -> bool:
+        return len(self.journal) >= sum(feed.sent.values())
+
+    def share(self) -> str:
+        counts = {name: 0 for name in "AB"}
+        for record in self.journal:
+            counts[record.worker] = counts.get(record.worker, 0) + 1
+        return "  ".join(f"{name} {count:4}" for name, count in counts.items())
+
+
+async def check_order(bot, redis, args) -> None:
+    cfg = make_cfg("order", args)
+    workers = Workers(bot, redis, cfg, args)
+    feed = Feed(UpdateStreamProducer(redis, cfg))
+    chats = list(range(1, args.chats + 1))
+    workers.start("A")
+    workers.start("B")
+    try:
+        await feed.stream(chats, args.updates, args.pause / 1000)
+        await wait_for(lambda: workers.done(feed), args.timeout)
+    finally:
+        await workers.close()
+    verify(workers.journal, feed)
+    assert await pending(redis, cfg) == 0, "unacked entries"
+    assert all(
+        any(r.worker == name for r in workers.journal) for name in "AB"
+    ), "one worker did all the work"
+    out(f"order    handled {len(workers.journal):4}  {workers.share()}")
+
+
+async def check_handoff(bot, redis, args) -> None:
+    cfg = make_cfg("handoff", args)
+    workers = Workers(bot, redis, cfg, args)
+    feed = Feed(UpdateStreamProducer(redis, cfg))
+    chats = list(range(1, args.chats + 1))
+    workers.start("A")
+    producer = asyncio.create_task(feed.stream(chats, args.updates, args.pause / 1000))
+    try:
+        await wait_for(lambda: feed.update_id >= args.updates // 3, args.timeout)
+        workers.start("B")
+        await wait_for(lambda: feed.update_id >= args.updates * 2 // 3, args.timeout)
+        # За это время B успевает получить свою долю партиций
+        await workers.stop("A")
+        stopped_at = len(workers.journal)
+        await producer
+        await wait_for(lambda: workers.done(feed), args.timeout)
+    finally:
+        producer.cancel()
+        await workers.close()
+    verify(workers.journal, feed)
+    assert await pending(redis, cfg) == 0, "unacked entries"
+    moved = {r.chat_id for r in workers.journal if r.worker == "A"} & {
+        r.chat_id for r in workers.journal if r.worker == "B"
+    }
+    assert moved, "no partition changed owner"
+    out(
+        f"handoff  handled {len(workers.journal):4}  {workers.share()}  "
+        f"chats moved {len(moved)}  ({stopped_at} before A stopped)"
+    )
+
+
+async def check_reclaim(bot, redis, args) -> None:
+    cfg = make_cfg("reclaim", args)
+    workers = Workers(bot, redis, cfg, args)
+    feed = Feed(UpdateStreamProducer(redis, cfg))
+    # Все чаты — в партиции 0 (partition_of: chat_id % partitions)
+    chats = [cfg.partitions * n for n in range(1, 6)]
+    stream = f"{cfg.stream_prefix}:0"
+    await redis.xgroup_create(stream, cfg.group, id="0", mkstream=True)
+    for n in range(20):
+        await feed.publish(chats[n % len(chats)])
+    # Умерший владелец: прочитал, но не подтвердил; аренда ещё жива
+    await redis.xreadgroup(cfg.group, "worker-dead", {stream: ">"}, count=12)
+    await redis.set(f"{stream}:owner", "dead-owner", px=int(cfg.lease_ttl * 1000))
+    lease_until = time.monotonic() + cfg.lease_ttl
+    for n in range(20):
+        await feed.publish(chats[n % len(chats)])
+
+    workers.start("A")
+    try:
+        await wait_for(lambda: workers.done(feed), args.timeout + cfg.lease_ttl)
+    finally:
+        await workers.close()
+    verify(workers.journal, feed)
+    assert await pending(redis, cfg) == 0, "unacked entries"
+    first = min(r.started for r in workers.journal)
+    assert first >= lease_until - 0.05, "partition taken while the lease was held"
+    out(
+        f"reclaim  handled {len(workers.journal):4}  12 pending of a dead "
+        f"consumer, first handled {first - lease_until:+.2f}s after lease expiry"
+    )
+
+
+async def check_dead(bot, redis, args) -> None:
+    cfg = make_cfg("dead", args)
+    workers = Workers(bot, redis, cfg, args)
+    feed = Feed(UpdateStreamProducer(redis, cfg))
+    chat_id = 7
+    for n in range(6):
+        await feed.publish(chat_id, boom=n == 2)
+    workers.start("A")
+    try:
+        await wait_for(lambda: workers.done(feed), args.timeout)
+    finally:
+        await workers.close()
+    verify(workers.journal, feed)
+    assert await pending(redis, cfg) == 0, "failed update left unacked"
+    dead = await redis.xrange(f"{cfg.stream_prefix}:dead")
+    assert len(dead) == 1, dead
+    (_, fields), source = dead[0], f"{cfg.stream_prefix}:{chat_id % cfg.partitions}"
+    assert fields["stream"] == source and fields["entry_id"], fields
+    assert json.loads(fields["body"])["message"]["text"].endswith("boom")
+    out(
+        f"dead     handled {len(workers.journal):4}  dead-lettered 1 "
+        f"({fields['stream']} {fields['entry_id']}), chat not blocked"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=40)
+    parser.add_argument("--updates", type=int, default=400)
+    parser.add_argument("--partitions", type=int, default=8)
+    parser.add_argument("--pause", type=float, default=5.0, help="ms между XADD")
+    parser.add_argument("--latency", type=float, default=10.0, help="ms хендлера")
+    parser.add_argument("--lease-ttl", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--redis", default=None, help="redis:// URL вместо стенда")
+    args = parser.parse_args()
+
+    if args.redis:
+        from redis.asyncio import Redis
+
+        redis = Redis.from_url(args.redis, decode_responses=True)
+    else:
+        redis = MemoryRedis()
+
+    bot = Bot(token=settings.bot.token)
+    try:
+        for check in (check_order, check_handoff, check_reclaim, check_dead):
+            if args.redis:
+                await redis.flushdb()
+            await check(bot, redis, args)
+    finally:
+        await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,183 @@
+"""
+Нагрузочный прогон вебхука целиком: web.app.create_app() и telegram_webhook
+in-process через ASGI, со всем стеком middleware (ASGI + aiogram).
+Внешние системы заменены локальными (см. _standins): Bot API — FakeSession,
+Postgres — файловая SQLite, FSM — MemoryStorage, Redis не используется.
+
+Смесь апдейтов: синтетические сообщения/callback-и плюс записанные
+data/updates.jsonl; --db-share — доля апдейтов, чей хендлер читает БД.
+Печатает rps, p50/p95/p99 (медиана по --repeat прогонам) и аллокации
+на апдейт (tracemalloc, отдельный последовательный прогон).
+--json — одной строкой, удобно сравнивать между коммитами.
+
+Запуск:
+  python benchmarks/bench_webhook.py [--requests 5000 --concurrency 32 --db-share 0.3]
+"""
+
+import argparse, asyncio, gc, json, os, statistics, sys, tracemalloc
+
+import _env  # noqa: F401
+
+# Логи приложения рендерятся как в проде, но не пишутся в терминал
+_stdout = sys.stdout
+sys.stdout = open(os.devnull, "w")
+
+import _asgi, _standins
+
+from aiogram import F, Dispatcher, Router
+from aiogram.filters import CommandStart
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import CallbackQuery, Message, Update
+
+from core.config import settings
+from core.models import UserActivity
+from middlewares import setup_middlewares
+from routers import register_routers
+from web.app import create_app
+from web.runtime import runtime
+from web.update_queue import UpdateQueue
+from aiogram import Bot
+
+DB_SHARE = 0.0
+
+
+def touches_db(update: Update) -> bool:
+    return update.update_id % 100 < DB_SHARE * 100
+
+
+def bench_router() -> Router:
+    router = Router(name="bench")
+
+    async def maybe_db(event_update: Update, session, user_id: int) -> None:
+        if touches_db(event_update):
+            await session.get(UserActivity, user_id)
+
+    @router.message(CommandStart())
+    async def start(message: Message, event_update: Update, session):
+        await maybe_db(event_update, session, message.from_user.id)
+        await message.answer("Привет!")
+
+    @router.message(F.text)
+    async def text(message: Message, event_update: Update, session):
+        await maybe_db(event_update, session, message.from_user.id)
+        await message.answer(message.text)
+
+    @router.callback_query(F.data.startswith("item:"))
+    async def item(callback: CallbackQuery, event_update: Update, session):
+        await maybe_db(event_update, session, callback.from_user.id)
+        await callback.answer("ok")
+
+    return router
+
+
+def out(*args) -> None:
+    print(*args, file=_stdout, flush=True)
+
+
+async def setup(args) -> _standins.FakeSession:
+    fake = _standins.FakeSession(latency=args.api_latency / 1000)
+    runtime.bot = Bot(token=settings.bot.token, session=fake)
+    runtime.dp = Dispatcher(storage=MemoryStorage())
+    register_routers(runtime.dp)
+    runtime.dp.include_router(bench_router())
+    session_factory = await _standins.sqlite_session_factory("webhook")
+    setup_middlewares(runtime.dp, session_factory)
+    if args.queue:
+        runtime.updates = UpdateQueue(runtime.bot, runtime.dp, workers=args.queue)
+        runtime.updates.start()
+    return fake
+
+
+async def allocations(app, bodies: list[bytes], path: str) -> dict:
+    """Пиковый и оставшийся прирост памяти на апдейт, по одному запросу."""
+    peaks = []
+    gc.collect()
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    for body in bodies:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await _asgi.call(app, "POST", path, body)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+    if runtime.updates:
+        await runtime.updates.stop(timeout=10)
+        runtime.updates.start()
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "alloc_peak_kib": round(statistics.median(peaks) / 1024, 1),
+        "retained_b_per_update": round((retained - base) / len(bodies)),
+    }
+
+
+async def main() -> None:
+    global DB_SHARE
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--db-share", type=float, default=0.3)
+    parser.add_argument("--callback-share", type=float, default=0.3)
+    parser.add_argument("--recorded-share", type=float, default=0.1)
+    parser.add_argument("--api-latency", type=float, default=0.0, help="ms")
+    parser.add_argument("--queue", type=int, default=0, help="воркеров UpdateQueue")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--alloc-samples", type=int, default=300)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    DB_SHARE = args.db_share
+
+    fake = await setup(args)
+    app = create_app()  # lifespan не запускается: runtime собран выше
+    path = settings.web.main_path
+    headers = []
+    if getattr(settings.web, "secret", None):
+        headers.append(
+            (b"x-telegram-bot-api-secret-token", settings.web.secret.encode())
+        )
+
+    make = _standins.UpdateFactory(callback_share=args.callback_share)
+    recorded = _env.load_updates()
+    total = args.requests * args.repeat + 1000 + args.alloc_samples
+    step = round(1 / args.recorded_share) if args.recorded_share else 0
+    bodies = [
+        recorded[i % len(recorded)] if step and i % step == 0 else make()
+        for i in range(total)
+    ]
+
+    offset = 0
+
+    def request(i: int):
+        return _asgi.call(app, "POST", path, bodies[offset + i], headers)
+
+    await _asgi.load(request, 1000, args.concurrency)  # прогрев
+    offset += 1000
+
+    runs = []
+    for _ in range(args.repeat):
+        gc.collect()
+        runs.append(await _asgi.load(request, args.requests, args.concurrency))
+        offset += args.requests
+
+    result = {
+        key: statistics.median(run[key] for run in runs)
+        for key in ("rps", "p50_ms", "p95_ms", "p99_ms", "mean_ms")
+    }
+    result["errors"] = sum(run["errors"] for run in runs)
+    result.update(await allocations(app, bodies[offset:], path))
+    result["api_calls"] = dict(fake.calls)
+
+    if runtime.updates:
+        await runtime.updates.stop(timeout=10)
+
+    if args.json:
+        out(json.dumps({"args": vars(args), **result}, ensure_ascii=False))
+        return
+    for i, run in enumerate(runs, 1):
+        out(f"run {i}: {run}")
+    out(f"median: {result}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+"""
+Активность пользователей: UPDATE на каждый апдейт против WriteBehindBuffer.
+Поток апдейтов с «горячими» пользователями (Zipf-подобное распределение)
+пишется в локальную SQLite; печатает число SQL-запросов к БД и время,
+проверяет, что итоговые счётчики совпадают.
+
+Нужен aiosqlite. Запуск:
+  python benchmarks/bench_write_behind.py [--updates 20000 --users 2000 --max-keys 1000]
+"""
+
+import argparse, asyncio, os, random, tempfile, time
+from datetime import datetime, timezone
+
+import _env  # noqa: F401
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from core.models import Base, UserActivity
+from core.storage.db_helper import dialect_insert
+from services.write_behind import WriteBehindBuffer
+
+
+async def make_db(name: str):
+    path = os.path.join(tempfile.mkdtemp(), f"{name}.sqlite3")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    statements = [0]
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count(*_):
+        statements[0] += 1
+
+    return engine, async_sessionmaker(engine, expire_on_commit=False), statements
+
+
+async def direct(session_factory, stream) -> None:
+    # Как пишут обычно: один upsert в своей транзакции на каждый апдейт
+    for user_id, kind, now in stream:
+        async with session_factory() as session:
+            stmt = dialect_insert(session, UserActivity).values(
+                user_id=user_id, last_seen=now, **{kind: 1}
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["user_id"],
+                set_={
+                    "last_seen": stmt.excluded.last_seen,
+                    kind: UserActivity.__table__.c[kind] + 1,
+                },
+            )
+            await session.execute(stmt)
+            await session.commit()
+
+
+async def buffered(session_factory, stream, max_keys: int) -> None:
+    buffer = WriteBehindBuffer(
+        session_factory, UserActivity, ("user_id",), interval=0.05, max_keys=max_keys
+    )
+    buffer.start()
+    for i, (user_id, kind, now) in enumerate(stream):
+        buffer.set(user_id, last_seen=now)
+        buffer.incr(user_id, **{kind: 1})
+        if i % 200 == 0:
+            await asyncio.sleep(0)  # апдейты приходят не одним куском
+    await buffer.stop()
+
+
+async def totals(session_factory) -> tuple:
+    async with session_factory() as session:
+        return tuple(
+            await session.execute(
+                select(
+                    func.count(),
+                    func.sum(UserActivity.messages),
+                    func.sum(UserActivity.callbacks),
+                )
+            )
+        )[0]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--max-keys", type=int, default=1000)
+    args = parser.parse_args()
+
+    random.seed(1)
+    weights = [1 / (i + 1) for i in range(args.users)]
+    users = random.choices(range(1, args.users + 1), weights, k=args.updates)
+    now = datetime.now(timezone.utc)
+    stream = [(u, random.choice(("messages", "callbacks")), now) for u in users]
+
+    results = {}
+    for name, run in (
+        ("direct", lambda sf: direct(sf, stream)),
+        ("buffered", lambda sf: buffered(sf, stream, args.max_keys)),
+    ):
+        engine, session_factory, statements = await make_db(name)
+        started = time.perf_counter()
+        await run(session_factory)
+        elapsed = time.perf_counter() - started
+        results[name] = await totals(session_factory)
+        print(
+            f"{name:9} updates {args.updates}  sql statements {statements[0]:6}  "
+            f"{elapsed:6.2f}s  {args.updates / elapsed:8.0f} upd/s"
+        )
+        await engine.dispose()
+
+    print("totals   ", results)
+    assert results["direct"] == results["buffered"], "counters diverged"
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""
+Локальная заглушка SMTP-сервера (asyncio, без TLS): EHLO, AUTH PLAIN, MAIL,
+RCPT, DATA, NOOP, RSET, QUIT. Умеет задержку ответа, временные отказы (451)
+на DATA, отказ получателю (адрес с "reject" -> 550) и закрытие простаивающих
+соединений.
+
+Отдельным процессом:
+  python benchmarks/fake_smtp.py --port 8025 --latency 20 --errors 0.02
+  BOT_CONFIG__EMAIL__HOST=127.0.0.1 BOT_CONFIG__EMAIL__PORT=8025 BOT_CONFIG__EMAIL__USE_SSL=false ...
+или из кода — FakeSMTP(...).start() (см. bench_mailer.py).
+"""
+
+import argparse, asyncio, random
+from collections import Counter
+
+
+class FakeSMTP:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8025,
+        latency: float = 0.0,
+        errors: float = 0.0,
+        idle_timeout: float | None = None,
+        seed: int = 1,
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.errors = errors
+        self.idle_timeout = idle_timeout
+        self.random = random.Random(seed)
+        self.calls: Counter[str] = Counter()
+        self.messages: list[bytes] = []
+        self._server: asyncio.Server | None = None
+
+    async def _reply(self, writer: asyncio.StreamWriter, text: str) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        writer.write(text.encode() + b"\r\n")
+        await writer.drain()
+
+    async def _readline(self, reader: asyncio.StreamReader) -> bytes:
+        if self.idle_timeout is None:
+            return await reader.readline()
+        return await asyncio.wait_for(reader.readline(), self.idle_timeout)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.calls["connections"] += 1
+        try:
+            await self._reply(writer, "220 fake-smtp ESMTP")
+            while True:
+                try:
+                    line = await self._readline(reader)
+                except asyncio.TimeoutError:
+                    await self._reply(writer, "421 idle timeout")
+                    return
+                if not line:
+                    return
+                verb = line.split(b" ", 1)[0].strip().upper().decode()
+                self.calls[verb] += 1
+                if verb in ("EHLO", "HELO"):
+                    await self._reply(
+                        writer, "250-fake-smtp\r\n250-AUTH PLAIN\r\n250 8BITMIME"
+                    )
+                elif verb == "AUTH":
+                    await self._reply(writer, "235 2.7.0 Authentication successful")
+                elif verb == "RCPT" and b"reject" in line.lower():
+                    await self._reply(writer, "550 5.1.1 No such user")
+                elif verb == "DATA":
+                    await self._reply(writer, "354 End data with <CR><LF>.<CR><LF>")
+                    body = await reader.readuntil(b"\r\n.\r\n")
+                    if self.random.random() < self.errors:
+                        self.calls["451"] += 1
+                        await self._reply(writer, "451 4.3.0 Try again later")
+                    else:
+                        self.messages.append(body)
+                        await self._reply(writer, "250 2.0.0 Ok: queued")
+                elif verb == "QUIT":
+                    await self._reply(writer, "221 Bye")
+                    return
+                else:  # MAIL, RCPT, NOOP, RSET
+                    await self._reply(writer, "250 Ok")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> "FakeSMTP":
+        self._server = await asyncio.start_server(self.handle, self.host, self.port)
+        return self
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency", type=float, default=0.0, help="ms на ответ")
+    parser.add_argument("--errors", type=float, default=0.0)
+    parser.add_argument("--idle-timeout", type=float, default=None)
+    args = parser.parse_args()
+    server = await FakeSMTP(
+        port=args.port,
+        latency=args.latency / 1000,
+        errors=args.errors,
+        idle_timeout=args.idle_timeout,
+    ).start()
+    print(f"fake SMTP on {server.host}:{server.port}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
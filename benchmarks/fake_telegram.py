@@ -0,0 +1,147 @@
+"""
+Локальный фейковый Bot API (aiohttp): отвечает на /bot<token>/<method>
+успешными ответами и умеет подмешивать flood-wait (429), 5xx и задержку.
+Успешные sendMessage/copyMessage пишутся в sent (время, chat_id), ответы
+429 — в floods: по ним бенчмарки проверяют соблюдение лимитов.
+
+Отдельным процессом:
+  python benchmarks/fake_telegram.py --port 8081 --flood 0.05 --errors 0.02
+  BOT_CONFIG__BOT__API_SERVER=http://localhost:8081 ...
+или из кода — FakeTelegram(...).start() (см. bench_bot_session.py).
+"""
+
+import argparse, asyncio, random, time
+from collections import Counter
+
+from aiohttp import web
+
+
+class FakeTelegram:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8081,
+        latency: float = 0.0,
+        flood: float = 0.0,
+        retry_after: int = 1,
+        errors: float = 0.0,
+        seed: int = 1,
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.flood = flood
+        self.retry_after = retry_after
+        self.errors = errors
+        self.random = random.Random(seed)
+        self.calls: Counter[str] = Counter()
+        self.connections: set = set()
+        self.sent: list[tuple[float, int]] = []
+        self.floods: list[tuple[float, int]] = []
+        self._runner: web.AppRunner | None = None
+        self._message_id = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        peer = (
+            request.transport.get_extra_info("peername") if request.transport else None
+        )
+        self.connections.add(peer)
+        # Время прихода запроса — до искусственной задержки ответа
+        request["arrived"] = time.monotonic()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        roll = self.random.random()
+        if roll < self.flood:
+            self.calls["429"] += 1
+            self.floods.append((request["arrived"], self.retry_after))
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                },
+                status=429,
+            )
+        if roll < self.flood + self.errors:
+            self.calls["5xx"] += 1
+            return web.json_response(
+                {"ok": False, "error_code": 502, "description": "Bad Gateway"},
+                status=502,
+            )
+        return web.json_response(
+            {"ok": True, "result": await self.result(method, request)}
+        )
+
+    async def result(self, method: str, request: web.Request):
+        name = method.lower()
+        if name == "getme":
+            return {
+                "id": 42,
+                "is_bot": True,
+                "first_name": "Fake",
+                "username": "fake_bot",
+            }
+        if name in ("sendmessage", "copymessage", "editmessagetext"):
+            data = await request.post()
+            self._message_id += 1
+            chat_id = int(data.get("chat_id", 0) or 0)
+            if name != "editmessagetext":
+                self.sent.append((request["arrived"], chat_id))
+            if name == "copymessage":
+                return {"message_id": self._message_id}
+            return {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": data.get("text", ""),
+            }
+        if name == "getwebhookinfo":
+            return {
+                "url": "",
+                "has_custom_certificate": False,
+                "pending_update_count": 0,
+            }
+        return True
+
+    async def start(self) -> "FakeTelegram":
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        return self
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="ms")
+    parser.add_argument("--flood", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--errors", type=float, default=0.0)
+    args = parser.parse_args()
+    server = await FakeTelegram(
+        port=args.port,
+        latency=args.latency / 1000,
+        flood=args.flood,
+        retry_after=args.retry_after,
+        errors=args.errors,
+    ).start()
+    print(f"fake Bot API on {server.url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,8 @@
+__all__ = (
+    "AdminStats",
+    "StatsRecorder",
+    "router",
+)
+
+from .stats import AdminStats, StatsRecorder
+from .router import router
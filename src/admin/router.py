@@ -0,0 +1,105 @@
+import asyncio
+from html import escape
+
+from aiogram import F, Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.models import UserActivity
+from .stats import AdminStats
+
+router = Router(name="admin")
+router.message.filter(F.from_user.id == settings.main.admin_id)
+
+TOP_N = 10
+
+
+def _top(counts: dict[str, int], n: int = TOP_N) -> str:
+    items = sorted(counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+    return "\n".join(f"  {escape(name)} — {count}" for name, count in items) or "  —"
+
+
+@router.message(Command("stats"))
+async def stats_command(message: Message) -> None:
+    from web.runtime import runtime
+
+    if runtime.stats is None:
+        await message.answer("Статистика выключена (нужен Redis).")
+        return
+    stats: AdminStats = runtime.stats.stats
+    today, wau, mau, total, history = await asyncio.gather(
+        stats.day(),
+        stats.uniques(7),
+        stats.uniques(30),
+        stats.total_users(),
+        stats.history(7),
+    )
+
+    lines = [
+        f"<b>Сегодня ({today['day']})</b>",
+        f"DAU: {today['dau']}, новых: {today['new_users']}, апдейтов: {today['updates']}",
+        f"WAU: {wau}, MAU: {mau}, всего пользователей: {total}",
+        "",
+        "<b>Команды</b>",
+        _top(today["commands"]),
+        "",
+        "<b>Хендлеры</b>",
+        _top(today["handlers"]),
+    ]
+    if history:
+        lines += ["", "<b>Прошлые дни</b>"]
+        lines += [
+            f"  {day['day']}: DAU {day['dau']}, новых {day['new_users']}, "
+            f"апдейтов {day['updates']}"
+            for day in history
+        ]
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command("broadcast"), F.reply_to_message)
+async def broadcast_command(message: Message, session: AsyncSession) -> None:
+    """
+    Ответом на сообщение: разослать его копию всем известным пользователям.
+    Здесь рассылка только регистрируется — запустит её лидер (Broadcaster.watch).
+    """
+    from web.runtime import runtime
+
+    if runtime.broadcaster is None:
+        await message.answer("Рассылка выключена (нужен Redis).")
+        return
+    source = message.reply_to_message
+    broadcast_id = f"admin-{source.chat.id}-{source.message_id}"
+    # Курсор с yield_per: id идут в Redis пачками, а не списком в памяти
+    chat_ids = await session.stream_scalars(
+        select(UserActivity.user_id).execution_options(yield_per=1000)
+    )
+    try:
+        total = await runtime.broadcaster.create(
+            broadcast_id,
+            chat_ids,
+            {"from_chat_id": source.chat.id, "message_id": source.message_id},
+        )
+    except ValueError:
+        await message.answer(f"Рассылка <code>{broadcast_id}</code> уже была.")
+        return
+    await message.answer(
+        f"Рассылка <code>{broadcast_id}</code> поставлена в очередь, "
+        f"получателей: {total}.\n"
+        f"Прогресс: /broadcast_status {broadcast_id}"
+    )
+
+
+@router.message(Command("broadcast_status"))
+async def broadcast_status_command(message: Message, command: CommandObject) -> None:
+    from web.runtime import runtime
+
+    if runtime.broadcaster is None or not command.args:
+        await message.answer("Использование: /broadcast_status &lt;id&gt;")
+        return
+    progress = await runtime.broadcaster.progress(command.args.strip())
+    await message.answer(
+        "\n".join(f"{escape(key)}: {value}" for key, value in progress.items())
+    )
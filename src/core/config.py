@@ -1,7 +1,14 @@
 from pathlib import Path
+from typing import Literal
 
 from aiogram.enums import ParseMode
-from pydantic import BaseModel, PostgresDsn, field_validator, computed_field
+from pydantic import (
+    BaseModel,
+    PostgresDsn,
+    computed_field,
+    field_validator,
+    model_validator,
+)
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 BASE_DIR = Path(__file__).resolve().parents[3]
@@ -11,6 +18,22 @@ BASE_DIR = Path(__file__).resolve().parents[3]
 class TelegramConfig(BaseModel):
     token: str
     parse_mode: ParseMode = ParseMode.HTML
+    # Свой Bot API сервер (локальный telegram-bot-api или фейк для тестов)
+    api_server: str | None = None
+    # Пул соединений к Bot API (все к одному хосту)
+    pool_limit: int = 100
+    # Простаивающее соединение держится открытым столько секунд
+    keepalive_timeout: float = 30.0
+    dns_cache_ttl: int = 300
+    request_timeout: float = 60.0
+    # Повторы: flood-wait (RetryAfter) и 5xx/сетевые ошибки. Последние —
+    # только для идемпотентных методов; retry_transient=True повторяет и
+    # send_* (после таймаута возможен дубль сообщения)
+    retry_max: int = 3
+    retry_max_delay: float = 30.0
+    retry_transient: bool = False
+    # Доля повторов от числа запросов, сверх которой ретраи не делаются
+    retry_budget_ratio: float = 0.1
 
 
 class DataBaseConfig(BaseModel):
@@ -20,6 +43,10 @@ class DataBaseConfig(BaseModel):
     echo_pool: bool = False
     pool_size: int = 20
     max_overflow: int = 10
+    # commit сессии из DbSessionMiddleware в конце успешного апдейта
+    session_autocommit: bool = False
+    # сколько соединений пула открыть заранее на старте (<= pool_size)
+    prewarm: int = 0
 
     @computed_field  # pydantic v2
     @property
@@ -58,6 +85,16 @@ class EmailConfig(BaseModel):
     port: int = 465
     name: str
     pwd: str
+    use_ssl: bool = True  # False — обычный SMTP (локальная заглушка)
+    timeout: float = 30.0
+    # Очередь и пул постоянных соединений (services/mailer.py)
+    pool_size: int = 2
+    queue_size: int = 1000
+    block_timeout: float = 5.0  # сколько send() ждёт места в очереди
+    batch_size: int = 20
+    keepalive: float = 60.0  # после такого простоя соединение проверяется NOOP
+    max_attempts: int = 5
+    retry_delay: float = 5.0
 
 
 class AdminConfig(BaseModel):
@@ -72,6 +109,19 @@ class WebConfig(BaseModel):
     base_url: str  # https://bot.example.com
     pay_path: str = "/telegram/pay"
     main_path: str = "/telegram/webhook"
+    max_body_size: int = 1_048_576  # апдейты Telegram намного меньше 1 МБ
+    workers: int = 1  # процессов uvicorn в production-режиме
+    # Один лидер на кластер: вебхук, планировщик, рассылки, уведомления админу.
+    # Включается сам при workers > 1; для нескольких подов — явно.
+    leader_election: bool = False
+    leader_ttl: float = 15.0
+    json_backend: Literal["pydantic", "orjson"] = "pydantic"
+    # Токен для /debug/*: заголовок X-Admin-Token; не задан — эндпоинты выключены
+    admin_token: str | None = None
+
+    @property
+    def use_leader_election(self) -> bool:
+        return self.leader_election or self.workers > 1
 
     def get_webhook_url(self) -> str:
         base = self.base_url.rstrip("/")
@@ -81,6 +131,146 @@ class WebConfig(BaseModel):
         return f"{base}{path}"
 
 
+class UpdateQueueConfig(BaseModel):
+    # Быстрый ACK вебхука: апдейт кладётся в очередь, обработку делают воркеры
+    enabled: bool = False
+    maxsize: int = 1000
+    workers: int = 16
+    overflow: Literal["reject", "block"] = "reject"  # reject -> 503 сразу
+    block_timeout: float = 5.0  # сколько ждём места в очереди в режиме block
+    drain_timeout: float = 10.0  # сколько дожидаемся очереди на shutdown
+    # Ёмкость шарда (апдейты одного чата); None — вся maxsize
+    shard_size: int | None = None
+    # Упавшие апдейты (вебхук уже ответил 200) — в этот стрим Redis
+    dead_letter_key: str = "updates:dead"
+    dead_letter_maxlen: int = 10000
+
+
+class IngestConfig(BaseModel):
+    # inline — апдейт обрабатывается в веб-процессе (сразу или через очередь);
+    # stream — веб-роль пишет в Redis Streams, обрабатывает src/worker.py
+    mode: Literal["inline", "stream"] = "inline"
+    partitions: int = 16
+    stream_prefix: str = "tg:updates"
+    group: str = "processors"
+    maxlen: int = 100_000
+    batch: int = 32
+    block_ms: int = 1000
+    # аренда партиции воркером; через столько секунд её заберёт другой
+    lease_ttl: float = 15.0
+
+
+class DedupConfig(BaseModel):
+    # Отсев повторной доставки update_id через Redis SET NX
+    enabled: bool = False
+    ttl: int = 86400
+    lru_size: int = 10000
+
+
+class OutboxConfig(BaseModel):
+    # Фоновая доставка побочных эффектов (уведомления об оплате и т.п.)
+    interval: float = 2.0
+    batch_size: int = 50
+    max_attempts: int = 10
+    # аренда выбранной пачки: после неё строки снова видны всем репликам
+    claim_ttl: float = 60.0
+
+
+class BroadcastConfig(BaseModel):
+    # Лимиты Telegram: ~30 msg/s глобально и ~1 msg/s в один чат
+    global_rate: float = 25.0
+    per_chat_rate: float = 1.0
+    concurrency: int = 8
+    max_retries: int = 3
+    progress_interval: float = 10.0
+    # Аренда прогона рассылки и как часто лидер ищет новые рассылки
+    lease_ttl: float = 30.0
+    poll_interval: float = 5.0
+
+
+class FsmConfig(BaseModel):
+    state_ttl: int = 172800
+    data_ttl: int = 172800
+    # In-process кэш перед RedisStorage (инвалидация между репликами — pub/sub)
+    cache: bool = False
+    cache_ttl: float = 2.0
+    cache_size: int = 10000
+
+
+class CacheConfig(BaseModel):
+    # Read-through кэш моделей (core.storage.model_cache): TTL в Redis и
+    # в памяти процесса; локальный TTL ограничивает устаревание на случай
+    # потерянной инвалидации
+    ttl: int = 300
+    local_ttl: float = 30.0
+    local_size: int = 10000
+
+
+class WriteBehindConfig(BaseModel):
+    # Сброс агрегатов активности: раз в interval или при max_keys ключах
+    interval: float = 5.0
+    max_keys: int = 10000
+    batch_size: int = 500
+
+
+class ThrottleConfig(BaseModel):
+    # Антифлуд (middlewares/throttling.py), нужен Redis
+    enabled: bool = False
+    user_rate: float = 3.0  # апдейтов в секунду в среднем
+    user_burst: int = 10
+    chat_rate: float = 20.0  # на групповой чат
+    chat_burst: int = 40
+    blocked_cache_size: int = 10000
+
+
+class StatsConfig(BaseModel):
+    # Админ-статистика на счётчиках Redis (admin/stats.py)
+    enabled: bool = False
+    retention_days: int = 35  # детальные ключи дня; итоги rollup хранятся всегда
+    timezone: str = "UTC"  # граница суток для DAU и время ночного rollup
+    max_inflight: int = 1000
+
+
+class SchedulerConfig(BaseModel):
+    # redis — задачи переживают рестарт и общие для всех реплик
+    jobstore: Literal["memory", "redis"] = "memory"
+    # distributed: планировщик работает в каждой реплике, а однократность
+    # запуска обеспечивают блокировки services.jobs; иначе — только у лидера
+    distributed: bool = False
+    coalesce: bool = True
+    misfire_grace_time: int = 60
+    max_instances: int = 1
+    chunk_workers: int = 2  # воркеры fan-out чанков в каждой реплике
+
+    @model_validator(mode="after")
+    def _single_scheduler_per_jobstore(self):
+        # Несколько планировщиков на одном job store APScheduler не поддерживает
+        if self.distributed and self.jobstore == "redis":
+            raise ValueError("scheduler.distributed requires jobstore=memory")
+        return self
+
+
+class MonitorConfig(BaseModel):
+    # Задержка event loop (utils/loop_monitor.py)
+    loop_interval: float = 0.1
+    slow_callback: float = 0.25  # блокировка дольше — стек в лог; 0 — без сторожа
+    lag_window: int = 600  # сэмплов для перцентилей (~1 мин при 0.1 с)
+    # /ready (web/readiness.py)
+    ready_ttl: float = 2.0
+    probe_timeout: float = 1.0
+    max_pool_saturation: float = 0.9
+    max_loop_lag: float = 0.5  # p99, секунды
+
+
+class LoggingConfig(BaseModel):
+    # production: без callsite-информации и с фоновой записью логов
+    production: bool = False
+    # доля апдейтов с handler_start/handler_done (ошибки пишутся всегда)
+    handler_sample_rate: float = 1.0
+    # медленные апдейты логируются всегда, независимо от сэмплинга
+    slow_handler_ms: float | None = 1000.0
+
+
 # ========== ROOT SETTINGS ==========
 class Settings(BaseSettings):
     """
@@ -104,6 +294,19 @@ class Settings(BaseSettings):
     pay: PaymentConfig
     email: EmailConfig
     web: WebConfig
+    queue: UpdateQueueConfig = UpdateQueueConfig()
+    log: LoggingConfig = LoggingConfig()
+    monitor: MonitorConfig = MonitorConfig()
+    dedup: DedupConfig = DedupConfig()
+    ingest: IngestConfig = IngestConfig()
+    outbox: OutboxConfig = OutboxConfig()
+    broadcast: BroadcastConfig = BroadcastConfig()
+    fsm: FsmConfig = FsmConfig()
+    cache: CacheConfig = CacheConfig()
+    write_behind: WriteBehindConfig = WriteBehindConfig()
+    stats: StatsConfig = StatsConfig()
+    throttle: ThrottleConfig = ThrottleConfig()
+    scheduler: SchedulerConfig = SchedulerConfig()
 
     # Мягкая валидация/нормализация: приводим base_url к https://...
     @field_validator("web")
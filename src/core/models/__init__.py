@@ -1,4 +1,11 @@
-__all__ = ("Base",)
+__all__ = (
+    "Base",
+    "PaymentEvent",
+    "OutboxMessage",
+    "UserActivity",
+)
 
 
-from .base import Base
\ No newline at end of file
+from .base import Base
+from .payment import PaymentEvent, OutboxMessage
+from .activity import UserActivity
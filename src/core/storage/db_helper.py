@@ -1,4 +1,7 @@
-from sqlalchemy import select
+import asyncio
+
+from sqlalchemy import select, Table
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
     async_sessionmaker,
@@ -37,7 +40,7 @@ class DataBaseHelper:
 
 
 db_helper = DataBaseHelper(
-    url=str(settings.db.url),
+    url=settings.db.async_url,
     echo=settings.db.echo,
     echo_pool=settings.db.echo_pool,
     poll_size=settings.db.pool_size,
@@ -56,4 +59,35 @@ async def test_connection(session: AsyncSession):
     :param session: объект AsyncSession
     """
     stmt = select(1)
-    return await session.scalar(stmt)
\ No newline at end of file
+    return await session.scalar(stmt)
+
+
+async def prewarm_pool(size: int) -> None:
+    """
+    Заранее открывает size соединений пула (параллельно), чтобы первые
+    апдейты после старта не платили за TCP/TLS/auth к Postgres.
+    Больше размера пула не открывается: лишние закрылись бы при возврате.
+    Пулы без постоянных соединений (NullPool) не прогреваются.
+    """
+    pool_size = getattr(db_helper.engine.pool, "size", None)
+    size = min(size, pool_size()) if pool_size else 0
+    if size <= 0:
+        return
+    conns = await asyncio.gather(*(db_helper.engine.connect() for _ in range(size)))
+    try:
+        await asyncio.gather(*(conn.scalar(select(1)) for conn in conns))
+    finally:
+        await asyncio.gather(*(conn.close() for conn in conns))
+
+
+def dialect_insert(session: AsyncSession, table: type[Base] | Table):
+    """
+    insert() диалекта текущего подключения — с on_conflict_do_nothing/
+    on_conflict_do_update. Postgres в проде, SQLite в локальных стендах.
+    """
+    name = session.get_bind().dialect.name
+    if name == "postgresql":
+        return postgresql.insert(table)
+    if name == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"ON CONFLICT is not supported for {name!r}")
@@ -0,0 +1,133 @@
+from typing import Any, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+
+from core.storage.invalidation import InvalidationBus
+from utils.cache import TTLCache
+from utils.metrics import registry
+
+FSM_REDIS_ROUNDTRIPS = registry.counter(
+    "fsm_redis_roundtrips_total",
+    "Redis round trips made by the FSM storage",
+    ("op",),
+)
+FSM_CACHE_HITS = registry.counter(
+    "fsm_cache_hits_total",
+    "FSM state/data reads served from the in-process cache",
+)
+
+
+def _text(value) -> Optional[str]:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class CachedRedisStorage(BaseStorage):
+    """
+    Двухуровневое FSM-хранилище поверх RedisStorage.
+
+    Чтение: state и data забираются одним pipeline-запросом и кладутся в
+    короткоживущий in-process LRU, так что get_state + get_data + update_data
+    внутри одного апдейта стоят один round trip на чтение.
+    Запись: сквозная в Redis (SET/DEL + PUBLISH инвалидации одним pipeline),
+    остальные реплики сбрасывают ключ по pub/sub; TTL кэша ограничивает
+    устаревание, если сообщение инвалидации потерялось.
+
+    Чтение, которое было в полёте во время записи или инвалидации, могло
+    получить старое значение: у ключей с чтением в полёте есть поколение,
+    запись и инвалидация его увеличивают, и такое чтение в кэш не кладётся.
+    """
+
+    def __init__(
+        self,
+        storage: RedisStorage,
+        ttl: float = 2.0,
+        maxsize: int = 10000,
+        channel: str = "fsm:invalidate",
+    ):
+        self.storage = storage
+        self.redis = storage.redis
+        self.key_builder = storage.key_builder
+        # значение: (state, сырой JSON data) — data декодируем на каждый get_data,
+        # чтобы хендлеры не могли мутировать кэш через возвращённый dict
+        self._cache: TTLCache[tuple[Optional[str], Optional[str]]] = TTLCache(
+            maxsize=maxsize, ttl=ttl
+        )
+        # cache_key -> [поколение, читателей в полёте]; только пока читают
+        self._loading: dict[str, list[int]] = {}
+        self.bus = InvalidationBus(self.redis, channel, self._invalidate)
+
+    def start(self) -> None:
+        self.bus.start()
+
+    def _invalidate(self, cache_key: str) -> None:
+        self._cache.pop(cache_key)
+        loading = self._loading.get(cache_key)
+        if loading is not None:
+            loading[0] += 1
+
+    async def _load(self, key: StorageKey) -> tuple[Optional[str], Optional[str]]:
+        cache_key = self.key_builder.build(key)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            FSM_CACHE_HITS.inc()
+            return cached
+        loading = self._loading.setdefault(cache_key, [0, 0])
+        generation = loading[0]
+        loading[1] += 1
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.get(self.key_builder.build(key, "state"))
+                pipe.get(self.key_builder.build(key, "data"))
+                state, data = await pipe.execute()
+        finally:
+            loading[1] -= 1
+            if not loading[1]:
+                del self._loading[cache_key]
+        FSM_REDIS_ROUNDTRIPS.labels("read").inc()
+        entry = (_text(state), _text(data))
+        if loading[0] == generation:
+            self._cache.set(cache_key, entry)
+        return entry
+
+    async def _write(self, key: StorageKey, part: str, value: Optional[str], ttl):
+        cache_key = self.key_builder.build(key)
+        redis_key = self.key_builder.build(key, part)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if value is None:
+                pipe.delete(redis_key)
+            else:
+                pipe.set(redis_key, value, ex=ttl)
+            pipe.publish(self.bus.channel, self.bus.message(cache_key))
+            await pipe.execute()
+        FSM_REDIS_ROUNDTRIPS.labels("write").inc()
+
+        # Обновляем свою копию, если она есть, — следующий get не пойдёт в Redis;
+        # чтения в полёте могли получить значение до записи
+        cached = self._cache.get(cache_key)
+        self._invalidate(cache_key)
+        if cached is not None:
+            state, data = cached
+            entry = (value, data) if part == "state" else (state, value)
+            self._cache.set(cache_key, entry)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        await self._write(key, "state", value, self.storage.state_ttl)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        value = self.storage.json_dumps(data) if data else None
+        await self._write(key, "data", value, self.storage.data_ttl)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, data = await self._load(key)
+        return self.storage.json_loads(data) if data else {}
+
+    async def close(self) -> None:
+        await self.bus.stop()
+        await self.storage.close()
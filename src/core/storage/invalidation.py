@@ -0,0 +1,67 @@
+import asyncio, json, uuid
+from typing import Callable, Optional
+
+from redis.asyncio import Redis
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class InvalidationBus:
+    """
+    Pub/sub-канал инвалидации локальных кэшей между репликами.
+    Собственные сообщения отбрасываются по instance_id отправителя.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        channel: str,
+        on_invalidate: Callable[[str], None],
+    ):
+        self.redis = redis
+        self.channel = channel
+        self.on_invalidate = on_invalidate
+        self.instance_id = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+
+    def message(self, *keys: str) -> str:
+        return json.dumps({"src": self.instance_id, "keys": keys})
+
+    async def publish(self, *keys: str) -> None:
+        await self.redis.publish(self.channel, self.message(*keys))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(
+                self._listen(), name=f"invalidation:{self.channel}"
+            )
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    if data.get("src") == self.instance_id:
+                        continue
+                    for key in data.get("keys", ()):
+                        self.on_invalidate(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Пропущенные инвалидации покрывает короткий TTL кэша
+                logger.warning("invalidation_listener_failed", exc_info=True)
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.aclose()
@@ -0,0 +1,298 @@
+import asyncio, datetime, decimal, json, time
+from typing import Any, Callable, Generic, Hashable, Optional, TypeVar
+
+from redis.asyncio import Redis
+from sqlalchemy import Date, DateTime, Numeric, Time
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.models import Base
+from core.storage.invalidation import InvalidationBus
+from utils.cache import TTLCache
+from utils.logger import get_logger
+from utils.metrics import registry
+
+logger = get_logger(__name__)
+
+ModelT = TypeVar("ModelT", bound=Base)
+
+CACHE_REQUESTS = registry.counter(
+    "model_cache_requests_total",
+    "Model cache lookups by the tier that answered",
+    ("cache", "source"),
+)
+CACHE_LOAD_LATENCY = registry.histogram(
+    "model_cache_load_seconds",
+    "Model cache lookup latency by the tier that answered",
+    ("cache", "source"),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5),
+)
+
+# В кэше хранится и «записи нет», чтобы несуществующий id не бил в БД
+_NONE = "null"
+
+# Запись из БД попадает в Redis, только если версия ключа не изменилась с
+# момента промаха: invalidate() увеличивает версию, и загрузка, начатая до
+# неё, не вернёт в Redis устаревшую строку ни на одной реплике.
+# KEYS: ключ строки, ключ версии; ARGV: версия при промахе, значение, ttl
+_SET_IF_VERSION = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _parser(column) -> Optional[Callable[[Any], Any]]:
+    column_type = column.type
+    if isinstance(column_type, DateTime):
+        return datetime.datetime.fromisoformat
+    if isinstance(column_type, Date):
+        return datetime.date.fromisoformat
+    if isinstance(column_type, Time):
+        return datetime.time.fromisoformat
+    if isinstance(column_type, Numeric) and column_type.asdecimal:
+        return decimal.Decimal
+    return None
+
+
+class ModelCache(Generic[ModelT]):
+    """
+    Read-through кэш строк модели по первичному ключу.
+
+    Уровни: in-process TTL+LRU → Redis → БД. Параллельные промахи по одному
+    ключу объединяются (single-flight): в БД уходит один запрос, остальные
+    ждут его результат. При попадании session не используется вовсе —
+    сессия DbSessionMiddleware так и не возьмёт соединение из пула.
+
+    get возвращает отсоединённую копию (снимок колонок, без relationship).
+    Для изменения — session.get/merge и затем invalidate: он чистит Redis и
+    рассылает сброс локальных кэшей остальным репликам.
+    """
+
+    def __init__(
+        self,
+        model: type[ModelT],
+        redis: Optional[Redis] = None,
+        ttl: int = 300,
+        local_ttl: float = 30.0,
+        local_size: int = 10000,
+        name: Optional[str] = None,
+    ):
+        self.model = model
+        self.name = name or model.__tablename__
+        self.ttl = ttl
+        self.prefix = f"cache:{self.name}:"
+        self._columns = [
+            (prop.key, _parser(prop.columns[0]))
+            for prop in model.__mapper__.column_attrs
+        ]
+        self._local: TTLCache[Optional[dict]] = TTLCache(
+            maxsize=local_size, ttl=local_ttl
+        )
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.redis: Optional[Redis] = None
+        self.bus: Optional[InvalidationBus] = None
+        self._set_if_version = None
+        self.bind(redis)
+
+    def bind(self, redis: Optional[Redis]) -> None:
+        self.redis = redis
+        self.bus = None
+        if redis is not None:
+            self.bus = InvalidationBus(redis, f"{self.prefix}invalidate", self._drop)
+            self._set_if_version = redis.register_script(_SET_IF_VERSION)
+
+    def start(self) -> None:
+        if self.bus:
+            self.bus.start()
+
+    async def stop(self) -> None:
+        if self.bus:
+            await self.bus.stop()
+
+    def _key(self, pk: Hashable) -> str:
+        return f"{self.prefix}{pk}"
+
+    def _version_key(self, key: str) -> str:
+        return f"{key}:v"
+
+    def _drop(self, key: str) -> None:
+        self._local.pop(key)
+        self._inflight.pop(key, None)
+
+    def _dump(self, obj: Optional[ModelT]) -> Optional[dict]:
+        if obj is None:
+            return None
+        return {key: getattr(obj, key) for key, _ in self._columns}
+
+    def _build(self, row: Optional[dict]) -> Optional[ModelT]:
+        if row is None:
+            return None
+        return self.model(**row)
+
+    def _encode(self, row: Optional[dict]) -> str:
+        return _NONE if row is None else json.dumps(row, default=_default)
+
+    def _decode(self, raw) -> Optional[dict]:
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        if raw == _NONE:
+            return None
+        row = json.loads(raw)
+        for key, parse in self._columns:
+            if parse is not None and row.get(key) is not None:
+                row[key] = parse(row[key])
+        return row
+
+    def _record(self, source: str, started: float) -> None:
+        CACHE_REQUESTS.labels(self.name, source).inc()
+        CACHE_LOAD_LATENCY.labels(self.name, source).observe(
+            time.perf_counter() - started
+        )
+
+    async def get(self, session: AsyncSession, pk: Hashable) -> Optional[ModelT]:
+        started = time.perf_counter()
+        key = self._key(pk)
+        row = self._local.get(key, self)
+        if row is not self:
+            self._record("local", started)
+            return self._build(row)
+
+        future = self._inflight.get(key)
+        if future is not None:
+            row = await asyncio.shield(future)
+            self._record("coalesced", started)
+            return self._build(row)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            row, source = await self._load(session, pk, key, future)
+        except BaseException as e:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            future.set_exception(e)
+            # Ожидающих нет — подавляем «exception was never retrieved»
+            future.exception()
+            raise
+
+        # Если за время загрузки прошла инвалидация, результат отдаём,
+        # но в кэш не кладём — он мог устареть
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+            self._local.set(key, row)
+        future.set_result(row)
+        self._record(source, started)
+        return self._build(row)
+
+    async def _load(
+        self, session: AsyncSession, pk: Hashable, key: str, future: asyncio.Future
+    ) -> tuple[Optional[dict], str]:
+        version = None
+        writable = self.redis is not None
+        if self.redis is not None:
+            try:
+                raw, version = await self.redis.mget(key, self._version_key(key))
+            except Exception:
+                logger.warning(
+                    "model_cache_redis_failed", cache=self.name, exc_info=True
+                )
+                # Версия неизвестна — записывать нечем сравнивать
+                raw, writable = None, False
+            if raw is not None:
+                return self._decode(raw), "redis"
+
+        row = self._dump(await session.get(self.model, pk))
+        # Инвалидация этой реплики во время загрузки — в Redis не пишем;
+        # чужие отсекает проверка версии в скрипте
+        if writable and self._inflight.get(key) is future:
+            try:
+                await self._set_if_version(
+                    keys=[key, self._version_key(key)],
+                    args=[version or "", self._encode(row), self.ttl],
+                )
+            except Exception:
+                logger.warning(
+                    "model_cache_redis_failed", cache=self.name, exc_info=True
+                )
+        return row, "db"
+
+    async def invalidate(self, *pks: Hashable) -> None:
+        """Вызывать после коммита изменений строк с этими ключами."""
+        keys = [self._key(pk) for pk in pks]
+        for key in keys:
+            self._drop(key)
+        if self.redis is None or not keys:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                # Версия живёт дольше любой загрузки, начатой до инвалидации
+                pipe.incr(self._version_key(key))
+                pipe.expire(self._version_key(key), self.ttl)
+            pipe.delete(*keys)
+            pipe.publish(self.bus.channel, self.bus.message(*keys))
+            await pipe.execute()
+
+    def stats(self) -> dict:
+        counts = {
+            source: int(CACHE_REQUESTS.labels(self.name, source).value)
+            for source in ("local", "redis", "coalesced", "db")
+        }
+        total = sum(counts.values())
+        return {
+            **counts,
+            "local_size": len(self._local),
+            "hit_ratio": round((total - counts["db"]) / total, 4) if total else None,
+        }
+
+
+class ModelCacheRegistry:
+    """
+    Кэши объявляются на уровне модуля (в роутерах/сервисах), а Redis
+    подключается позже — в runtime.build через bind:
+
+        users = caches.register(User)
+        ...
+        user = await users.get(session, message.from_user.id)
+    """
+
+    def __init__(self):
+        self.redis: Optional[Redis] = None
+        self._caches: dict[str, ModelCache] = {}
+
+    def register(self, model: type[ModelT], **options) -> ModelCache[ModelT]:
+        options.setdefault("ttl", settings.cache.ttl)
+        options.setdefault("local_ttl", settings.cache.local_ttl)
+        options.setdefault("local_size", settings.cache.local_size)
+        cache = ModelCache(model, self.redis, **options)
+        self._caches[cache.name] = cache
+        return cache
+
+    def bind(self, redis: Optional[Redis]) -> None:
+        self.redis = redis
+        for cache in self._caches.values():
+            cache.bind(redis)
+
+    def start(self) -> None:
+        for cache in self._caches.values():
+            cache.start()
+
+    async def stop(self) -> None:
+        for cache in self._caches.values():
+            await cache.stop()
+
+    def stats(self) -> dict[str, dict]:
+        return {name: cache.stats() for name, cache in self._caches.items()}
+
+
+caches = ModelCacheRegistry()
@@ -0,0 +1,170 @@
+from typing import (
+    Any,
+    AsyncIterator,
+    Generic,
+    Iterable,
+    Optional,
+    Sequence,
+    TypeVar,
+)
+
+from sqlalchemy import ColumnElement, Select, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.models import Base
+from core.storage.db_helper import dialect_insert
+
+ModelT = TypeVar("ModelT", bound=Base)
+
+# Запас под лимит параметров драйвера (asyncpg — 32767, SQLite — 32766)
+MAX_PARAMS = 30000
+
+
+def _chunks(items: Sequence, size: int) -> Iterable[Sequence]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+class Repository(Generic[ModelT]):
+    """
+    Базовый репозиторий: запросы, которые иначе пишут N+1 циклом или OFFSET.
+
+        class UserActivityRepo(Repository[UserActivity]):
+            model = UserActivity
+
+        repo = UserActivityRepo(session)
+        users = await repo.get_many(ids)            # один запрос на пачку id
+        async for batch in repo.iter_batches():     # keyset, память O(batch)
+            ...
+
+    Ключ — первичный ключ модели из одной колонки. Репозиторий не коммитит:
+    транзакцией управляет вызывающий код (или DbSessionMiddleware).
+    """
+
+    model: type[ModelT]
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        (self.pk,) = self.model.__mapper__.primary_key
+
+    async def get(self, id_: Any) -> Optional[ModelT]:
+        return await self.session.get(self.model, id_)
+
+    async def get_many(self, ids: Iterable[Any]) -> dict[Any, ModelT]:
+        """{id: объект} для найденных id; IN-запросы кусками по MAX_PARAMS."""
+        ids = list(dict.fromkeys(ids))
+        found: dict[Any, ModelT] = {}
+        for chunk in _chunks(ids, MAX_PARAMS):
+            result = await self.session.scalars(
+                select(self.model).where(self.pk.in_(chunk))
+            )
+            for obj in result:
+                found[getattr(obj, self.pk.key)] = obj
+        return found
+
+    async def count(self, *where: ColumnElement[bool]) -> int:
+        stmt = select(func.count()).select_from(self.model).where(*where)
+        return await self.session.scalar(stmt)
+
+    def _chunk_size(self, rows: Sequence[dict], chunk_size: Optional[int]) -> int:
+        if chunk_size:
+            return chunk_size
+        width = max(1, len(rows[0]))
+        return max(1, MAX_PARAMS // width)
+
+    async def insert_many(
+        self, rows: Sequence[dict], chunk_size: Optional[int] = None
+    ) -> int:
+        """Многострочный INSERT кусками (без ORM-объектов и identity map)."""
+        if not rows:
+            return 0
+        size = self._chunk_size(rows, chunk_size)
+        for chunk in _chunks(rows, size):
+            await self.session.execute(insert(self.model).values(list(chunk)))
+        return len(rows)
+
+    async def upsert_many(
+        self,
+        rows: Sequence[dict],
+        index_elements: Optional[Sequence[str]] = None,
+        update_columns: Optional[Sequence[str]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> int:
+        """
+        INSERT ... ON CONFLICT (index_elements) DO UPDATE кусками.
+        По умолчанию конфликт — по первичному ключу, обновляются все
+        переданные колонки, кроме ключевых; пустой update_columns — DO NOTHING.
+        """
+        if not rows:
+            return 0
+        index_elements = list(index_elements or (self.pk.key,))
+        if update_columns is None:
+            update_columns = [c for c in rows[0] if c not in index_elements]
+        size = self._chunk_size(rows, chunk_size)
+        for chunk in _chunks(rows, size):
+            stmt = dialect_insert(self.session, self.model).values(list(chunk))
+            if update_columns:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=index_elements,
+                    set_={c: stmt.excluded[c] for c in update_columns},
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+            await self.session.execute(stmt)
+        return len(rows)
+
+    async def iter_batches(
+        self,
+        *where: ColumnElement[bool],
+        batch_size: int = 1000,
+        after: Any = None,
+    ) -> AsyncIterator[list[ModelT]]:
+        """
+        Keyset-пагинация по первичному ключу: WHERE pk > last ORDER BY pk LIMIT n.
+        В отличие от OFFSET каждая страница стоит одинаково, сколько бы строк
+        ни было пропущено. Объекты каждой пачки вытесняются из сессии
+        (изменённые — после flush), поэтому память не растёт с размером таблицы.
+        """
+        last = after
+        while True:
+            stmt = select(self.model).where(*where).order_by(self.pk).limit(batch_size)
+            if last is not None:
+                stmt = stmt.where(self.pk > last)
+            batch = list(await self.session.scalars(stmt))
+            if not batch:
+                return
+            last = getattr(batch[-1], self.pk.key)
+            yield batch
+            # Изменения, сделанные вызывающим кодом, не должны потеряться
+            if self.session.dirty or self.session.deleted:
+                await self.session.flush()
+            for obj in batch:
+                if obj in self.session:
+                    self.session.expunge(obj)
+            if len(batch) < batch_size:
+                return
+
+    async def iter_all(
+        self, *where: ColumnElement[bool], batch_size: int = 1000
+    ) -> AsyncIterator[ModelT]:
+        async for batch in self.iter_batches(*where, batch_size=batch_size):
+            for obj in batch:
+                yield obj
+
+    async def stream(
+        self, stmt: Optional[Select] = None, batch_size: int = 1000
+    ) -> AsyncIterator[Any]:
+        """
+        Один запрос с курсором на сервере (session.stream + yield_per):
+        строки приходят пачками по batch_size. Держит соединение и
+        транзакцию на всё время обхода — для долгих обходов лучше iter_batches.
+        stmt по умолчанию — вся таблица; для select(Model) отдаются объекты,
+        для произвольных колонок — Row.
+        """
+        stmt = select(self.model) if stmt is None else stmt
+        result = await self.session.stream(stmt.execution_options(yield_per=batch_size))
+        descriptions = stmt.column_descriptions
+        if len(descriptions) == 1 and descriptions[0]["type"] is self.model:
+            result = result.scalars()
+        async for item in result:
+            yield item
@@ -5,10 +5,21 @@ from core.config import settings
 app = create_app()
 
 if __name__ == "__main__":
-    uvicorn_run(
-        "src.main:app",
-        host=settings.web.host,
-        port=settings.web.port,
-        log_level="info",
-        reload=True,  # убери на проде
-    )
+    if settings.main.debug:
+        # dev: один процесс с автоперезагрузкой
+        uvicorn_run(
+            "main:app",
+            host=settings.web.host,
+            port=settings.web.port,
+            log_level="info",
+            reload=True,
+        )
+    else:
+        # prod: N процессов; вебхук/планировщик/уведомления — только у лидера
+        uvicorn_run(
+            "main:app",
+            host=settings.web.host,
+            port=settings.web.port,
+            log_level="info",
+            workers=settings.web.workers,
+        )
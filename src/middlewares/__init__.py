@@ -1,8 +1,23 @@
 __all__ = (
+    "ActivityMiddleware",
     "RequestIDMiddleware",
     "DbSessionMiddleware",
     "LoggingContextMiddleware",
+    "HandlerTagMiddleware",
+    "StatsMiddleware",
+    "ThrottlingMiddleware",
+    "HandlerThrottlingMiddleware",
+    "RateLimiter",
+    "setup_middlewares",
 )
+from .activity import ActivityMiddleware
 from .database import DbSessionMiddleware
 from .request_id import RequestIDMiddleware
-from .logging_ctx import LoggingContextMiddleware
+from .logging_ctx import LoggingContextMiddleware, HandlerTagMiddleware
+from .stats import StatsMiddleware
+from .throttling import (
+    ThrottlingMiddleware,
+    HandlerThrottlingMiddleware,
+    RateLimiter,
+)
+from .setup import setup_middlewares
@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from services.write_behind import WriteBehindBuffer
+from .logging_ctx import extract_ctx
+
+# Какой счётчик UserActivity растёт от апдейта данного типа
+_COUNTERS = {
+    "message": "messages",
+    "edited_message": "messages",
+    "callback_query": "callbacks",
+}
+
+
+class ActivityMiddleware(BaseMiddleware):
+    """
+    Outer-middleware на update: last_seen и счётчики пользователя уходят в
+    WriteBehindBuffer (runtime.activity) — в БД они попадут пачкой при
+    сбросе, апдейт запросов не делает.
+    """
+
+    def __init__(self, buffer: WriteBehindBuffer):
+        super().__init__()
+        self.buffer = buffer
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict], Awaitable],
+        event: TelegramObject,
+        data: dict,
+    ):
+        if isinstance(event, Update):
+            ctx = extract_ctx(event)
+            user_id = ctx["user_id"]
+            if user_id is not None:
+                self.buffer.set(user_id, last_seen=datetime.now(timezone.utc))
+                counter = _COUNTERS.get(ctx["update_type"])
+                if counter:
+                    self.buffer.incr(user_id, **{counter: 1})
+        return await handler(event, data)
@@ -1,14 +1,83 @@
-from typing import Callable, Awaitable, Dict, Any
+from typing import Callable, Awaitable, Dict, Any, Optional
 
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session
+
+from utils.metrics import registry
+
+
+class DbUsageStats:
+    """
+    Счётчики использования БД апдейтами — по ним подбираем
+    pool_size/max_overflow в DataBaseConfig.
+    """
+
+    def __init__(self):
+        self.updates = 0  # всего апдейтов прошло через middleware
+        self.db_updates = 0  # из них реально открывали сессию
+        self.in_flight = 0  # сессий открыто прямо сейчас
+        self.peak_in_flight = 0  # максимум одновременно открытых сессий
+
+    def snapshot(self) -> dict:
+        return {
+            "updates": self.updates,
+            "db_updates": self.db_updates,
+            "db_share": (
+                round(self.db_updates / self.updates, 4) if self.updates else 0.0
+            ),
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+        }
+
+
+# Ключи session.info: чьи счётчики и брала ли сессия соединение
+_STATS_KEY = "db_usage_stats"
+_USED_KEY = "db_usage_used"
+
+
+@event.listens_for(Session, "after_begin")
+def _count_connection(session: Session, transaction, connection) -> None:
+    """
+    AsyncSession берёт соединение из пула только при первом запросе —
+    здесь и отмечаем, что апдейт реально ходил в БД.
+    """
+    stats: Optional[DbUsageStats] = session.info.get(_STATS_KEY)
+    if stats is None or session.info.get(_USED_KEY):
+        return
+    session.info[_USED_KEY] = True
+    stats.db_updates += 1
+    stats.in_flight += 1
+    if stats.in_flight > stats.peak_in_flight:
+        stats.peak_in_flight = stats.in_flight
 
 
 class DbSessionMiddleware(BaseMiddleware):
-    def __init__(self, session_pool: async_sessionmaker):
+    def __init__(self, session_pool: async_sessionmaker, commit: bool = False):
         super().__init__()
         self.session_pool = session_pool
+        self.commit = commit
+        self.stats = DbUsageStats()
+        registry.counter(
+            "db_session_updates_total",
+            "Updates passed through DbSessionMiddleware by DB usage",
+            ("used",),
+            collect=lambda: {
+                ("yes",): self.stats.db_updates,
+                ("no",): self.stats.updates - self.stats.db_updates,
+            },
+        )
+        registry.gauge(
+            "db_sessions_in_flight",
+            "Open DB sessions (current and peak)",
+            ("kind",),
+            collect=lambda: {
+                ("current",): self.stats.in_flight,
+                ("peak",): self.stats.peak_in_flight,
+            },
+        )
 
     async def __call__(
         self,
@@ -16,6 +85,18 @@ class DbSessionMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any],
     ) -> Any:
-        async with self.session_pool() as session:
-            data["session"] = session
-            return await handler(event, data)
+        self.stats.updates += 1
+        # Обычная AsyncSession: соединение не берётся, пока хендлер не сделал
+        # запрос. Ошибка -> rollback при закрытии; успех -> commit, если
+        # включён autocommit, иначе незакоммиченное отбрасывается при close
+        session = self.session_pool(info={_STATS_KEY: self.stats})
+        try:
+            async with session:
+                data["session"] = session
+                result = await handler(event, data)
+                if self.commit and session.in_transaction():
+                    await session.commit()
+        finally:
+            if session.info.pop(_USED_KEY, False):
+                self.stats.in_flight -= 1
+        return result
@@ -1,14 +1,31 @@
-import time, contextvars, traceback
+import time, contextvars, random, traceback
 
 import structlog
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, Message, CallbackQuery, Update
+from aiogram.types.update import UpdateTypeLookupError
 from typing import Callable, Awaitable
 
+from utils.metrics import registry
+from utils.profiling import profiler
+
 
 request_id_var = contextvars.ContextVar("request_id", default=None)
+# Имя хендлера, выбранного aiogram (ставит HandlerTagMiddleware)
+handler_name_var = contextvars.ContextVar("handler_name", default=None)
 logger = structlog.get_logger("aiogram")
 
+HANDLER_LATENCY = registry.histogram(
+    "aiogram_handler_duration_seconds",
+    "Update processing latency",
+    ("update_type", "handler"),
+)
+HANDLER_ERRORS = registry.counter(
+    "aiogram_handler_errors_total",
+    "Updates finished with an exception",
+    ("update_type", "handler"),
+)
+
 
 def extract_ctx(event: TelegramObject) -> dict:
     chat_id = user_id = None
@@ -22,8 +39,20 @@ def extract_ctx(event: TelegramObject) -> dict:
         )
         user_id = event.from_user.id if event.from_user else None
     elif isinstance(event, Update):
-        # Aiogram сам кладёт Message/CallbackQuery в data, но на всякий
-        pass
+        # Разворачиваем вложенное событие (message, callback_query, ...)
+        try:
+            inner = event.event
+        except UpdateTypeLookupError:
+            inner = None
+        if inner is not None:
+            ctx = extract_ctx(inner)
+            ctx["update_type"] = event.event_type
+            return ctx
+    else:
+        chat = getattr(event, "chat", None)
+        user = getattr(event, "from_user", None)
+        chat_id = chat.id if chat else None
+        user_id = user.id if user else None
     return {
         "chat_id": chat_id,
         "user_id": user_id,
@@ -32,6 +61,16 @@ def extract_ctx(event: TelegramObject) -> dict:
 
 
 class LoggingContextMiddleware(BaseMiddleware):
+    """
+    sample_rate — доля апдейтов, для которых пишем handler_start/handler_done;
+    ошибки пишутся всегда, медленные (>= slow_ms) — всегда с handler_done.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, slow_ms: float | None = None):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+
     async def __call__(
         self,
         handler: Callable[[TelegramObject, dict], Awaitable],
@@ -40,19 +79,36 @@ class LoggingContextMiddleware(BaseMiddleware):
     ):
         start = time.perf_counter()
         ctx = extract_ctx(event)
+        handler_name_var.set(None)
         # request_id может быть положен в data["request_id"] в веб-хуке
         rid = data.get("request_id") or request_id_var.get()
         bind = logger.bind(
             request_id=rid, **{k: v for k, v in ctx.items() if v is not None}
         )
+        sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        profiling = profiler.active
+        if profiling:
+            profiler.tag(ctx["update_type"])
         try:
-            bind.info("handler_start")
+            if sampled:
+                bind.info("handler_start")
             result = await handler(event, data)
-            dur_ms = round((time.perf_counter() - start) * 1000, 2)
-            bind.info("handler_done", duration_ms=dur_ms)
+            elapsed = time.perf_counter() - start
+            HANDLER_LATENCY.labels(
+                ctx["update_type"], handler_name_var.get() or "unhandled"
+            ).observe(elapsed)
+            dur_ms = round(elapsed * 1000, 2)
+            if sampled:
+                bind.info("handler_done", duration_ms=dur_ms)
+            elif self.slow_ms is not None and dur_ms >= self.slow_ms:
+                bind.info("handler_done", duration_ms=dur_ms, slow=True)
             return result
         except Exception as e:
-            dur_ms = round((time.perf_counter() - start) * 1000, 2)
+            elapsed = time.perf_counter() - start
+            labels = (ctx["update_type"], handler_name_var.get() or "unhandled")
+            HANDLER_LATENCY.labels(*labels).observe(elapsed)
+            HANDLER_ERRORS.labels(*labels).inc()
+            dur_ms = round(elapsed * 1000, 2)
             bind.error(
                 "handler_error",
                 duration_ms=dur_ms,
@@ -66,3 +122,30 @@ class LoggingContextMiddleware(BaseMiddleware):
                 ctx,
             )
             raise
+        finally:
+            if profiling:
+                profiler.untag()
+
+
+class HandlerTagMiddleware(BaseMiddleware):
+    """
+    Inner-middleware: запоминает, какой хендлер выбрал aiogram, чтобы внешний
+    LoggingContextMiddleware мог подписать метрики именем хендлера.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict], Awaitable],
+        event: TelegramObject,
+        data: dict,
+    ):
+        handler_obj = data.get("handler")
+        if handler_obj is not None:
+            callback = handler_obj.callback
+            name = (
+                f"{callback.__module__}.{getattr(callback, '__qualname__', callback)}"
+            )
+            handler_name_var.set(name)
+            if profiler.active:
+                profiler.tag_handler(name)
+        return await handler(event, data)
@@ -1,29 +1,71 @@
 import time, uuid
 
-import structlog
-from starlette.types import ASGIApp, Receive, Scope, Send
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from utils.logger import get_logger
+from utils.metrics import registry
 from .logging_ctx import request_id_var
 
 logger = get_logger(__name__)
 
+HTTP_LATENCY = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency",
+    ("method", "route", "status"),
+)
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        rid = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:12]
+
+class RequestIDMiddleware:
+    """
+    Чистый ASGI-middleware: без BaseHTTPMiddleware, лишней таски и обёртки
+    над ответом. Проставляет request_id_var, добавляет X-Request-ID в
+    http.response.start и пишет http_access по завершении запроса.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rid = None
+        for key, value in scope["headers"]:
+            if key == b"x-request-id":
+                rid = value.decode("latin-1")
+                break
+        rid = rid or uuid.uuid4().hex[:12]
         request_id_var.set(rid)
+
+        status = 500
         start = time.perf_counter()
-        resp = await call_next(request)
-        dur_ms = round((time.perf_counter() - start) * 1000, 2)
-        resp.headers["X-Request-ID"] = rid
-        logger.info(
-            "http_access",
-            method=request.method,
-            path=request.url.path,
-            status=resp.status_code,
-            duration_ms=dur_ms,
-            request_id=rid,
-        )
-        return resp
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message)["X-Request-ID"] = rid
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            dur_ms = round(elapsed * 1000, 2)
+            # Шаблон роута, а не сырой путь — чтобы не раздувать кардинальность
+            route = scope.get("route")
+            HTTP_LATENCY.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status,
+            ).observe(elapsed)
+            logger.info(
+                "http_access",
+                method=scope["method"],
+                path=scope["path"],
+                status=status,
+                duration_ms=dur_ms,
+                request_id=rid,
+            )
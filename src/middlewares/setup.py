@@ -0,0 +1,61 @@
+from typing import Optional
+
+from aiogram import Dispatcher
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from admin.stats import StatsRecorder
+from core.config import settings
+from services.write_behind import WriteBehindBuffer
+from .activity import ActivityMiddleware
+from .database import DbSessionMiddleware
+from .logging_ctx import LoggingContextMiddleware, HandlerTagMiddleware
+from .stats import StatsMiddleware
+from .throttling import HandlerThrottlingMiddleware, RateLimiter, ThrottlingMiddleware
+
+
+def setup_middlewares(
+    dp: Dispatcher,
+    session_pool: async_sessionmaker,
+    stats: Optional[StatsRecorder] = None,
+    limiter: Optional[RateLimiter] = None,
+    activity: Optional[WriteBehindBuffer] = None,
+) -> DbSessionMiddleware:
+    """
+    Стек middleware диспетчера — общий для приложения и бенчмарков.
+    Возвращает DbSessionMiddleware (его статистика логируется на остановке).
+    """
+    # Антифлуд первым: отбитый апдейт не открывает сессию БД и не логируется
+    if limiter is not None:
+        dp.update.outer_middleware(ThrottlingMiddleware(limiter, settings.throttle))
+
+    # Активность пользователей: в буфер, а не UPDATE в БД на каждый апдейт
+    if activity is not None:
+        dp.update.outer_middleware(ActivityMiddleware(activity))
+
+    db_middleware = DbSessionMiddleware(
+        session_pool=session_pool,
+        commit=settings.db.session_autocommit,
+    )
+    dp.update.outer_middleware(db_middleware)
+
+    # loging_ctx
+    dp.update.outer_middleware(
+        LoggingContextMiddleware(
+            sample_rate=settings.log.handler_sample_rate,
+            slow_ms=settings.log.slow_handler_ms,
+        )
+    )
+
+    # Счётчики админ-статистики (нужен Redis)
+    if stats is not None:
+        dp.update.outer_middleware(StatsMiddleware(stats))
+
+    # Имя хендлера для метрик: inner-middleware на всех типах событий
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(HandlerTagMiddleware())
+            # Лимиты отдельных хендлеров (флаг rate_limit)
+            if limiter is not None:
+                observer.middleware(HandlerThrottlingMiddleware(limiter))
+
+    return db_middleware
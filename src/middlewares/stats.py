@@ -0,0 +1,42 @@
+from typing import Awaitable, Callable, Optional
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject, Update
+
+from admin.stats import StatsRecorder, command_of
+from routers.index import build_index
+from .logging_ctx import extract_ctx, handler_name_var
+
+
+class StatsMiddleware(BaseMiddleware):
+    """
+    Outer-middleware на update: после обработки отдаёт апдейт в счётчики
+    админ-статистики (admin/stats.py). Имя хендлера ставит HandlerTagMiddleware.
+    Список команд берётся из Command-фильтров роутеров при первом апдейте.
+    """
+
+    def __init__(self, recorder: StatsRecorder):
+        super().__init__()
+        self.recorder = recorder
+        self._commands: Optional[frozenset[str]] = None
+
+    def commands(self, dp: Dispatcher) -> frozenset[str]:
+        if self._commands is None:
+            self._commands = frozenset(build_index(dp, "message").commands)
+        return self._commands
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict], Awaitable],
+        event: TelegramObject,
+        data: dict,
+    ):
+        try:
+            return await handler(event, data)
+        finally:
+            if isinstance(event, Update):
+                self.recorder.submit(
+                    extract_ctx(event)["user_id"],
+                    command_of(event, self.commands(data["dispatcher"])),
+                    handler_name_var.get(),
+                )
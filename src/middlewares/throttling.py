@@ -0,0 +1,204 @@
+"""
+Антифлуд: GCRA-лимиты в Redis, одна проверка — один вызов Lua-скрипта.
+
+ThrottlingMiddleware (outer, update) стоит первым в стеке: отбитый апдейт
+не открывает сессию БД, не пишет логи и не доходит до хендлеров. Лимиты —
+на пользователя и на групповой чат, проверяются одним вызовом. Кого Redis
+уже отбил, тот до конца блокировки отсеивается локальным кэшем без запроса.
+
+HandlerThrottlingMiddleware (inner) — лимиты отдельных хендлеров из флага:
+    @router.message(Command("report"), flags={"rate_limit": {"rate": 1, "per": 30}})
+или
+    @flags.rate_limit(rate=3, per=60, scope="chat")
+
+Если Redis недоступен, апдейты пропускаются (fail open). Отбитый
+callback_query получает пустой answer(), чтобы у кнопки не висели «часики».
+"""
+
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, TelegramObject, Update
+from redis.asyncio import Redis
+
+from core.config import ThrottleConfig
+from utils.cache import TTLCache
+from utils.logger import get_logger
+from utils.metrics import registry
+from .logging_ctx import extract_ctx
+
+logger = get_logger(__name__)
+
+THROTTLE_REJECTED = registry.counter(
+    "throttle_rejected_total",
+    "Updates dropped by rate limits",
+    ("scope", "source"),
+)
+THROTTLE_ERRORS = registry.counter(
+    "throttle_errors_total",
+    "Rate limit checks that failed (update let through)",
+)
+THROTTLE_CHECK_DURATION = registry.histogram(
+    "throttle_check_duration_seconds",
+    "Rate limit script round trip",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+# GCRA по нескольким ключам сразу: апдейт проходит, только если укладывается
+# во все лимиты; иначе ни один лимит не расходуется.
+# KEYS: ключи лимитов; ARGV: пары (интервал_мс, допуск_мс) на каждый ключ
+# -> {1, 0, 0} или {0, через_сколько_мс, номер_нарушенного_ключа}
+_GCRA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local tats = {}
+for i, key in ipairs(KEYS) do
+    local emission = tonumber(ARGV[2 * i - 1])
+    local tolerance = tonumber(ARGV[2 * i])
+    local tat = math.max(tonumber(redis.call('GET', key) or 0), now)
+    local wait = tat - tolerance - now
+    if wait > 0 then
+        return {0, wait, i}
+    end
+    tats[i] = tat + emission
+end
+for i, key in ipairs(KEYS) do
+    redis.call('SET', key, tats[i], 'PX', tats[i] - now)
+end
+return {1, 0, 0}
+"""
+
+
+async def _reject(event: TelegramObject) -> None:
+    query = event.callback_query if isinstance(event, Update) else event
+    if not isinstance(query, CallbackQuery):
+        return
+    try:
+        await query.answer()
+    except Exception:
+        logger.warning("throttle_answer_failed", exc_info=True)
+
+
+class RateLimiter:
+    def __init__(self, redis: Redis, prefix: str = "throttle", cache_size: int = 10000):
+        self.redis = redis
+        self.prefix = prefix
+        self._script = redis.register_script(_GCRA)
+        # Заблокированные (scope, id): запись живёт ровно до конца блокировки
+        self.blocked: TTLCache[bool] = TTLCache(maxsize=cache_size)
+
+    async def hit(
+        self, limits: list[tuple[str, float, int]]
+    ) -> tuple[bool, float, int]:
+        """
+        limits — (ключ, событий в секунду, burst). Возвращает (разрешено,
+        через сколько секунд можно снова, индекс нарушенного лимита).
+        """
+        keys, args = [], []
+        for key, rate, burst in limits:
+            emission = 1000.0 / rate
+            keys.append(f"{self.prefix}:{key}")
+            args += [int(emission), int(emission * (max(1, burst) - 1))]
+        started = time.perf_counter()
+        allowed, wait_ms, index = await self._script(keys=keys, args=args)
+        THROTTLE_CHECK_DURATION.observe(time.perf_counter() - started)
+        return bool(allowed), max(int(wait_ms), 1) / 1000, int(index) - 1
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    def __init__(self, limiter: RateLimiter, cfg: ThrottleConfig):
+        super().__init__()
+        self.limiter = limiter
+        self.cfg = cfg
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict], Awaitable],
+        event: TelegramObject,
+        data: dict,
+    ):
+        ctx = extract_ctx(event)
+        user_id, chat_id = ctx["user_id"], ctx["chat_id"]
+        blocked = self.limiter.blocked
+        scopes: list[tuple[str, int]] = []
+        limits: list[tuple[str, float, int]] = []
+        if user_id is not None:
+            scopes.append(("user", user_id))
+            limits.append((f"u:{user_id}", self.cfg.user_rate, self.cfg.user_burst))
+        # В личке chat_id == user_id — отдельный лимит чата не нужен
+        if chat_id is not None and chat_id != user_id:
+            scopes.append(("chat", chat_id))
+            limits.append((f"c:{chat_id}", self.cfg.chat_rate, self.cfg.chat_burst))
+        if not limits:
+            return await handler(event, data)
+
+        for scope in scopes:
+            if scope in blocked:
+                THROTTLE_REJECTED.labels(scope[0], "local").inc()
+                return await _reject(event)
+
+        try:
+            allowed, retry_after, index = await self.limiter.hit(limits)
+        except Exception:
+            THROTTLE_ERRORS.inc()
+            logger.warning("throttle_check_failed", exc_info=True)
+            return await handler(event, data)
+        if not allowed:
+            scope = scopes[index]
+            blocked.set(scope, True, ttl=retry_after)
+            THROTTLE_REJECTED.labels(scope[0], "redis").inc()
+            return await _reject(event)
+        return await handler(event, data)
+
+
+class HandlerThrottlingMiddleware(BaseMiddleware):
+    """
+    Inner-middleware: флаг rate_limit хендлера — {rate, per=1.0, burst=rate,
+    scope="user"|"chat"}. Без флага — ноль запросов к Redis.
+    """
+
+    def __init__(self, limiter: RateLimiter):
+        super().__init__()
+        self.limiter = limiter
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict], Awaitable],
+        event: TelegramObject,
+        data: dict,
+    ):
+        spec: Optional[dict[str, Any]] = get_flag(data, "rate_limit")
+        if not spec:
+            return await handler(event, data)
+        scope = spec.get("scope", "user")
+        ctx = extract_ctx(event)
+        target = ctx["chat_id"] if scope == "chat" else ctx["user_id"]
+        if target is None:
+            return await handler(event, data)
+
+        callback = data["handler"].callback
+        name = f"{callback.__module__}.{getattr(callback, '__qualname__', callback)}"
+        cache_key = (name, target)
+        blocked = self.limiter.blocked
+        if cache_key in blocked:
+            THROTTLE_REJECTED.labels("handler", "local").inc()
+            return await _reject(event)
+
+        rate = spec["rate"]
+        per = spec.get("per", 1.0)
+        burst = spec.get("burst", rate)
+        try:
+            allowed, retry_after, _ = await self.limiter.hit(
+                [(f"h:{name}:{target}", rate / per, burst)]
+            )
+        except Exception:
+            THROTTLE_ERRORS.inc()
+            logger.warning("throttle_check_failed", exc_info=True)
+            return await handler(event, data)
+        if not allowed:
+            blocked.set(cache_key, True, ttl=retry_after)
+            THROTTLE_REJECTED.labels("handler", "redis").inc()
+            return await _reject(event)
+        return await handler(event, data)
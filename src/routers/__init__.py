@@ -0,0 +1,44 @@
+"""
+Роутеры проекта: каждый модуль src/routers/<name>.py с атрибутом router
+подключается автоматически. Модули импортируются только в register_routers,
+так что импорт пакета (скрипты, alembic, бенчмарки) их не тянет. Порядок —
+по PRIORITY модуля (по умолчанию 100), затем по имени: catch-all хендлеры
+ставьте в модули с большим PRIORITY (см. routers/index.py).
+"""
+
+import importlib
+import pkgutil
+
+from aiogram import Dispatcher, Router
+
+from .index import install_fast_routing
+
+DEFAULT_PRIORITY = 100
+
+
+def discover() -> list[str]:
+    """Имена модулей пакета — без импорта."""
+    return sorted(
+        name
+        for _, name, _ in pkgutil.iter_modules(__path__)
+        if not name.startswith("_") and name != "index"
+    )
+
+
+def load_routers() -> list[Router]:
+    modules = [importlib.import_module(f"{__name__}.{name}") for name in discover()]
+    modules = [m for m in modules if isinstance(getattr(m, "router", None), Router)]
+    modules.sort(key=lambda m: (getattr(m, "PRIORITY", DEFAULT_PRIORITY), m.__name__))
+    return [m.router for m in modules]
+
+
+def register_routers(dp: Dispatcher) -> None:
+    """Подключение aiogram-роутеров проекта к диспетчеру."""
+    from admin import router as admin_router
+
+    dp.include_router(admin_router)
+    for router in load_routers():
+        dp.include_router(router)
+
+    # Команды и callback_data — по индексу, а не перебором фильтров
+    install_fast_routing(dp)
@@ -0,0 +1,264 @@
+"""
+Индекс хендлеров для быстрой маршрутизации message/callback_query.
+
+aiogram перебирает хендлеры по порядку и у каждого вызывает фильтры, так что
+стоимость маршрутизации растёт с их числом. Индекс строится один раз (при
+первом апдейте) обходом роутеров в том же порядке, что и propagate_event:
+  message        — Command/CommandStart -> hash-map по имени команды;
+  callback_query — CallbackData.filter() или флаг callback_prefix
+                   -> префиксное дерево по callback_data.
+Остальные хендлеры («неиндексируемые»: состояния, F.text, ...) могут поймать
+что угодно, поэтому кандидаты для ключа — хендлеры этого ключа плюс все
+неиндексируемые, в исходном порядке. У кандидатов проверяются те же фильтры
+(роутера и хендлера), вызываются они через те же inner-middleware, так что
+результат совпадает с обычной маршрутизацией; хендлеры других ключей
+заведомо не подходят и не проверяются. Апдейтам без ключа (не команда, нет
+подходящего префикса) достаются только неиндексируемые хендлеры.
+
+Хендлеры с произвольным фильтром по callback_data индексируются флагом:
+    @router.callback_query(F.data.startswith("menu:"), flags={"callback_prefix": "menu:"})
+Catch-all хендлеры лучше держать в роутерах, подключённых последними.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+from aiogram import BaseMiddleware, Dispatcher, Router
+from aiogram.dispatcher.event.bases import UNHANDLED, SkipHandler
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.dispatcher.middlewares.manager import MiddlewareManager
+from aiogram.filters import Command
+from aiogram.filters.callback_data import CallbackQueryFilter
+from aiogram.types import BotCommand, CallbackQuery, Message, TelegramObject
+
+from utils.logger import get_logger
+from utils.metrics import registry
+
+logger = get_logger(__name__)
+
+FAST_ROUTING = registry.counter(
+    "routing_fast_path_total",
+    "Updates routed through the handler index",
+    ("event", "result"),
+)
+
+
+@dataclass(slots=True, eq=False)
+class _Route:
+    pos: int
+    handler: HandlerObject
+    observer: TelegramEventObserver
+    chain: tuple[Router, ...]  # от диспетчера до роутера хендлера
+    # Вложенный роутер со своим outer-middleware — только обычным путём
+    fast: bool = True
+
+
+@dataclass(slots=True)
+class _TrieNode:
+    children: dict[str, "_TrieNode"] = field(default_factory=dict)
+    routes: list[_Route] = field(default_factory=list)
+
+
+class _Index:
+    def __init__(self):
+        self.commands: dict[str, list[_Route]] = {}
+        self.prefixes: set[str] = set()
+        self.trie = _TrieNode()
+        self.generic: list[_Route] = []  # неиндексируемые, по порядку
+
+    def candidates(self, routes: list[_Route]) -> list[_Route]:
+        if not self.generic:
+            return routes
+        return sorted(self.generic + routes, key=lambda r: r.pos)
+
+    def finalize(self) -> None:
+        # Списки кандидатов для команд считаются заранее, на апдейт — только dict.get
+        self.commands = {
+            name: self.candidates(routes) for name, routes in self.commands.items()
+        }
+
+    def add_prefix(self, prefix: str, route: _Route) -> None:
+        node = self.trie
+        for char in prefix:
+            node = node.children.setdefault(char, _TrieNode())
+        node.routes.append(route)
+
+    def match_prefix(self, data: str) -> list[_Route]:
+        node = self.trie
+        found = list(node.routes)
+        for char in data:
+            node = node.children.get(char)
+            if node is None:
+                break
+            found.extend(node.routes)
+        if not found:
+            return found
+        return self.candidates(found)
+
+
+def _filters(handler: HandlerObject) -> list:
+    return [f.callback for f in handler.filters or ()]
+
+
+def _command_names(handler: HandlerObject) -> Optional[tuple[set[str], set[str]]]:
+    for flt in _filters(handler):
+        if isinstance(flt, Command):
+            names = set()
+            for cmd in flt.commands:
+                if isinstance(cmd, re.Pattern):
+                    return None
+                names.add((cmd.command if isinstance(cmd, BotCommand) else cmd).lower())
+            return names, set(flt.prefix)
+    return None
+
+
+def _callback_prefixes(handler: HandlerObject) -> Optional[list[str]]:
+    flag = handler.flags.get("callback_prefix")
+    if flag:
+        return [flag] if isinstance(flag, str) else list(flag)
+    for flt in _filters(handler):
+        if isinstance(flt, CallbackQueryFilter):
+            return [flt.callback_data.__prefix__]
+    return None
+
+
+def build_index(dp: Dispatcher, event: str) -> _Index:
+    index = _Index()
+    pos = 0
+
+    def walk(router: Router, chain: tuple[Router, ...]) -> None:
+        nonlocal pos
+        chain = chain + (router,)
+        observer = router.observers[event]
+        fast = all(
+            not r.observers[event].outer_middleware for r in chain if r is not dp
+        )
+        for handler in observer.handlers:
+            route = _Route(pos, handler, observer, chain, fast)
+            pos += 1
+            if event == "message" and (found := _command_names(handler)):
+                names, prefixes = found
+                index.prefixes |= prefixes
+                for name in names:
+                    index.commands.setdefault(name, []).append(route)
+            elif event == "callback_query" and (found := _callback_prefixes(handler)):
+                for prefix in found:
+                    index.add_prefix(prefix, route)
+            else:
+                index.generic.append(route)
+        for sub in router.sub_routers:
+            walk(sub, chain)
+
+    walk(dp, ())
+    index.finalize()
+    return index
+
+
+class FastRoutingMiddleware(BaseMiddleware):
+    """
+    Outer-middleware диспетчера на message/callback_query: кандидаты из
+    индекса вместо перебора всех хендлеров. Индекс строится лениво, чтобы
+    учесть роутеры, подключённые после register_routers; rebuild() — сбросить.
+
+    На быстром пути handler не вызывается, так что outer-middleware,
+    добавленные на dp.message / dp.callback_query позже, были бы пропущены.
+    Поэтому этот middleware держится последним в цепочке: обнаружив
+    добавленные после него, он переставляет себя в конец (со следующего
+    апдейта), а текущий апдейт отдаёт обычному пути.
+    """
+
+    def __init__(self, dp: Dispatcher, event: str):
+        super().__init__()
+        self.dp = dp
+        self.event = event
+        self._index: Optional[_Index] = None
+
+    def rebuild(self) -> None:
+        self._index = None
+
+    @property
+    def index(self) -> _Index:
+        if self._index is None:
+            self._index = build_index(self.dp, self.event)
+            logger.info(
+                "router_index_built",
+                update_type=self.event,
+                commands=len(self._index.commands),
+                generic=len(self._index.generic),
+            )
+        return self._index
+
+    def _ensure_last(self) -> bool:
+        manager = self.dp.observers[self.event].outer_middleware
+        if manager[-1] is self:
+            return True
+        manager.unregister(self)
+        manager.register(self)
+        logger.info("fast_routing_moved_last", update_type=self.event)
+        return False
+
+    def _lookup(self, event: TelegramObject) -> list[_Route]:
+        index = self.index
+        if isinstance(event, Message):
+            text = event.text or event.caption
+            if not text or text[0] not in index.prefixes:
+                return index.generic
+            name = text.split(maxsplit=1)[0][1:].split("@", 1)[0].lower()
+            return index.commands.get(name, index.generic)
+        if isinstance(event, CallbackQuery) and event.data:
+            return index.match_prefix(event.data) or index.generic
+        return index.generic
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict], Awaitable],
+        event: TelegramObject,
+        data: dict,
+    ):
+        if not self._ensure_last():
+            FAST_ROUTING.labels(self.event, "fallback").inc()
+            return await handler(event, data)
+        routes = self._lookup(event)
+
+        # Фильтры роутеров считаются один раз на апдейт, как в propagate_event
+        roots: dict[Router, tuple[bool, dict[str, Any]]] = {}
+        for route in routes:
+            if not route.fast:
+                FAST_ROUTING.labels(self.event, "fallback").inc()
+                return await handler(event, data)
+            kwargs = data
+            for router in route.chain:
+                if router not in roots:
+                    roots[router] = await router.observers[
+                        self.event
+                    ].check_root_filters(event, **kwargs)
+                passed, kwargs = roots[router]
+                if not passed:
+                    break
+            else:
+                kwargs = {**kwargs, "event_router": route.chain[-1]}
+                kwargs["handler"] = route.handler
+                passed, kwargs = await route.handler.check(event, **kwargs)
+                if not passed:
+                    continue
+                wrapped = MiddlewareManager.wrap_middlewares(
+                    route.observer._resolve_middlewares(), route.handler.call
+                )
+                try:
+                    result = await wrapped(event, kwargs)
+                except SkipHandler:
+                    continue
+                FAST_ROUTING.labels(self.event, "hit").inc()
+                return result
+
+        # Проверены все, кто мог подойти, — обычный путь тоже ничего не найдёт
+        FAST_ROUTING.labels(self.event, "unhandled").inc()
+        return UNHANDLED
+
+
+def install_fast_routing(dp: Dispatcher) -> None:
+    """Outer-middleware на dp.message / dp.callback_query добавляйте до вызова."""
+    for event in ("message", "callback_query"):
+        dp.observers[event].outer_middleware(FastRoutingMiddleware(dp, event))
@@ -0,0 +1,401 @@
+import asyncio, json, time
+from typing import AsyncIterable, Iterable, Optional, Union
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramEntityTooLarge,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from redis.asyncio import Redis
+
+from services.leader import RedisLease
+from utils.bot_session import without_retry
+from utils.cache import TTLCache
+from utils.logger import get_logger
+from utils.metrics import registry
+
+logger = get_logger(__name__)
+
+BROADCAST_MESSAGES = registry.counter(
+    "broadcast_messages_total",
+    "Broadcast deliveries by outcome",
+    ("status",),
+)
+BROADCAST_RETRY_AFTER = registry.counter(
+    "broadcast_retry_after_total",
+    "RetryAfter responses received during broadcasts",
+)
+
+
+def _str_keys(mapping: dict) -> dict:
+    # Клиент может быть с decode_responses=False — приводим ключи к str
+    return {k.decode() if isinstance(k, bytes) else k: v for k, v in mapping.items()}
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, запас не больше capacity."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        """Заморозить выдачу токенов (flood-wait от Telegram)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    @property
+    def paused(self) -> bool:
+        return time.monotonic() < self._paused_until
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Broadcaster:
+    """
+    Рассылка с ограничением скорости и возобновлением после рестарта.
+
+    Прогресс хранится в Redis:
+      bc:{id}:meta     — hash: payload, total, started_at,
+                         status (created/running/paused/done/failed)
+      bc:{id}:pending  — list chat_id, ещё не обработанных
+      bc:{id}:inflight — list chat_id, взятых отправителями (после падения
+                         процесса возвращаются в pending при старте; при штатной
+                         остановке или ошибке считаются failed — без дублей)
+      bc:{id}:stats    — hash: sent/failed/blocked
+      bc:{id}:lease    — аренда (RedisLease) процесса, который ведёт рассылку
+      bc:active        — set id незавершённых рассылок
+
+    Запускает рассылки только лидер: watch() (из on_elected) забирает новые
+    id из bc:active, create() лишь регистрирует рассылку. Каждый прогон держит
+    аренду bc:{id}:lease, так что рассылку ведёт один процесс, а inflight
+    возвращается в pending только тем, кто взял аренду, — то есть когда
+    прежний владелец остановился или его аренда истекла. Не сумевший продлить
+    аренду владелец останавливает отправителей, не трогая прогресс.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        redis: Redis,
+        global_rate: float = 25.0,
+        per_chat_rate: float = 1.0,
+        concurrency: int = 8,
+        max_retries: int = 3,
+        progress_interval: float = 10.0,
+        lease_ttl: float = 30.0,
+        poll_interval: float = 5.0,
+    ):
+        self.bot = bot
+        self.redis = redis
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.progress_interval = progress_interval
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self.per_chat_rate = per_chat_rate
+        self._global = TokenBucket(global_rate)
+        self._per_chat: TTLCache[TokenBucket] = TTLCache(maxsize=100_000, ttl=60)
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._watcher: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _key(broadcast_id: str, part: str) -> str:
+        return f"bc:{broadcast_id}:{part}"
+
+    async def create(
+        self,
+        broadcast_id: str,
+        chat_ids: Union[Iterable[int], AsyncIterable[int]],
+        payload: dict,
+    ) -> int:
+        """
+        Регистрирует рассылку. payload — {"text": ...} или
+        {"from_chat_id": ..., "message_id": ...} для copy_message.
+        chat_ids может быть асинхронным (потоковое чтение из БД) — в Redis
+        они уходят пачками по 1000, весь список в памяти не держится.
+        Запустит рассылку лидер (watch); в bc:active она попадает последней.
+        """
+        if await self.redis.exists(self._key(broadcast_id, "meta")):
+            raise ValueError(f"broadcast {broadcast_id!r} already exists")
+        pending = self._key(broadcast_id, "pending")
+        # Остатки прерванного create() не должны задвоить получателей
+        await self.redis.delete(pending)
+        total = 0
+        chunk: list[int] = []
+
+        async def flush() -> None:
+            nonlocal total, chunk
+            if chunk:
+                await self.redis.rpush(pending, *chunk)
+                total += len(chunk)
+                chunk = []
+
+        if isinstance(chat_ids, AsyncIterable):
+            async for chat_id in chat_ids:
+                chunk.append(chat_id)
+                if len(chunk) >= 1000:
+                    await flush()
+        else:
+            for chat_id in chat_ids:
+                chunk.append(chat_id)
+                if len(chunk) >= 1000:
+                    await flush()
+        await flush()
+        await self.redis.hset(
+            self._key(broadcast_id, "meta"),
+            mapping={
+                "payload": json.dumps(payload, ensure_ascii=False),
+                "total": total,
+                "status": "created",
+            },
+        )
+        await self.redis.sadd("bc:active", broadcast_id)
+        return total
+
+    def start(self, broadcast_id: str) -> asyncio.Task:
+        task = self._tasks.get(broadcast_id)
+        if task is None or task.done():
+            task = asyncio.create_task(
+                self.run(broadcast_id), name=f"broadcast-{broadcast_id}"
+            )
+            self._tasks[broadcast_id] = task
+        return task
+
+    async def resume_all(self) -> None:
+        """Запустить (продолжить) все незавершённые рассылки из bc:active."""
+        for broadcast_id in await self.redis.smembers("bc:active"):
+            if isinstance(broadcast_id, bytes):
+                broadcast_id = broadcast_id.decode()
+            self.start(broadcast_id)
+
+    def watch(self) -> None:
+        """Только у лидера: подхватывать рассылки, созданные на любой реплике."""
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.create_task(self._watch(), name="broadcast-watch")
+
+    async def _watch(self) -> None:
+        while True:
+            try:
+                await self.resume_all()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("broadcast_watch_failed", exc_info=True)
+            await asyncio.sleep(self.poll_interval)
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        if self._watcher is not None:
+            tasks.append(self._watcher)
+            self._watcher = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def run(self, broadcast_id: str) -> Optional[dict]:
+        """Прогон рассылки; None — её ведёт другой процесс (аренда занята)."""
+        meta_key = self._key(broadcast_id, "meta")
+        raw = await self.redis.hget(meta_key, "payload")
+        if raw is None:
+            raise LookupError(f"broadcast {broadcast_id!r} not found")
+        payload = json.loads(raw)
+
+        lease = RedisLease(
+            self.redis, self._key(broadcast_id, "lease"), ttl=self.lease_ttl
+        )
+        if not await lease.acquire():
+            return None
+
+        # Аренда наша — прежний владелец остановлен или умер: всё, что было
+        # у него «в полёте», — обратно в очередь
+        pending = self._key(broadcast_id, "pending")
+        inflight = self._key(broadcast_id, "inflight")
+        while await self.redis.lmove(inflight, pending, "RIGHT", "LEFT") is not None:
+            pass
+
+        await self.redis.hset(meta_key, "status", "running")
+        await self.redis.hsetnx(meta_key, "started_at", time.time())
+        lost = asyncio.Event()
+        keeper = asyncio.create_task(
+            self._keep(broadcast_id, lease, lost, asyncio.current_task())
+        )
+        reporter = asyncio.create_task(self._report(broadcast_id))
+        status = "failed"
+        try:
+            # TaskGroup: упавший отправитель отменяет остальных
+            async with asyncio.TaskGroup() as group:
+                for _ in range(self.concurrency):
+                    group.create_task(self._sender(broadcast_id, payload))
+            status = "done"
+        except asyncio.CancelledError:
+            if not lost.is_set():
+                # Остановка сервиса: рассылка остаётся в bc:active до resume_all
+                status = "paused"
+                raise
+            # Аренда потеряна: прогресс теперь у нового владельца
+            asyncio.current_task().uncancel()
+            status = None
+        finally:
+            keeper.cancel()
+            reporter.cancel()
+            if status is not None:
+                await self._finish(broadcast_id, status)
+                try:
+                    await lease.release()
+                except Exception:
+                    logger.warning("broadcast_release_failed", exc_info=True)
+        if status is None:
+            return None
+        progress = await self.progress(broadcast_id)
+        logger.info("broadcast_done", broadcast_id=broadcast_id, **progress)
+        return progress
+
+    async def _keep(
+        self,
+        broadcast_id: str,
+        lease: RedisLease,
+        lost: asyncio.Event,
+        owner: asyncio.Task,
+    ) -> None:
+        """
+        Продление аренды раз в lease_ttl/3. Не продлили (или Redis молчит
+        дольше 2/3 ttl) — отправители останавливаются до того, как аренду
+        возьмёт другой процесс.
+        """
+        renewed_at = time.monotonic()
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            try:
+                if not await lease.renew():
+                    break
+                renewed_at = time.monotonic()
+            except Exception:
+                logger.warning("broadcast_renew_failed", exc_info=True)
+                if time.monotonic() - renewed_at > self.lease_ttl * 2 / 3:
+                    break
+        logger.warning("broadcast_lease_lost", broadcast_id=broadcast_id)
+        lost.set()
+        owner.cancel()
+
+    async def _finish(self, broadcast_id: str, status: str) -> None:
+        # Чаты из inflight могли уже получить сообщение: повтор после
+        # resume дал бы дубль, поэтому они засчитываются как failed
+        inflight = self._key(broadcast_id, "inflight")
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.llen(inflight)
+            pipe.delete(inflight)
+            lost, _ = await pipe.execute()
+        if lost:
+            await self.redis.hincrby(self._key(broadcast_id, "stats"), "failed", lost)
+            BROADCAST_MESSAGES.labels("failed").inc(lost)
+        await self.redis.hset(self._key(broadcast_id, "meta"), "status", status)
+        if status != "paused":
+            await self.redis.srem("bc:active", broadcast_id)
+        if status == "failed":
+            logger.error("broadcast_failed", broadcast_id=broadcast_id, inflight=lost)
+
+    async def _sender(self, broadcast_id: str, payload: dict) -> None:
+        pending = self._key(broadcast_id, "pending")
+        inflight = self._key(broadcast_id, "inflight")
+        stats = self._key(broadcast_id, "stats")
+        while True:
+            raw = await self.redis.lmove(pending, inflight, "LEFT", "RIGHT")
+            if raw is None:
+                return
+            status = await self._deliver(int(raw), payload)
+            await self.redis.hincrby(stats, status, 1)
+            await self.redis.lrem(inflight, 1, raw)
+            BROADCAST_MESSAGES.labels(status).inc()
+
+    async def _deliver(self, chat_id: int, payload: dict) -> str:
+        chat_bucket = self._per_chat.get(chat_id)
+        if chat_bucket is None:
+            chat_bucket = TokenBucket(self.per_chat_rate, capacity=1)
+            self._per_chat.set(chat_id, chat_bucket)
+
+        for attempt in range(self.max_retries + 1):
+            # Между токеном чата и отправкой не должно быть ожиданий, иначе
+            # два сообщения в один чат уходят вместе. Если пока ждали чат,
+            # пришёл flood-wait, — токены берутся заново после паузы
+            while True:
+                await self._global.acquire()
+                await chat_bucket.acquire()
+                if not self._global.paused:
+                    break
+            try:
+                # Повторы — в этом цикле: flood-wait тормозит всех отправителей,
+                # а не один вызов, как в RetryMiddleware сессии
+                with without_retry():
+                    if "message_id" in payload:
+                        await self.bot.copy_message(
+                            chat_id=chat_id,
+                            from_chat_id=payload["from_chat_id"],
+                            message_id=payload["message_id"],
+                        )
+                    else:
+                        await self.bot.send_message(chat_id, payload["text"])
+                return "sent"
+            except TelegramRetryAfter as e:
+                # Flood-wait глобальный: притормаживаем всех отправителей
+                BROADCAST_RETRY_AFTER.inc()
+                self._global.pause(e.retry_after)
+            except TelegramForbiddenError:
+                return "blocked"
+            except TelegramEntityTooLarge:
+                return "failed"
+            except (TelegramServerError, TelegramNetworkError):
+                # 5xx и обрывы — временные, повтор с backoff
+                await asyncio.sleep(min(2**attempt, 30))
+            except TelegramAPIError as e:
+                # BadRequest, NotFound, MigrateToChat, ... — этому чату не доставить
+                logger.info("broadcast_send_failed", chat_id=chat_id, error=repr(e))
+                return "failed"
+        return "failed"
+
+    async def progress(self, broadcast_id: str) -> dict:
+        meta = _str_keys(await self.redis.hgetall(self._key(broadcast_id, "meta")))
+        stats = _str_keys(await self.redis.hgetall(self._key(broadcast_id, "stats")))
+        total = int(meta.get("total", 0))
+        sent = int(stats.get("sent", 0))
+        failed = int(stats.get("failed", 0)) + int(stats.get("blocked", 0))
+        done = sent + failed
+        started = float(meta.get("started_at", 0) or 0)
+        elapsed = time.time() - started if started else 0.0
+        rate = done / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, total - done)
+        return {
+            "total": total,
+            "sent": sent,
+            "failed": failed,
+            "remaining": remaining,
+            "rate_per_s": round(rate, 2),
+            "eta_s": round(remaining / rate) if rate else None,
+        }
+
+    async def _report(self, broadcast_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            progress = await self.progress(broadcast_id)
+            logger.info("broadcast_progress", broadcast_id=broadcast_id, **progress)
@@ -0,0 +1,311 @@
+import asyncio, functools, json, time, uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+from apscheduler.executors.asyncio import AsyncIOExecutor
+from redis.asyncio import Redis
+
+from services.leader import RedisLease
+from utils.logger import get_logger
+from utils.metrics import registry
+
+logger = get_logger(__name__)
+
+JOB_LOCK_SKIPPED = registry.counter(
+    "scheduler_job_lock_skipped_total",
+    "Job runs skipped because another replica holds the run lock",
+    ("job",),
+)
+JOB_CHUNKS = registry.counter(
+    "scheduler_job_chunks_total",
+    "Fan-out chunks processed by this replica",
+    ("job", "status"),
+)
+JOB_CHUNK_DURATION = registry.histogram(
+    "scheduler_job_chunk_duration_seconds",
+    "Fan-out chunk run time",
+    ("job",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0),
+)
+
+ChunkHandler = Callable[..., Awaitable[None]]
+
+# Задача и её плановые запуски в текущем вызове — ставит RunContextExecutor
+_current_run: ContextVar[Optional[tuple]] = ContextVar("job_run", default=None)
+
+
+class RunContextExecutor(AsyncIOExecutor):
+    """
+    AsyncIOExecutor, который передаёт задаче id и плановое время запуска:
+    по ним exclusive ставит блокировку на конкретный запуск, а не на имя.
+    """
+
+    def _do_submit_job(self, job, run_times):
+        # Задача создаётся внутри super() и копирует контекст в этот момент
+        token = _current_run.set((job, list(run_times)))
+        try:
+            return super()._do_submit_job(job, run_times)
+        finally:
+            _current_run.reset(token)
+
+
+def _scheduled_run() -> Optional[tuple[str, datetime, Optional[int]]]:
+    """(job.id, плановое время, misfire_grace_time) текущего запуска."""
+    run = _current_run.get()
+    if run is None:
+        return None
+    job, run_times = run
+    if not run_times:
+        return None
+    # При coalesce=False задача вызывается по разу на каждое время; времена,
+    # пропущенные по misfire_grace_time, APScheduler не вызывает
+    grace = job.misfire_grace_time
+    now = datetime.now(timezone.utc)
+    while len(run_times) > 1 and grace is not None:
+        if (now - run_times[0]).total_seconds() <= grace:
+            break
+        run_times.pop(0)
+    return job.id, run_times.pop(0), grace
+
+
+class JobCoordinator:
+    """
+    Координация задач планировщика между репликами через Redis.
+
+    exclusive — запуск cron-задачи ровно одной репликой. Под планировщиком
+    (RunContextExecutor) блокировка ставится на job.id + плановое время
+    запуска и не снимается, пока не истечёт окно misfire: реплика с
+    отстающими часами увидит тот же запуск занятым. Вне планировщика —
+    блокировка по имени на время выполнения (lock_at_most) плюс lock_at_least.
+
+    fan_out/chunk_handler — тяжёлая задача режется на чанки, которые
+    разбирают chunk-воркеры всех реплик. Доставка at-least-once: воркер
+    берёт чанк BLMOVE в свой processing-список, а чанки упавшей реплики
+    (её heartbeat истёк) возвращаются в очередь, поэтому обработчик должен
+    быть идемпотентным. Чанки без обработчика и исчерпавшие попытки уходят
+    в jobs:chunks:dead.
+    """
+
+    queue_key = "jobs:chunks"
+    dead_key = "jobs:chunks:dead"
+    workers_key = "jobs:workers"
+    heartbeat_ttl = 30.0
+    max_attempts = 3
+
+    def __init__(self):
+        self.redis: Optional[Redis] = None
+        self.instance_id = uuid.uuid4().hex
+        self._handlers: dict[str, ChunkHandler] = {}
+        self._workers: list[asyncio.Task] = []
+
+    def bind(self, redis: Optional[Redis]) -> None:
+        self.redis = redis
+
+    @property
+    def processing_key(self) -> str:
+        return f"jobs:chunks:processing:{self.instance_id}"
+
+    def exclusive(
+        self,
+        lock_at_most: float,
+        lock_at_least: float = 0.0,
+        name: Optional[str] = None,
+    ):
+        def decorator(func):
+            lock_name = name or f"{func.__module__}.{func.__qualname__}"
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if self.redis is None:
+                    return await func(*args, **kwargs)
+                run = _scheduled_run()
+                if run is not None:
+                    job_id, run_time, grace = run
+                    # Ключ не снимается: он должен пережить окно, в котором
+                    # другая реплика ещё может запустить этот же запуск
+                    ttl = max(lock_at_most, lock_at_least, (grace or 0) + 60)
+                    key = f"jobs:lock:{job_id}:{int(run_time.timestamp())}"
+                    if not await RedisLease(self.redis, key, ttl).acquire():
+                        JOB_LOCK_SKIPPED.labels(lock_name).inc()
+                        return None
+                    return await func(*args, **kwargs)
+
+                lease = RedisLease(self.redis, f"jobs:lock:{lock_name}", lock_at_most)
+                if not await lease.acquire():
+                    JOB_LOCK_SKIPPED.labels(lock_name).inc()
+                    return None
+                start = time.monotonic()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    held = time.monotonic() - start
+                    if held < lock_at_least:
+                        await lease.renew(lock_at_least - held)
+                    else:
+                        await lease.release()
+
+            return wrapper
+
+        return decorator
+
+    def chunk_handler(self, name: str):
+        """Регистрирует обработчик чанка: async fn(index, total, **params)."""
+
+        def decorator(func: ChunkHandler) -> ChunkHandler:
+            self._handlers[name] = func
+            return func
+
+        return decorator
+
+    async def fan_out(self, name: str, chunks: int, **params) -> str:
+        """
+        Ставит chunks чанков задачи name в общую очередь, возвращает run_id.
+        Без Redis чанки выполняются здесь же, по очереди.
+        """
+        run_id = uuid.uuid4().hex[:12]
+        if self.redis is None:
+            handler = self._handlers.get(name)
+            if handler is None:
+                raise LookupError(f"no chunk handler registered for {name!r}")
+            for i in range(chunks):
+                await handler(i, chunks, **params)
+            return run_id
+        items = [
+            json.dumps(
+                {
+                    "name": name,
+                    "run_id": run_id,
+                    "index": i,
+                    "total": chunks,
+                    "params": params,
+                    "attempt": 0,
+                }
+            )
+            for i in range(chunks)
+        ]
+        if items:
+            await self.redis.rpush(self.queue_key, *items)
+        logger.info("job_fan_out", job=name, run_id=run_id, chunks=chunks)
+        return run_id
+
+    def start_workers(self, concurrency: int) -> None:
+        if self.redis is None:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"job-chunks-{i}")
+            for i in range(concurrency)
+        ]
+        self._workers.append(
+            asyncio.create_task(self._heartbeat(), name="job-chunks-heartbeat")
+        )
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        if self._workers:
+            # Недоделанные чанки — обратно в очередь, не дожидаясь reclaim
+            try:
+                await self._requeue(self.instance_id)
+                await self.redis.srem(self.workers_key, self.instance_id)
+                await self.redis.delete(f"{self.workers_key}:{self.instance_id}")
+            except Exception:
+                logger.warning("job_chunks_requeue_failed", exc_info=True)
+        self._workers = []
+
+    async def _heartbeat(self) -> None:
+        alive = f"{self.workers_key}:{self.instance_id}"
+        while True:
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.set(alive, 1, ex=int(self.heartbeat_ttl))
+                    pipe.sadd(self.workers_key, self.instance_id)
+                    await pipe.execute()
+                await self._reclaim()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("job_chunks_heartbeat_failed", exc_info=True)
+            await asyncio.sleep(self.heartbeat_ttl / 3)
+
+    async def _reclaim(self) -> None:
+        """Чанки реплик, чей heartbeat истёк, — обратно в очередь."""
+        for instance_id in await self.redis.smembers(self.workers_key):
+            if isinstance(instance_id, bytes):
+                instance_id = instance_id.decode()
+            if instance_id == self.instance_id:
+                continue
+            if await self.redis.exists(f"{self.workers_key}:{instance_id}"):
+                continue
+            moved = await self._requeue(instance_id)
+            await self.redis.srem(self.workers_key, instance_id)
+            if moved:
+                logger.warning(
+                    "job_chunks_reclaimed", instance_id=instance_id, chunks=moved
+                )
+
+    async def _requeue(self, instance_id: str) -> int:
+        processing = f"jobs:chunks:processing:{instance_id}"
+        moved = 0
+        while await self.redis.lmove(processing, self.queue_key, "RIGHT", "LEFT"):
+            moved += 1
+        return moved
+
+    async def _settle(self, raw, push: Optional[tuple[str, str]] = None) -> None:
+        # Чанк уходит из processing в той же транзакции, что и повтор/dead-letter
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if push is not None:
+                pipe.rpush(*push)
+            pipe.lrem(self.processing_key, 1, raw)
+            await pipe.execute()
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                raw = await self.redis.blmove(
+                    self.queue_key, self.processing_key, 5, "LEFT", "RIGHT"
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("job_chunk_poll_failed", exc_info=True)
+                await asyncio.sleep(1.0)
+                continue
+            if raw is None:
+                continue
+            try:
+                await self._process(raw)
+            except Exception:
+                # Чанк остался в processing — вернётся в очередь через reclaim
+                logger.warning("job_chunk_settle_failed", exc_info=True)
+
+    async def _process(self, raw) -> None:
+        chunk = json.loads(raw)
+        name = chunk["name"]
+        handler = self._handlers.get(name)
+        if handler is None:
+            logger.error("job_chunk_no_handler", job=name, index=chunk["index"])
+            JOB_CHUNKS.labels(name, "dead").inc()
+            await self._settle(raw, (self.dead_key, raw))
+            return
+        start = time.perf_counter()
+        try:
+            await handler(chunk["index"], chunk["total"], **chunk["params"])
+        except Exception:
+            logger.exception("job_chunk_failed", job=name, index=chunk["index"])
+            chunk["attempt"] += 1
+            if chunk["attempt"] < self.max_attempts:
+                JOB_CHUNKS.labels(name, "retry").inc()
+                await self._settle(raw, (self.queue_key, json.dumps(chunk)))
+            else:
+                JOB_CHUNKS.labels(name, "dead").inc()
+                await self._settle(raw, (self.dead_key, json.dumps(chunk)))
+        else:
+            JOB_CHUNKS.labels(name, "ok").inc()
+            await self._settle(raw)
+        finally:
+            JOB_CHUNK_DURATION.labels(name).observe(time.perf_counter() - start)
+
+
+jobs = JobCoordinator()
@@ -0,0 +1,149 @@
+import asyncio, time, uuid
+from typing import Awaitable, Callable, Optional
+
+from redis.asyncio import Redis
+
+from utils.logger import get_logger
+from utils.metrics import registry
+
+logger = get_logger(__name__)
+
+IS_LEADER = registry.gauge(
+    "leader_is_leader",
+    "1 if this process currently holds the leader lease",
+    ("key",),
+)
+
+# Продлить/снять аренду можно только своим токеном
+_RENEW = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLease:
+    """Аренда ключа в Redis: SET NX PX + продление/освобождение по токену."""
+
+    def __init__(self, redis: Redis, key: str, ttl: float = 15.0):
+        self.redis = redis
+        self.key = key
+        self.ttl_ms = int(ttl * 1000)
+        self.token = uuid.uuid4().hex
+        self._renew = redis.register_script(_RENEW)
+        self._release = redis.register_script(_RELEASE)
+
+    async def acquire(self) -> bool:
+        return bool(await self.redis.set(self.key, self.token, nx=True, px=self.ttl_ms))
+
+    async def renew(self, ttl: Optional[float] = None) -> bool:
+        ttl_ms = int(ttl * 1000) if ttl is not None else self.ttl_ms
+        return bool(await self._renew(keys=[self.key], args=[self.token, ttl_ms]))
+
+    async def release(self) -> None:
+        await self._release(keys=[self.key], args=[self.token])
+
+
+Callback = Callable[[], Awaitable[None]]
+
+
+class LeaderElector:
+    """
+    Выбор лидера среди воркеров/подов. Лидер продлевает аренду каждые ttl/3;
+    если продлить не удалось (или Redis молчит дольше ttl), роль снимается,
+    и её подхватывает другой процесс.
+
+    Если on_elected упал (например, set_webhook), процесс не остаётся
+    «лидером наполовину»: вызывается on_revoked, аренда отпускается, а
+    следующая попытка — с экспоненциальной задержкой до max_backoff.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        key: str = "leader:bot",
+        ttl: float = 15.0,
+        on_elected: Optional[Callback] = None,
+        on_revoked: Optional[Callback] = None,
+        max_backoff: float = 60.0,
+    ):
+        self.lease = RedisLease(redis, key, ttl)
+        self.ttl = ttl
+        self.on_elected = on_elected
+        self.on_revoked = on_revoked
+        self.max_backoff = max_backoff
+        self.is_leader = False
+        self._renewed_at = 0.0
+        self._failures = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="leader-elector")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.is_leader:
+            await self._set_leader(False)
+            try:
+                await self.lease.release()
+            except Exception:
+                logger.warning("leader_release_failed", exc_info=True)
+
+    async def _set_leader(self, value: bool) -> bool:
+        self.is_leader = value
+        IS_LEADER.labels(self.lease.key).set(1 if value else 0)
+        logger.info("leader_changed", key=self.lease.key, is_leader=value)
+        callback = self.on_elected if value else self.on_revoked
+        if callback:
+            try:
+                await callback()
+            except Exception:
+                logger.exception("leader_callback_failed", is_leader=value)
+                return False
+        return True
+
+    async def _step_down(self) -> None:
+        self._failures += 1
+        await self._set_leader(False)
+        try:
+            await self.lease.release()
+        except Exception:
+            logger.warning("leader_release_failed", exc_info=True)
+
+    def _delay(self) -> float:
+        if not self._failures:
+            return self.ttl / 3
+        return min(self.ttl / 3 * 2**self._failures, self.max_backoff)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self.is_leader:
+                    if await self.lease.renew():
+                        self._renewed_at = time.monotonic()
+                    else:
+                        await self._set_leader(False)
+                elif await self.lease.acquire():
+                    self._renewed_at = time.monotonic()
+                    if await self._set_leader(True):
+                        self._failures = 0
+                    else:
+                        await self._step_down()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("leader_election_failed", exc_info=True)
+                # Без связи с Redis аренда могла истечь — не считаем себя лидером
+                if self.is_leader and time.monotonic() - self._renewed_at > self.ttl:
+                    await self._set_leader(False)
+            await asyncio.sleep(self._delay())
@@ -0,0 +1,380 @@
+"""
+Почта из хендлеров и задач планировщика без блокировки event loop.
+
+Письма кладутся в ограниченную очередь; pool_size воркеров держат по одному
+постоянному SMTP-соединению (smtplib в своём пуле потоков) и отправляют
+пачками до batch_size писем за один переход в поток. Простаивающее
+соединение перед отправкой проверяется NOOP, разорванное — переоткрывается.
+Временные ошибки (4xx, обрыв) повторяются с задержкой, постоянные (5xx) и
+исчерпавшие попытки уходят в dead-letter (Redis-список mail:dead + лог).
+
+    await runtime.mailer.send("user@example.com", "Тема", "Текст")
+"""
+
+import asyncio, json, smtplib, ssl, time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+from typing import Optional
+
+from redis.asyncio import Redis
+
+from core.config import EmailConfig
+from utils.logger import get_logger
+from utils.metrics import registry
+
+logger = get_logger(__name__)
+
+MAIL_SENT = registry.counter(
+    "mail_messages_total",
+    "Outgoing emails by outcome",
+    ("status",),
+)
+MAIL_QUEUE_LAG = registry.histogram(
+    "mail_queue_lag_seconds",
+    "Time from enqueue to the send attempt",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0),
+)
+MAIL_BATCH_DURATION = registry.histogram(
+    "mail_batch_duration_seconds",
+    "Time to send one batch over a pooled connection",
+)
+MAIL_CONNECTIONS = registry.counter(
+    "mail_smtp_connections_total",
+    "SMTP connections opened",
+)
+
+DEAD_LETTER_KEY = "mail:dead"
+DEAD_LETTER_SIZE = 10_000
+
+
+@dataclass(slots=True)
+class _Mail:
+    message: Optional[EmailMessage] = None
+    # (to, subject, text, html): сборка EmailMessage заметно тратит CPU,
+    # поэтому письма из send() собираются в потоке отправки, а не в хендлере
+    fields: Optional[tuple] = None
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class _NotAttempted(Exception):
+    """Пачка прервалась раньше, чем дошла до этого письма, — можно повторить."""
+
+
+def _is_permanent(error: BaseException) -> bool:
+    if isinstance(error, _NotAttempted):
+        return False
+    if not isinstance(error, (smtplib.SMTPException, OSError)):
+        return True  # например, письмо не собралось — повтор не поможет
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+def _recipient(mail: _Mail) -> str:
+    if mail.message is not None:
+        return mail.message["To"]
+    to = mail.fields[0]
+    return to if isinstance(to, str) else ", ".join(to)
+
+
+class _Connection:
+    """Одно SMTP-соединение. Методы блокирующие — вызываются только в потоке."""
+
+    def __init__(self, cfg: EmailConfig):
+        self.cfg = cfg
+        self.smtp: Optional[smtplib.SMTP] = None
+        self.used_at = 0.0
+
+    def _open(self) -> None:
+        cfg = self.cfg
+        if cfg.use_ssl:
+            smtp = smtplib.SMTP_SSL(
+                cfg.host,
+                cfg.port,
+                timeout=cfg.timeout,
+                context=ssl.create_default_context(),
+            )
+        else:
+            smtp = smtplib.SMTP(cfg.host, cfg.port, timeout=cfg.timeout)
+        smtp.login(cfg.name, cfg.pwd)
+        MAIL_CONNECTIONS.inc()
+        self.smtp = smtp
+
+    def _ensure(self) -> None:
+        if (
+            self.smtp is not None
+            and time.monotonic() - self.used_at > self.cfg.keepalive
+        ):
+            # Сервер мог молча закрыть простаивающее соединение
+            try:
+                alive = self.smtp.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                alive = False
+            if not alive:
+                self.close()
+        if self.smtp is None:
+            self._open()
+
+    def _send(self, message: EmailMessage) -> None:
+        self._ensure()
+        try:
+            self.smtp.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # Оборвалось между NOOP и отправкой — одна попытка на новом соединении
+            self.close()
+            self._open()
+            self.smtp.send_message(message)
+
+    def send(self, message: EmailMessage) -> Optional[BaseException]:
+        """Ошибка отправки одного письма (None — ушло); исключений не бросает."""
+        try:
+            self._send(message)
+            return None
+        except Exception as e:
+            if not isinstance(e, smtplib.SMTPResponseException) or e.smtp_code == 421:
+                # Состояние сессии неизвестно — следующее письмо на новом соединении
+                self.close()
+            return e
+        finally:
+            self.used_at = time.monotonic()
+
+    def close(self) -> None:
+        smtp, self.smtp = self.smtp, None
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+
+class Mailer:
+    def __init__(self, cfg: EmailConfig, redis: Optional[Redis] = None):
+        self.cfg = cfg
+        self.redis = redis
+        self._queue: asyncio.Queue[_Mail] = asyncio.Queue(maxsize=cfg.queue_size)
+        self._connections = [_Connection(cfg) for _ in range(max(1, cfg.pool_size))]
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks: list[asyncio.Task] = []
+        self._retries: dict[asyncio.TimerHandle, _Mail] = {}
+        registry.gauge(
+            "mail_queue_depth",
+            "Emails waiting in the send queue",
+            collect=lambda: self._queue.qsize(),
+        )
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def build(
+        self,
+        to: str | list[str],
+        subject: str,
+        text: str,
+        html: Optional[str] = None,
+    ) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = self.cfg.name
+        message["To"] = to if isinstance(to, str) else ", ".join(to)
+        message["Subject"] = subject
+        message["Date"] = formatdate(localtime=True)
+        message["Message-ID"] = make_msgid(
+            domain=self.cfg.name.rpartition("@")[2] or None
+        )
+        message.set_content(text)
+        if html is not None:
+            message.add_alternative(html, subtype="html")
+        return message
+
+    async def send(
+        self,
+        to: str | list[str],
+        subject: str,
+        text: str,
+        html: Optional[str] = None,
+    ) -> bool:
+        """Поставить письмо в очередь. False — очередь полна дольше block_timeout."""
+        return await self._put(_Mail(fields=(to, subject, text, html)))
+
+    async def submit(self, message: EmailMessage) -> bool:
+        """Готовое письмо (вложения, свои заголовки) — в ту же очередь."""
+        return await self._put(_Mail(message))
+
+    async def _put(self, mail: _Mail) -> bool:
+        try:
+            self._queue.put_nowait(mail)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(mail), self.cfg.block_timeout)
+            except asyncio.TimeoutError:
+                MAIL_SENT.labels("rejected").inc()
+                logger.warning("mail_queue_full", depth=self._queue.qsize())
+                return False
+        return True
+
+    def start(self) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self._connections), thread_name_prefix="smtp"
+        )
+        self._tasks = [
+            asyncio.create_task(self._worker(conn), name=f"mailer-{i}")
+            for i, conn in enumerate(self._connections)
+        ]
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        # Отложенные повторы — сразу в очередь: на остановке ждать их незачем.
+        # Пока очередь дренируется, могут появиться новые — до пустого итога
+        while True:
+            for handle, mail in list(self._retries.items()):
+                handle.cancel()
+                self._requeue(handle, mail)
+            try:
+                await asyncio.wait_for(self._queue.join(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                break
+            if not self._retries:
+                break
+        # Не успели — в dead-letter, а не в никуда
+        left = list(self._retries.values())
+        for handle in self._retries:
+            handle.cancel()
+        self._retries.clear()
+        while not self._queue.empty():
+            left.append(self._queue.get_nowait())
+            self._queue.task_done()
+        if left:
+            logger.warning("mail_queue_drain_timeout", left=len(left))
+            for mail in left:
+                await self._dead_letter(mail, RuntimeError("mailer stopped"))
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor:
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(
+                *(
+                    loop.run_in_executor(self._executor, c.close)
+                    for c in self._connections
+                ),
+                return_exceptions=True,
+            )
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def _worker(self, conn: _Connection) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.cfg.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            now = time.monotonic()
+            for mail in batch:
+                MAIL_QUEUE_LAG.observe(now - mail.enqueued_at)
+            started = time.perf_counter()
+            # Поток заполняет результаты по мере отправки: если пачка
+            # прервётся, отправленные письма не уйдут на повтор
+            results: list[Optional[BaseException]] = [_NotAttempted()] * len(batch)
+            try:
+                await loop.run_in_executor(
+                    self._executor, self._send_batch, conn, batch, results
+                )
+            except Exception:
+                logger.exception("mail_batch_failed", size=len(batch))
+            MAIL_BATCH_DURATION.observe(time.perf_counter() - started)
+            for mail, error in zip(batch, results):
+                try:
+                    await self._settle(mail, error)
+                except Exception:
+                    logger.exception("mail_settle_failed")
+                finally:
+                    self._queue.task_done()
+
+    def _send_batch(
+        self,
+        conn: _Connection,
+        batch: list[_Mail],
+        results: list[Optional[BaseException]],
+    ) -> None:
+        for i, mail in enumerate(batch):
+            if mail.message is None:
+                try:
+                    mail.message = self.build(*mail.fields)
+                except Exception as e:
+                    results[i] = e
+                    continue
+            results[i] = conn.send(mail.message)
+
+    async def _settle(self, mail: _Mail, error: Optional[BaseException]) -> None:
+        if error is None:
+            MAIL_SENT.labels("sent").inc()
+            return
+        mail.attempts += 1
+        if _is_permanent(error) or mail.attempts >= self.cfg.max_attempts:
+            await self._dead_letter(mail, error)
+            return
+        MAIL_SENT.labels("retry").inc()
+        delay = min(self.cfg.retry_delay * 2 ** (mail.attempts - 1), 300.0)
+        logger.info(
+            "mail_retry",
+            to=_recipient(mail),
+            attempt=mail.attempts,
+            delay=delay,
+            error=repr(error),
+        )
+        loop = asyncio.get_running_loop()
+        handle = loop.call_later(delay, lambda: self._requeue(handle, mail))
+        self._retries[handle] = mail
+
+    def _requeue(self, handle: asyncio.TimerHandle, mail: _Mail) -> None:
+        self._retries.pop(handle, None)
+        try:
+            self._queue.put_nowait(mail)
+        except asyncio.QueueFull:
+            asyncio.get_running_loop().create_task(
+                self._dead_letter(mail, RuntimeError("mail queue full on retry"))
+            )
+
+    async def _dead_letter(self, mail: _Mail, error: BaseException) -> None:
+        MAIL_SENT.labels("dead").inc()
+        message = mail.message
+        subject = message["Subject"] if message is not None else mail.fields[1]
+        logger.error(
+            "mail_dead_letter",
+            to=_recipient(mail),
+            subject=subject,
+            attempts=mail.attempts,
+            error=repr(error),
+        )
+        if self.redis is None:
+            return
+        # Письмо целиком: после разбора можно переотправить через submit(),
+        # а не собравшееся — через send(**fields)
+        record = {
+            "to": _recipient(mail),
+            "subject": subject,
+            "error": repr(error),
+            "attempts": mail.attempts,
+            "failed_at": time.time(),
+        }
+        if message is not None:
+            record["raw"] = message.as_string()
+        else:
+            record["fields"] = dict(zip(("to", "subject", "text", "html"), mail.fields))
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.lpush(DEAD_LETTER_KEY, json.dumps(record))
+                pipe.ltrim(DEAD_LETTER_KEY, 0, DEAD_LETTER_SIZE - 1)
+                await pipe.execute()
+        except Exception:
+            # Redis недоступен: письмо остаётся только в логе выше, а
+            # остановка и остальные письма не должны из-за этого сорваться
+            logger.warning("mail_dead_letter_failed", to=record["to"], exc_info=True)
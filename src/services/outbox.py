@@ -0,0 +1,153 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.models import OutboxMessage
+from utils.logger import get_logger
+from utils.metrics import registry
+
+logger = get_logger(__name__)
+
+OUTBOX_PROCESSED = registry.counter(
+    "outbox_messages_total",
+    "Outbox messages handled by the relay",
+    ("kind", "status"),
+)
+
+OutboxHandler = Callable[[dict], Awaitable[None]]
+
+
+def enqueue(session: AsyncSession, kind: str, payload: dict) -> OutboxMessage:
+    """Добавляет сообщение в outbox в текущей транзакции вызывающего кода."""
+    msg = OutboxMessage(kind=kind, payload=payload)
+    session.add(msg)
+    return msg
+
+
+class OutboxRelay:
+    """
+    Фоновая доставка сообщений из outbox в две короткие транзакции:
+      1. claim — строки выбираются FOR UPDATE SKIP LOCKED, их available_at
+         сдвигается на claim_ttl (аренда), коммит: блокировки сняты, а другие
+         реплики эти строки до конца аренды не видят;
+      2. доставка вне транзакции, затем результат — UPDATE по id.
+    Упавшая посреди пачки реплика ничего не теряет: по истечении аренды
+    строки снова доступны (доставка at-least-once). Неудачная попытка
+    откладывается с экспоненциальной задержкой.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        interval: float = 2.0,
+        batch_size: int = 50,
+        max_attempts: int = 10,
+        claim_ttl: float = 60.0,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.claim_ttl = claim_ttl
+        self._handlers: dict[str, OutboxHandler] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, kind: str, handler: OutboxHandler) -> None:
+        self._handlers[kind] = handler
+
+    def wake(self) -> None:
+        """Разбудить relay сразу после коммита, не дожидаясь интервала."""
+        self._wakeup.set()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="outbox-relay")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                while await self.run_once() >= self.batch_size:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("outbox_relay_failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def run_once(self) -> int:
+        """Обрабатывает одну пачку, возвращает её размер."""
+        messages = await self._claim()
+        results = [await self._deliver(*msg) for msg in messages]
+        if results:
+            async with self.session_factory() as session:
+                for msg_id, values in results:
+                    await session.execute(
+                        update(OutboxMessage)
+                        .where(OutboxMessage.id == msg_id)
+                        .values(**values)
+                    )
+                await session.commit()
+        return len(messages)
+
+    async def _claim(self) -> list[tuple[int, str, dict, int]]:
+        now = datetime.now(timezone.utc)
+        async with self.session_factory() as session:
+            stmt = (
+                select(OutboxMessage)
+                .where(
+                    OutboxMessage.sent_at.is_(None),
+                    OutboxMessage.available_at <= now,
+                    OutboxMessage.attempts < self.max_attempts,
+                )
+                .order_by(OutboxMessage.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            claimed = []
+            lease = now + timedelta(seconds=self.claim_ttl)
+            for msg in await session.scalars(stmt):
+                msg.available_at = lease
+                claimed.append((msg.id, msg.kind, msg.payload, msg.attempts))
+            await session.commit()
+        return claimed
+
+    async def _deliver(
+        self, msg_id: int, kind: str, payload: dict, attempts: int
+    ) -> tuple[int, dict]:
+        """Отправка без открытой транзакции; возвращает (id, что записать)."""
+        handler = self._handlers.get(kind)
+        try:
+            if handler is None:
+                raise LookupError(f"no outbox handler for {kind!r}")
+            await handler(payload)
+        except Exception as e:
+            attempts += 1
+            OUTBOX_PROCESSED.labels(kind, "retry").inc()
+            logger.warning(
+                "outbox_delivery_failed",
+                id=msg_id,
+                kind=kind,
+                attempts=attempts,
+                error=str(e),
+            )
+            delay = timedelta(seconds=min(2**attempts, 3600))
+            return msg_id, {
+                "attempts": attempts,
+                "last_error": str(e)[:1000],
+                "available_at": datetime.now(timezone.utc) + delay,
+            }
+        OUTBOX_PROCESSED.labels(kind, "sent").inc()
+        return msg_id, {"sent_at": datetime.now(timezone.utc)}
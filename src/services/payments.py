@@ -0,0 +1,125 @@
+import hashlib, hmac
+from typing import Optional
+
+from aiogram import Bot
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.models import PaymentEvent
+from core.storage.db_helper import dialect_insert
+from services.outbox import enqueue
+from utils.logger import get_logger
+from utils.metrics import registry
+
+logger = get_logger(__name__)
+
+PAYMENT_NOTIFICATIONS = registry.counter(
+    "payment_notifications_total",
+    "Payment provider notifications by outcome",
+    ("result",),
+)
+
+PAYMENT_STATUS_KIND = "payment_status"
+
+STATUS_MESSAGES = {
+    "CONFIRMED": "✅ Оплата заказа {order_id} прошла успешно.",
+    "REJECTED": "❌ Платёж по заказу {order_id} отклонён банком.",
+    "REFUNDED": "↩️ Платёж по заказу {order_id} возвращён.",
+}
+
+
+def tinkoff_token(payload: dict, password: str) -> str:
+    """
+    Подпись Tinkoff: значения корневых скалярных полей (без Token и вложенных
+    объектов) + Password, отсортированные по ключу, склеенные и SHA-256.
+    """
+    values = {
+        k: v
+        for k, v in payload.items()
+        if k != "Token" and not isinstance(v, (dict, list))
+    }
+    values["Password"] = password
+    parts = []
+    for key in sorted(values):
+        value = values[key]
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        parts.append(str(value))
+    return hashlib.sha256("".join(parts).encode("utf-8")).hexdigest()
+
+
+def verify_token(payload: dict, terminal_key: str, password: str) -> bool:
+    token = payload.get("Token")
+    if not isinstance(token, str) or payload.get("TerminalKey") != terminal_key:
+        return False
+    return hmac.compare_digest(token.lower(), tinkoff_token(payload, password))
+
+
+async def record_notification(session: AsyncSession, payload: dict) -> bool:
+    """
+    Идемпотентно сохраняет уведомление и ставит сообщение в outbox в одной
+    транзакции. False — такой PaymentId+Status уже обработан (ретрай).
+    """
+    payment_id = str(payload.get("PaymentId", ""))
+    status = str(payload.get("Status", ""))
+    order_id = str(payload.get("OrderId", ""))
+    stmt = (
+        dialect_insert(session, PaymentEvent)
+        .values(
+            payment_id=payment_id,
+            status=status,
+            order_id=order_id,
+            amount=int(payload.get("Amount") or 0),
+            success=bool(payload.get("Success")),
+            payload=payload,
+        )
+        .on_conflict_do_nothing(index_elements=["payment_id", "status"])
+        .returning(PaymentEvent.id)
+    )
+    event_id = await session.scalar(stmt)
+    if event_id is None:
+        await session.rollback()
+        PAYMENT_NOTIFICATIONS.labels("duplicate").inc()
+        return False
+
+    enqueue(
+        session,
+        PAYMENT_STATUS_KIND,
+        {
+            "event_id": event_id,
+            "payment_id": payment_id,
+            "order_id": order_id,
+            "status": status,
+            "amount": int(payload.get("Amount") or 0),
+        },
+    )
+    await session.commit()
+    PAYMENT_NOTIFICATIONS.labels("accepted").inc()
+    return True
+
+
+def chat_id_from_order(order_id: str) -> Optional[int]:
+    """
+    По умолчанию OrderId формируется как "<chat_id>-<суффикс>".
+    Замени, если заказы связаны с пользователем иначе.
+    """
+    head, _, _ = order_id.partition("-")
+    try:
+        return int(head)
+    except ValueError:
+        return None
+
+
+def payment_status_handler(bot: Bot):
+    """Outbox-хендлер: уведомляет пользователя о смене статуса платежа."""
+
+    async def handle(payload: dict) -> None:
+        template = STATUS_MESSAGES.get(payload["status"])
+        if template is None:
+            return
+        chat_id = chat_id_from_order(payload["order_id"])
+        if chat_id is None:
+            logger.warning("payment_chat_unknown", order_id=payload["order_id"])
+            return
+        await bot.send_message(chat_id, template.format(order_id=payload["order_id"]))
+
+    return handle
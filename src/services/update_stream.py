@@ -0,0 +1,315 @@
+"""
+Режим ingest=stream: веб-роль складывает сырые апдейты в Redis Streams,
+отдельная роль-воркер (src/worker.py) их обрабатывает.
+
+Поток разбит на partitions стримов по chat_id. Каждым стримом в каждый
+момент владеет ровно один воркер (RedisLease), поэтому апдейты одного чата
+обрабатываются строго по порядку, а разные партиции — параллельно на всех
+воркерах. Чтение — через consumer group: XACK после dp.feed_update, а
+записи упавшего воркера новый владелец забирает XAUTOCLAIM.
+
+Если аренду продлить не удалось, консьюмер партиции отменяется и
+дожидается до того, как она может достаться другому воркеру. Хендлеры не
+перезапускаются: апдейт, на котором dp.feed_update упал, уходит в стрим
+{stream_prefix}:dead.
+"""
+
+import asyncio, math, random, time, uuid
+from dataclasses import dataclass
+from typing import Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from core.config import IngestConfig
+from middlewares.logging_ctx import extract_ctx
+from services.leader import RedisLease
+from utils.logger import get_logger
+from utils.metrics import registry
+
+logger = get_logger(__name__)
+
+STREAM_PUBLISHED = registry.counter(
+    "update_stream_published_total",
+    "Updates appended to the ingest streams",
+)
+STREAM_PROCESSED = registry.counter(
+    "update_stream_processed_total",
+    "Updates processed from the ingest streams",
+    ("status",),
+)
+STREAM_PARTITIONS_OWNED = registry.gauge(
+    "update_stream_partitions_owned",
+    "Ingest stream partitions owned by this worker",
+)
+STREAM_LAG = registry.histogram(
+    "update_stream_lag_seconds",
+    "Time from XADD to the start of processing",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0),
+)
+
+
+def partition_of(update: Update, partitions: int) -> int:
+    ctx = extract_ctx(update)
+    key = ctx["chat_id"] or ctx["user_id"] or update.update_id
+    return int(key) % partitions
+
+
+class UpdateStreamProducer:
+    """Веб-роль: XADD сырых байт апдейта в стрим его партиции."""
+
+    def __init__(self, redis: Redis, cfg: IngestConfig):
+        self.redis = redis
+        self.cfg = cfg
+
+    def stream(self, partition: int) -> str:
+        return f"{self.cfg.stream_prefix}:{partition}"
+
+    async def publish(
+        self, update: Update, body: bytes, request_id: Optional[str] = None
+    ) -> None:
+        await self.redis.xadd(
+            self.stream(partition_of(update, self.cfg.partitions)),
+            {"body": body, "rid": request_id or ""},
+            maxlen=self.cfg.maxlen,
+            approximate=True,
+        )
+        STREAM_PUBLISHED.inc()
+
+
+@dataclass(slots=True)
+class _Owned:
+    lease: RedisLease
+    task: asyncio.Task
+    stop: asyncio.Event
+    renewed_at: float = 0.0
+
+
+class UpdateStreamConsumer(UpdateStreamProducer):
+    """
+    Воркер-роль. Раз в lease_ttl/3 продлевает аренды своих партиций, берёт
+    свободные до справедливой доли (partitions / живые воркеры) и отдаёт
+    лишние — так нагрузка перераспределяется при масштабировании.
+    """
+
+    def __init__(self, bot: Bot, dp: Dispatcher, redis: Redis, cfg: IngestConfig):
+        super().__init__(redis, cfg)
+        self.bot = bot
+        self.dp = dp
+        self.consumer = f"worker-{uuid.uuid4().hex[:8]}"
+        self._owned: dict[int, _Owned] = {}
+        self._draining: dict[int, _Owned] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def members_key(self) -> str:
+        return f"{self.cfg.stream_prefix}:workers"
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._manage(), name="update-stream-manager")
+
+    async def stop(self) -> None:
+        """Дообработать текущие апдейты, отпустить партиции, выйти из группы."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for partition in list(self._owned):
+            self._drain(partition)
+        while True:
+            await self._renew_draining()
+            if not self._draining:
+                break
+            tasks = [owned.task for owned in self._draining.values()]
+            await asyncio.wait(tasks, timeout=self.cfg.lease_ttl / 3)
+        await self.redis.zrem(self.members_key, self.consumer)
+
+    async def _ensure_group(self, stream: str) -> None:
+        try:
+            await self.redis.xgroup_create(
+                stream, self.cfg.group, id="0", mkstream=True
+            )
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _fair_share(self) -> int:
+        now = time.time()
+        ttl = self.cfg.lease_ttl
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zadd(self.members_key, {self.consumer: now})
+            pipe.zremrangebyscore(self.members_key, 0, now - ttl)
+            pipe.zcard(self.members_key)
+            _, _, alive = await pipe.execute()
+        return math.ceil(self.cfg.partitions / max(1, alive))
+
+    async def _manage(self) -> None:
+        while True:
+            try:
+                await self._rebalance()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("update_stream_rebalance_failed", exc_info=True)
+            # Redis не отвечает: аренды, которые вот-вот истекут, не продлить,
+            # и консьюмеры должны встать раньше, чем партиции заберут другие
+            deadline = time.monotonic() - self.cfg.lease_ttl * 2 / 3
+            for owners in (self._owned, self._draining):
+                for partition, owned in list(owners.items()):
+                    if owned.renewed_at < deadline:
+                        await self._abandon(owners, partition, "lease_expiring")
+            STREAM_PARTITIONS_OWNED.set(len(self._owned))
+            await asyncio.sleep(self.cfg.lease_ttl / 3)
+
+    async def _abandon(
+        self, owners: dict[int, _Owned], partition: int, reason: str
+    ) -> None:
+        """Аренда потеряна: консьюмер отменяется и дожидается здесь же."""
+        owned = owners.pop(partition)
+        logger.warning(
+            "update_stream_partition_lost", partition=partition, reason=reason
+        )
+        owned.stop.set()
+        owned.task.cancel()
+        # Недоделанная запись останется в pending и достанется новому владельцу
+        await asyncio.gather(owned.task, return_exceptions=True)
+
+    async def _renew(self, owned: _Owned) -> bool:
+        if not await owned.lease.renew():
+            return False
+        owned.renewed_at = time.monotonic()
+        return True
+
+    def _drain(self, partition: int) -> None:
+        # Без cancel: текущий апдейт дообрабатывается, аренда продлевается,
+        # пока консьюмер партиции не остановится
+        owned = self._owned.pop(partition)
+        owned.stop.set()
+        self._draining[partition] = owned
+
+    async def _renew_draining(self) -> None:
+        for partition, owned in list(self._draining.items()):
+            if owned.task.done():
+                del self._draining[partition]
+                try:
+                    await owned.lease.release()
+                except Exception:
+                    logger.warning("update_stream_release_failed", exc_info=True)
+            elif not await self._renew(owned):
+                await self._abandon(self._draining, partition, "renew_failed")
+
+    async def _rebalance(self) -> None:
+        # Сначала продление всех аренд: оно не должно ждать медленных хендлеров
+        await self._renew_draining()
+        for partition, owned in list(self._owned.items()):
+            if owned.task.done():
+                error = None if owned.task.cancelled() else owned.task.exception()
+                logger.warning(
+                    "update_stream_consumer_failed", partition=partition, exc_info=error
+                )
+                self._drain(partition)
+            elif not await self._renew(owned):
+                # Партиция уже может быть у другого воркера — останавливаемся
+                await self._abandon(self._owned, partition, "renew_failed")
+
+        share = await self._fair_share()
+        while len(self._owned) > share:
+            self._drain(next(reversed(self._owned)))
+
+        free = [
+            p
+            for p in range(self.cfg.partitions)
+            if p not in self._owned and p not in self._draining
+        ]
+        random.shuffle(free)  # воркеры не толкаются за одни и те же партиции
+        for partition in free:
+            if len(self._owned) >= share:
+                break
+            lease = RedisLease(
+                self.redis,
+                f"{self.stream(partition)}:owner",
+                ttl=self.cfg.lease_ttl,
+            )
+            if await lease.acquire():
+                await self._ensure_group(self.stream(partition))
+                stop = asyncio.Event()
+                task = asyncio.create_task(
+                    self._consume(partition, stop), name=f"update-stream-{partition}"
+                )
+                self._owned[partition] = _Owned(lease, task, stop, time.monotonic())
+                logger.info("update_stream_partition_acquired", partition=partition)
+
+    async def _consume(self, partition: int, stop: asyncio.Event) -> None:
+        stream = self.stream(partition)
+        cfg = self.cfg
+        # Сначала — то, что не успел подтвердить прошлый владелец (или мы сами
+        # до рестарта): эти записи старше новых и должны пойти первыми
+        start = "0-0"
+        while not stop.is_set():
+            result = await self.redis.xautoclaim(
+                stream,
+                cfg.group,
+                self.consumer,
+                min_idle_time=0,
+                start_id=start,
+                count=cfg.batch,
+            )
+            start, claimed = result[0], result[1]
+            for entry_id, fields in claimed:
+                if stop.is_set():
+                    return
+                await self._handle(stream, entry_id, fields)
+            if start in ("0-0", b"0-0"):
+                break
+
+        while not stop.is_set():
+            response = await self.redis.xreadgroup(
+                cfg.group,
+                self.consumer,
+                {stream: ">"},
+                count=cfg.batch,
+                block=cfg.block_ms,
+            )
+            for _, entries in response or ():
+                for entry_id, fields in entries:
+                    # Непрочитанное останется в pending и уйдёт следующему владельцу
+                    if stop.is_set():
+                        return
+                    await self._handle(stream, entry_id, fields)
+
+    async def _handle(self, stream: str, entry_id, fields: Optional[dict]) -> None:
+        if not fields:
+            # Запись уже вытеснена MAXLEN — просто подтверждаем
+            await self.redis.xack(stream, self.cfg.group, entry_id)
+            return
+        fields = {
+            (k.decode() if isinstance(k, bytes) else k): v for k, v in fields.items()
+        }
+        raw_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+        STREAM_LAG.observe(max(0.0, time.time() - int(raw_id.split("-")[0]) / 1000))
+        rid = fields.get("rid") or None
+        if isinstance(rid, bytes):
+            rid = rid.decode()
+        status = "ok"
+        try:
+            update = Update.model_validate_json(
+                fields["body"], context={"bot": self.bot}
+            )
+            # Один раз: повтор перезапустил бы побочные эффекты хендлеров
+            await self.dp.feed_update(bot=self.bot, update=update, request_id=rid)
+        except Exception:
+            logger.exception(
+                "update_stream_handler_failed", stream=stream, entry_id=raw_id
+            )
+            # Упавший апдейт не должен блокировать партицию — разбор вручную
+            status = "dead"
+            await self.redis.xadd(
+                f"{self.cfg.stream_prefix}:dead",
+                {**fields, "stream": stream, "entry_id": raw_id},
+                maxlen=self.cfg.maxlen,
+                approximate=True,
+            )
+        await self.redis.xack(stream, self.cfg.group, entry_id)
+        STREAM_PROCESSED.labels(status).inc()
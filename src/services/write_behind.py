@@ -0,0 +1,205 @@
+import asyncio, time
+from typing import Hashable, Optional
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from core.models import Base
+from core.storage.db_helper import dialect_insert
+from utils.logger import get_logger
+from utils.metrics import registry
+
+logger = get_logger(__name__)
+
+WB_MUTATIONS = registry.counter(
+    "write_behind_mutations_total",
+    "Mutations accepted by write-behind buffers",
+    ("table",),
+)
+WB_ROWS = registry.counter(
+    "write_behind_rows_written_total",
+    "Rows upserted by write-behind flushes",
+    ("table",),
+)
+WB_DROPPED = registry.counter(
+    "write_behind_dropped_total",
+    "Mutations dropped because the buffer hit its hard limit",
+    ("table",),
+)
+WB_FLUSH_DURATION = registry.histogram(
+    "write_behind_flush_seconds",
+    "Write-behind flush duration",
+    ("table",),
+)
+
+
+class _Pending:
+    __slots__ = ("values", "deltas")
+
+    def __init__(self):
+        self.values: dict = {}
+        self.deltas: dict = {}
+
+    def merge_older(self, older: "_Pending") -> None:
+        # Вернуть в буфер неудавшийся батч: новые set важнее старых,
+        # инкременты складываются
+        for column, value in older.values.items():
+            self.values.setdefault(column, value)
+        for column, delta in older.deltas.items():
+            self.deltas[column] = self.deltas.get(column, 0) + delta
+
+
+class WriteBehindBuffer:
+    """
+    Отложенная запись частых мелких изменений (last_seen, счётчики).
+
+    Мутации копятся в памяти по ключу строки: set — последнее значение
+    побеждает, incr — дельты суммируются. Раз в interval (или сразу при
+    max_keys ключей) буфер сбрасывается многострочным INSERT ... ON CONFLICT
+    DO UPDATE: N апдейтов одного пользователя между сбросами = одна строка.
+
+    Память ограничена: после 2 * max_keys ключей новые ключи отбрасываются
+    (с метрикой) — потеря части статистики лучше, чем OOM. При ошибке
+    записи батч возвращается в буфер и уйдёт со следующим сбросом.
+    Для incr-колонок значение при вставке новой строки — сама дельта.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        model: type[Base],
+        key_columns: tuple[str, ...],
+        interval: float = 5.0,
+        max_keys: int = 10000,
+        batch_size: int = 500,
+    ):
+        self.session_factory = session_factory
+        self.model = model
+        self.table = model.__table__
+        self.key_columns = key_columns
+        self.interval = interval
+        self.max_keys = max_keys
+        self.batch_size = batch_size
+        self.name = self.table.name
+        self._pending: dict[Hashable, _Pending] = {}
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _entry(self, key: Hashable) -> Optional[_Pending]:
+        entry = self._pending.get(key)
+        if entry is None:
+            size = len(self._pending)
+            if size >= 2 * self.max_keys:
+                WB_DROPPED.labels(self.name).inc()
+                return None
+            if size >= self.max_keys:
+                self._wakeup.set()
+            entry = self._pending[key] = _Pending()
+        WB_MUTATIONS.labels(self.name).inc()
+        return entry
+
+    @staticmethod
+    def _as_key(key) -> tuple:
+        return key if isinstance(key, tuple) else (key,)
+
+    def set(self, key, **values) -> None:
+        """key — значение(я) key_columns (кортеж, если ключ составной)."""
+        entry = self._entry(self._as_key(key))
+        if entry is not None:
+            entry.values.update(values)
+
+    def incr(self, key, **deltas) -> None:
+        entry = self._entry(self._as_key(key))
+        if entry is not None:
+            for column, delta in deltas.items():
+                entry.deltas[column] = entry.deltas.get(column, 0) + delta
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name=f"write-behind:{self.name}")
+
+    async def stop(self) -> None:
+        """Остановить фоновый сброс и дописать всё накопленное."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                # stop() отменяет задачу: отмена посреди сброса после коммита
+                # вернула бы батч в буфер, и инкременты записались бы дважды
+                await asyncio.shield(self.flush())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("write_behind_flush_failed", table=self.name)
+
+    async def flush(self) -> int:
+        """Записать накопленное; возвращает число upsert-нутых строк."""
+        async with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            started = time.perf_counter()
+            try:
+                written = await self._write(batch)
+            except BaseException:
+                self._restore(batch)
+                raise
+            WB_ROWS.labels(self.name).inc(written)
+            WB_FLUSH_DURATION.labels(self.name).observe(time.perf_counter() - started)
+            return written
+
+    def _restore(self, batch: dict[Hashable, _Pending]) -> None:
+        for key, older in batch.items():
+            entry = self._pending.get(key)
+            if entry is None:
+                if len(self._pending) >= 2 * self.max_keys:
+                    WB_DROPPED.labels(self.name).inc()
+                    continue
+                self._pending[key] = older
+            else:
+                entry.merge_older(older)
+
+    async def _write(self, batch: dict[Hashable, _Pending]) -> int:
+        # Многострочный VALUES требует одинакового набора колонок —
+        # группируем строки по тому, какие колонки в них заданы
+        groups: dict[tuple, list[dict]] = {}
+        for key, entry in batch.items():
+            row = dict(zip(self.key_columns, key))
+            row.update(entry.values)
+            row.update(entry.deltas)
+            shape = (tuple(sorted(entry.values)), tuple(sorted(entry.deltas)))
+            groups.setdefault(shape, []).append(row)
+
+        async with self.session_factory() as session:
+            for (set_columns, incr_columns), rows in groups.items():
+                for i in range(0, len(rows), self.batch_size):
+                    stmt = dialect_insert(session, self.table).values(
+                        rows[i : i + self.batch_size]
+                    )
+                    update = {c: stmt.excluded[c] for c in set_columns}
+                    update.update(
+                        {c: self.table.c[c] + stmt.excluded[c] for c in incr_columns}
+                    )
+                    if update:
+                        stmt = stmt.on_conflict_do_update(
+                            index_elements=list(self.key_columns), set_=update
+                        )
+                    else:
+                        stmt = stmt.on_conflict_do_nothing(
+                            index_elements=list(self.key_columns)
+                        )
+                    await session.execute(stmt)
+            await session.commit()
+        return len(batch)
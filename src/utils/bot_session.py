@@ -0,0 +1,236 @@
+"""
+Исходящий клиент Bot API: пул соединений aiohttp, повтор при flood-wait и
+временных сбоях (с бюджетом), метрики по методам.
+"""
+
+import asyncio, random, time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from aiohttp import ClientSession, TCPConnector
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import (
+    TelegramEntityTooLarge,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from aiogram.methods import TelegramMethod
+
+from core.config import TelegramConfig
+from utils.logger import get_logger
+from utils.metrics import registry
+
+logger = get_logger(__name__)
+
+API_LATENCY = registry.histogram(
+    "telegram_api_request_duration_seconds",
+    "Outgoing Bot API call duration (including retries)",
+    ("method",),
+)
+API_IN_FLIGHT = registry.gauge(
+    "telegram_api_requests_in_flight",
+    "Outgoing Bot API calls in progress",
+)
+API_ERRORS = registry.counter(
+    "telegram_api_errors_total",
+    "Outgoing Bot API calls that failed",
+    ("method", "error"),
+)
+API_RETRIES = registry.counter(
+    "telegram_api_retries_total",
+    "Bot API call retries by reason",
+    ("method", "reason"),
+)
+
+# Повтор этих методов после обрыва/5xx не создаёт дублей у пользователя
+_IDEMPOTENT_PREFIXES = ("get", "set", "delete", "edit", "pin", "unpin")
+_IDEMPOTENT_METHODS = frozenset(
+    {
+        "answerCallbackQuery",
+        "answerInlineQuery",
+        "answerPreCheckoutQuery",
+        "answerShippingQuery",
+    }
+)
+
+
+def _idempotent(name: str) -> bool:
+    return name.startswith(_IDEMPOTENT_PREFIXES) or name in _IDEMPOTENT_METHODS
+
+
+_retry_disabled: ContextVar[bool] = ContextVar("bot_retry_disabled", default=False)
+
+
+@contextmanager
+def without_retry():
+    """
+    Отключить повторы для вызовов внутри блока — для кода, который сам
+    разруливает flood-wait (рассылки тормозят весь поток, а не один вызов).
+    """
+    token = _retry_disabled.set(True)
+    try:
+        yield
+    finally:
+        _retry_disabled.reset(token)
+
+
+class RetryBudget:
+    """
+    Повторы не больше ratio от числа запросов (плюс запас min_tokens):
+    при массовых сбоях ретраи не умножают нагрузку на API.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = min_tokens
+        self._tokens = min_tokens
+
+    def on_request(self) -> None:
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+
+class RetryMiddleware(BaseRequestMiddleware):
+    """
+    RetryAfter — ждём указанное Telegram время (если не дольше max_delay).
+    TelegramServerError/TelegramNetworkError — экспоненциальная задержка с
+    джиттером, но только для идемпотентных методов (get_*, edit_*, ...):
+    send_* мог дойти до Telegram до таймаута, и повтор задублирует
+    сообщение. transient=True повторяет и их. EntityTooLarge не повторяется.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        max_delay: float = 30.0,
+        transient: bool = False,
+        budget: RetryBudget | None = None,
+    ):
+        self.max_retries = max_retries
+        self.max_delay = max_delay
+        self.transient = transient
+        self.budget = budget or RetryBudget()
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ):
+        self.budget.on_request()
+        if _retry_disabled.get():
+            return await make_request(bot, method)
+        name = method.__api_method__
+        transient = self.transient or _idempotent(name)
+        attempt = 0
+        while True:
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                error, reason = e, "retry_after"
+                delay = float(e.retry_after)
+            except TelegramEntityTooLarge:
+                raise
+            except (TelegramServerError, TelegramNetworkError) as e:
+                if not transient:
+                    raise
+                error, reason = e, "transient"
+                delay = min(self.max_delay, 0.5 * 2**attempt) * random.uniform(0.5, 1)
+            attempt += 1
+            if (
+                attempt > self.max_retries
+                or delay > self.max_delay
+                or not self.budget.try_spend()
+            ):
+                raise error
+            API_RETRIES.labels(name, reason).inc()
+            logger.info(
+                "telegram_api_retry",
+                method=name,
+                reason=reason,
+                attempt=attempt,
+                delay=round(delay, 2),
+            )
+            await asyncio.sleep(delay)
+
+
+class MetricsMiddleware(BaseRequestMiddleware):
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ):
+        name = method.__api_method__
+        API_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            API_ERRORS.labels(name, type(e).__name__).inc()
+            raise
+        finally:
+            API_IN_FLIGHT.dec()
+            API_LATENCY.labels(name).observe(time.perf_counter() - started)
+
+
+class PooledAiohttpSession(AiohttpSession):
+    """
+    AiohttpSession, у которой keep-alive и TTL кэша DNS коннектора берутся
+    из конфига. aiogram пересобирает коннектор из своих параметров при
+    каждом сбросе (например, после смены прокси), поэтому они дополняются
+    прямо перед созданием ClientSession.
+    """
+
+    def __init__(
+        self, keepalive_timeout: float, dns_cache_ttl: int, **kwargs: Any
+    ) -> None:
+        super().__init__(**kwargs)
+        self.connector_options = {
+            "keepalive_timeout": keepalive_timeout,
+            "ttl_dns_cache": dns_cache_ttl,
+        }
+
+    async def create_session(self) -> ClientSession:
+        if self._should_reset_connector and issubclass(
+            self._connector_type, TCPConnector
+        ):
+            self._connector_init.update(self.connector_options)
+        return await super().create_session()
+
+
+def build_session(cfg: TelegramConfig) -> AiohttpSession:
+    """AiohttpSession с настройками пула из конфига и middleware повторов/метрик."""
+    kwargs = {"limit": cfg.pool_limit, "timeout": cfg.request_timeout}
+    if cfg.api_server:
+        kwargs["api"] = TelegramAPIServer.from_base(cfg.api_server)
+    session = PooledAiohttpSession(
+        keepalive_timeout=cfg.keepalive_timeout,
+        dns_cache_ttl=cfg.dns_cache_ttl,
+        **kwargs,
+    )
+    # Метрики снаружи — латентность вызова вместе со всеми повторами
+    session.middleware(MetricsMiddleware())
+    session.middleware(
+        RetryMiddleware(
+            max_retries=cfg.retry_max,
+            max_delay=cfg.retry_max_delay,
+            transient=cfg.retry_transient,
+            budget=RetryBudget(ratio=cfg.retry_budget_ratio),
+        )
+    )
+    return session
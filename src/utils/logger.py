@@ -1,5 +1,5 @@
-import logging, os, sys, re, time
-from typing import Iterable
+import atexit, logging, os, queue, sys, re, time
+from logging.handlers import QueueHandler, QueueListener
 
 import structlog
 
@@ -14,18 +14,19 @@ DEFAULT_MASK_KEYS = {
 }
 
 
+def _mask_value(value: str):
+    if not isinstance(value, str):
+        return value
+    if len(value) <= 8:
+        return "******"
+    return value[:4] + "******" + value[-2:]
+
+
 def _mask_kv(_, __, event_dict: dict):
-    def mask_value(value: str):
-        if not isinstance(value, str):
-            return value
-        if len(value) <= 8:
-            return "******"
-        return value[:4] + "******" + value[-2:]
-
-    lowered = {k.lower(): k for k in event_dict.keys()}
-    for lk, orig in lowered.items():
-        if lk in DEFAULT_MASK_KEYS:
-            event_dict[orig] = mask_value(str(event_dict[orig]))
+    # Один проход по ключам без промежуточного dict
+    for key in event_dict:
+        if key.lower() in DEFAULT_MASK_KEYS:
+            event_dict[key] = _mask_value(str(event_dict[key]))
     return event_dict
 
 
@@ -34,25 +35,107 @@ def _add_process_time(_, __, event_dict: dict):
     return event_dict
 
 
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler, который при переполнении очереди теряет строку, а не блокирует."""
+
+    dropped = 0
+    _formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # structlog уже отрендерил строку — без format() и копии записи.
+        # Записи stdlib-логгеров (uvicorn, aiogram, ...) несут exc_info:
+        # traceback дописывается в текст здесь, пока запись не ушла в поток
+        message = record.getMessage()
+        if record.exc_info:
+            message += "\n" + self._formatter.formatException(record.exc_info)
+        elif record.exc_text:
+            message += "\n" + record.exc_text
+        if record.stack_info:
+            message += "\n" + self._formatter.formatStack(record.stack_info)
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        record.stack_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+
+_listener: QueueListener | None = None
+
+
+def _start_async_writer(level: int, maxsize: int) -> None:
+    """Корневой логгер пишет в очередь, stdout пишет фоновый поток."""
+    global _listener
+    if _listener is not None:
+        return
+    # Рекомендации logging HOWTO: не искать caller-фрейм и не собирать
+    # сведения о потоках/процессах для каждой записи
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter("%(message)s"))
+    log_queue: queue.Queue = queue.Queue(maxsize=maxsize)
+
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(_DroppingQueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, stream)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Дописывает хвост очереди логов (для production-режима)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
 def setup_logging(
     service: str = "business-bot",
     env: str | None = None,
     json_logs: bool | None = None,
     level: str = "INFO",
+    production: bool | None = None,
+    queue_size: int = 10000,
 ):
+    """
+    production — быстрый режим: без CallsiteParameterAdder (обход стека на
+    каждое событие) и с фоновой записью через очередь, чтобы I/O логов не
+    блокировал event loop. По умолчанию берётся из LOG_MODE=production.
+    """
     env = env or os.getenv("APP_ENV", "prod")
     json_logs = json_logs if json_logs is not None else (env != "dev")
+    if production is None:
+        production = os.getenv("LOG_MODE", "").lower() == "production"
+    level_value = getattr(logging, level.upper(), logging.INFO)
 
     # stdlib logging
-    logging.basicConfig(
-        level=getattr(logging, level.upper(), logging.INFO),
-        stream=sys.stdout,
-        format="%(message)s",  # structlog сам отформатирует
-    )
+    if production:
+        _start_async_writer(level_value, queue_size)
+    else:
+        logging.basicConfig(
+            level=level_value,
+            stream=sys.stdout,
+            format="%(message)s",  # structlog сам отформатирует
+        )
     for noisy in ("uvicorn", "uvicorn.error", "uvicorn.access", "asyncio", "aiogram"):
         logging.getLogger(noisy).setLevel(logging.INFO)
 
-    shared_processors: Iterable = [
+    shared_processors: list = [
         structlog.contextvars.merge_contextvars,
         _add_process_time,
         _mask_kv,
@@ -60,15 +143,19 @@ def setup_logging(
         structlog.processors.StackInfoRenderer(),
         structlog.processors.format_exc_info,
         structlog.processors.UnicodeDecoder(),
-        structlog.processors.CallsiteParameterAdder(
-            [
-                structlog.processors.CallsiteParameter.FILENAME,
-                structlog.processors.CallsiteParameter.FUNC_NAME,
-                structlog.processors.CallsiteParameter.LINENO,
-            ]
-        ),
+    ]
+    if not production:
+        shared_processors.append(
+            structlog.processors.CallsiteParameterAdder(
+                [
+                    structlog.processors.CallsiteParameter.FILENAME,
+                    structlog.processors.CallsiteParameter.FUNC_NAME,
+                    structlog.processors.CallsiteParameter.LINENO,
+                ]
+            )
+        )
+    shared_processors += [
         structlog.processors.EventRenamer("message"),
-        structlog.processors.add_log_level,
         structlog.stdlib.add_logger_name,
     ]
 
@@ -91,6 +178,7 @@ def setup_logging(
         json=json_logs,
         level=level,
         env=env,
+        production=production,
     )
     return logger
 
@@ -0,0 +1,142 @@
+"""
+Мониторинг event loop.
+
+Сэмплер в самом loop каждые interval секунд засыпает и меряет, насколько
+позже проснулся: это задержка, которую в тот момент получил бы любой
+апдейт. Перцентили по окну последних сэмплов — в /metrics (для автоскейла)
+и в /ready.
+
+Сторожевой поток смотрит на «пульс» сэмплера: если loop не отвечает дольше
+slow_callback, он снимает стек потока loop (sys._current_frames) и пишет,
+какая задача его держит, — синхронный вызов внутри корутины виден сразу,
+без asyncio debug mode.
+"""
+
+import asyncio, sys, threading, time, traceback
+from collections import deque
+from typing import Optional
+
+from utils.logger import get_logger
+from utils.metrics import registry
+
+logger = get_logger(__name__)
+
+LOOP_LAG = registry.histogram(
+    "event_loop_lag_seconds",
+    "Event loop scheduling delay",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+LOOP_STALLS = registry.counter(
+    "event_loop_stalls_total",
+    "Event loop blocked longer than the slow callback threshold",
+)
+
+QUANTILES = (50, 95, 99)
+
+
+class LoopMonitor:
+    def __init__(self):
+        self.interval = 0.1
+        self.slow_callback = 0.25
+        self._samples: deque[float] = deque(maxlen=600)
+        self._beat = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        registry.gauge(
+            "event_loop_lag_quantile_seconds",
+            "Event loop lag percentiles over the recent window",
+            ("quantile",),
+            collect=lambda: {
+                (f"0.{q}",): value for q, value in self.percentiles().items()
+            },
+        )
+
+    def start(
+        self, interval: float = 0.1, slow_callback: float = 0.25, window: int = 600
+    ) -> None:
+        self.interval = interval
+        self.slow_callback = slow_callback
+        self._samples = deque(maxlen=window)
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._sample(), name="loop-lag-sampler")
+        if slow_callback > 0:
+            self._watchdog = threading.Thread(
+                target=self._watch, name="loop-watchdog", daemon=True
+            )
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    def percentiles(self) -> dict[int, float]:
+        if not self._samples:
+            return {}
+        ordered = sorted(self._samples)
+        last = len(ordered) - 1
+        return {q: ordered[min(last, round(last * q / 100))] for q in QUANTILES}
+
+    async def _sample(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            lag = max(0.0, now - expected)
+            self._samples.append(lag)
+            LOOP_LAG.observe(lag)
+
+    def _watch(self) -> None:
+        reported: Optional[float] = None  # пульс, на котором loop встал
+        step = min(self.slow_callback / 2, self.interval)
+        while not self._stopped.wait(step):
+            beat = self._beat
+            if reported is not None and beat != reported:
+                # loop ожил — полная длительность остановки
+                logger.warning(
+                    "event_loop_recovered",
+                    blocked_ms=round((beat - reported - self.interval) * 1000, 1),
+                )
+                reported = None
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.slow_callback or beat == reported:
+                continue
+            reported = beat
+            LOOP_STALLS.inc()
+            self._report(blocked)
+
+    def _report(self, blocked: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread)
+        stack = "".join(traceback.format_stack(frame)) if frame else None
+        task = coroutine = None
+        try:
+            # Из чужого потока: в худшем случае увидим соседнюю задачу
+            current = asyncio.current_task(self._loop)
+        except Exception:
+            current = None
+        if current is not None:
+            task = current.get_name()
+            coro = current.get_coro()
+            coroutine = getattr(coro, "__qualname__", repr(coro))
+        logger.warning(
+            "event_loop_blocked",
+            blocked_ms=round(blocked * 1000, 1),
+            task=task,
+            coroutine=coroutine,
+            stack=stack,
+        )
+
+
+loop_monitor = LoopMonitor()
@@ -0,0 +1,220 @@
+"""
+Лёгкий in-process реестр метрик с выводом в Prometheus text exposition format.
+
+Горячий путь — dict-lookup по кортежу лейблов и пара арифметических операций,
+поэтому метрики можно держать включёнными на каждом апдейте.
+"""
+
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    """
+    Счётчик. Если задан collect — значения снимаются в момент отдачи /metrics
+    (для статистики, которую уже считает сам компонент): collect() возвращает
+    число (без лейблов) или {кортеж_лейблов: число}.
+    """
+
+    kind = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        collect: Callable[[], float | dict] | None = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self):
+        if self.collect is not None:
+            try:
+                result = self.collect()
+            except Exception:
+                return
+            if not isinstance(result, dict):
+                result = {(): result}
+            for values, value in result.items():
+                if value is None:
+                    continue
+                yield f"{self.name}{_fmt_labels(self.labelnames, values)} {_fmt_value(value)}"
+            return
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_fmt_labels(self.labelnames, values)} {_fmt_value(child.value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            acc = 0
+            for bound, count in zip((*self.buckets, float("inf")), child.counts):
+                acc += count
+                le = f'le="{_fmt_value(bound)}"'
+                yield f"{self.name}_bucket{_fmt_labels(self.labelnames, values, le)} {acc}"
+            labels = _fmt_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_fmt_value(child.sum)}"
+            yield f"{self.name}_count{labels} {child.count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is None:
+            self._metrics[metric.name] = metric
+            return metric
+        # Повторная регистрация (перезапуск lifespan) — обновляем источник
+        if getattr(metric, "collect", None) is not None:
+            existing.collect = metric.collect
+        return existing
+
+    def counter(
+        self, name: str, documentation: str, labelnames=(), collect=None
+    ) -> Counter:
+        return self._register(Counter(name, documentation, labelnames, collect))
+
+    def gauge(
+        self, name: str, documentation: str, labelnames=(), collect=None
+    ) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, collect))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in list(self._metrics.values())) + "\n"
+
+
+registry = Registry()
@@ -1,8 +1,4 @@
 import os
-import sentry_sdk
-from sentry_sdk.integrations.fastapi import FastApiIntegration
-from sentry_sdk.integrations.logging import LoggingIntegration
-from sentry_sdk.integrations.redis import RedisIntegration
 
 
 def init_sentry(
@@ -10,6 +6,12 @@ def init_sentry(
 ):
     if not dsn:
         return
+    # sentry_sdk тяжёлый — импортируем только когда он действительно нужен
+    import sentry_sdk
+    from sentry_sdk.integrations.fastapi import FastApiIntegration
+    from sentry_sdk.integrations.logging import LoggingIntegration
+    from sentry_sdk.integrations.redis import RedisIntegration
+
     sentry_sdk.init(
         dsn=dsn,
         environment=env,
@@ -0,0 +1,160 @@
+"""
+Профилирование по запросу (/debug/profile) без передеплоя.
+
+Сессия ограничена окном в seconds и/или числом апдейтов и бывает трёх видов:
+  sample      — поток раз в interval снимает стек потока event loop
+                (sys._current_frames); результат — collapsed stacks для
+                flamegraph.pl/speedscope. Каждый стек начинается с метки
+                «тип апдейта;хендлер», которую ставят middleware логирования.
+  cprofile    — cProfile на потоке loop в течение окна (pstats, top по
+                cumulative). Заметно замедляет обработку — окно держать коротким.
+  tracemalloc — разница снимков аллокаций в начале и в конце окна.
+
+Пока сессии нет, middleware проверяют только profiler.active.
+"""
+
+import asyncio, cProfile, io, os, pstats, sys, threading, tracemalloc
+from collections import Counter
+from typing import Literal, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+Mode = Literal["sample", "cprofile", "tracemalloc"]
+
+MAX_SECONDS = 120.0
+TOP_N = 40
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{os.path.basename(code.co_filename)}:{name}"
+
+
+class Profiler:
+    def __init__(self):
+        self.active = False
+        self._tags: dict[asyncio.Task, str] = {}
+        self._updates = 0
+        self._limit = 0
+        self._done: Optional[asyncio.Event] = None
+
+    # --- Метки из middleware (вызываются только при active) ---
+
+    def tag(self, update_type: str) -> None:
+        task = asyncio.current_task()
+        if task is not None:
+            self._tags[task] = update_type
+
+    def tag_handler(self, handler: str) -> None:
+        task = asyncio.current_task()
+        base = self._tags.get(task)
+        if base is not None:
+            self._tags[task] = f"{base.split(';', 1)[0]};{handler}"
+
+    def untag(self) -> None:
+        self._tags.pop(asyncio.current_task(), None)
+        self._updates += 1
+        if self._limit and self._updates >= self._limit and self._done:
+            self._done.set()
+
+    # --- Сессия ---
+
+    async def run(
+        self,
+        mode: Mode = "sample",
+        seconds: float = 10.0,
+        updates: int = 0,
+        interval: float = 0.005,
+    ) -> str:
+        if self.active:
+            raise ProfilerBusy("profiling session already running")
+        seconds = min(max(seconds, 0.1), MAX_SECONDS)
+        self._updates = 0
+        self._limit = updates
+        self._done = asyncio.Event()
+        logger.info("profiling_started", mode=mode, seconds=seconds, updates=updates)
+        if mode == "sample":
+            result = await self._sample(seconds, interval)
+        elif mode == "cprofile":
+            result = await self._cprofile(seconds)
+        else:
+            result = await self._tracemalloc(seconds)
+        logger.info("profiling_finished", mode=mode, updates=self._updates)
+        return result
+
+    async def _window(self, seconds: float) -> None:
+        self.active = True
+        try:
+            await asyncio.wait_for(self._done.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.active = False
+            self._tags.clear()
+
+    async def _sample(self, seconds: float, interval: float) -> str:
+        loop = asyncio.get_running_loop()
+        thread_id = threading.get_ident()
+        stacks: Counter[str] = Counter()
+        stop = threading.Event()
+
+        def sampler():
+            while not stop.wait(interval):
+                frame = sys._current_frames().get(thread_id)
+                if frame is None:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.reverse()
+                task = asyncio.current_task(loop)
+                tag = self._tags.get(task, "loop") if task is not None else "idle"
+                stacks[f"{tag};{';'.join(labels)}"] += 1
+
+        thread = threading.Thread(target=sampler, name="profiler-sampler", daemon=True)
+        thread.start()
+        try:
+            await self._window(seconds)
+        finally:
+            stop.set()
+            await asyncio.to_thread(thread.join)
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    async def _cprofile(self, seconds: float) -> str:
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            await self._window(seconds)
+        finally:
+            profile.disable()
+        out = io.StringIO()
+        stats = pstats.Stats(profile, stream=out)
+        stats.sort_stats("cumulative").print_stats(TOP_N)
+        return out.getvalue()
+
+    async def _tracemalloc(self, seconds: float) -> str:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(25)
+        try:
+            before = tracemalloc.take_snapshot()
+            await self._window(seconds)
+            after = tracemalloc.take_snapshot()
+        finally:
+            if started:
+                tracemalloc.stop()
+        diff = after.compare_to(before, "lineno")
+        lines = [f"updates: {self._updates}"]
+        lines += [str(stat) for stat in diff[:TOP_N]]
+        return "\n".join(lines) + "\n"
+
+
+profiler = Profiler()
@@ -1,11 +1,112 @@
+import time
+from datetime import datetime, timezone
+
+from apscheduler.events import (
+    EVENT_JOB_ERROR,
+    EVENT_JOB_EXECUTED,
+    EVENT_JOB_SUBMITTED,
+    JobExecutionEvent,
+    JobSubmissionEvent,
+)
+from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
+from admin.stats import rollup_stats
+from core.config import settings
+from services.jobs import RunContextExecutor
+from utils.metrics import registry
+
+JOB_DURATION = registry.histogram(
+    "scheduler_job_duration_seconds",
+    "Scheduler job run time",
+    ("job",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0),
+)
+JOB_LAG = registry.histogram(
+    "scheduler_job_lag_seconds",
+    "Delay between scheduled and actual job start",
+    ("job",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0),
+)
+JOB_RUNS = registry.counter(
+    "scheduler_job_runs_total",
+    "Scheduler job runs by outcome",
+    ("job", "status"),
+)
+
+
+def _track_job_metrics(scheduler: AsyncIOScheduler) -> None:
+    started: dict[str, float] = {}
+
+    def on_submitted(event: JobSubmissionEvent):
+        started[event.job_id] = time.perf_counter()
+        if event.scheduled_run_times:
+            lag = datetime.now(timezone.utc) - event.scheduled_run_times[-1]
+            JOB_LAG.labels(event.job_id).observe(max(0.0, lag.total_seconds()))
+
+    def on_finished(event: JobExecutionEvent):
+        start = started.pop(event.job_id, None)
+        if start is not None:
+            JOB_DURATION.labels(event.job_id).observe(time.perf_counter() - start)
+        JOB_RUNS.labels(event.job_id, "error" if event.exception else "ok").inc()
+
+    scheduler.add_listener(on_submitted, EVENT_JOB_SUBMITTED)
+    scheduler.add_listener(on_finished, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+
+
+def _jobstore():
+    if settings.scheduler.jobstore == "redis":
+        from apscheduler.jobstores.redis import RedisJobStore
+
+        return RedisJobStore(
+            jobs_key="apscheduler:jobs",
+            run_times_key="apscheduler:run_times",
+            host=settings.redis.host,
+            port=settings.redis.port,
+            db=settings.redis.db,
+            password=settings.redis.password,
+        )
+    return MemoryJobStore()
+
 
 def schedule_tasks(bot) -> AsyncIOScheduler:
-    scheduler = AsyncIOScheduler(timezone="UTC")
+    scheduler = AsyncIOScheduler(
+        timezone="UTC",
+        jobstores={"default": _jobstore()},
+        executors={"default": RunContextExecutor()},
+        job_defaults={
+            "coalesce": settings.scheduler.coalesce,
+            "misfire_grace_time": settings.scheduler.misfire_grace_time,
+            "max_instances": settings.scheduler.max_instances,
+        },
+    )
+    _track_job_metrics(scheduler)
+
+    # Итоги вчерашнего дня админ-статистики (admin/stats.py)
+    if settings.stats.enabled:
+        scheduler.add_job(
+            rollup_stats,
+            "cron",
+            hour=0,
+            minute=10,
+            timezone=settings.stats.timezone,
+            id="admin_stats_rollup",
+            replace_existing=True,
+        )
 
     # Примеры:
     # scheduler.add_job(lambda: print("tick"), "interval", minutes=5)
     # scheduler.add_job(send_daily_report, trigger="cron", hour=7, minute=0, kwargs={"bot": bot})
+    #
+    # С persistent job store задача должна быть функцией уровня модуля с
+    # сериализуемыми аргументами (bot берём из web.runtime внутри задачи),
+    # а id фиксированным, чтобы рестарт не плодил копии:
+    # scheduler.add_job(send_daily_report, "cron", hour=7, id="daily_report", replace_existing=True)
+    #
+    # Запуск ровно одной репликой (services.jobs):
+    # @jobs.exclusive(lock_at_most=600, lock_at_least=30)
+    # async def send_daily_report(): ...
+    # Рассылка по расписанию (сначала runtime.broadcaster.create(...)):
+    # scheduler.add_job(runtime.broadcaster.start, "cron", hour=10, args=["promo-weekly"])
 
     return scheduler
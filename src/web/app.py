@@ -4,8 +4,10 @@ from starlette.middleware.cors import CORSMiddleware
 from middlewares import RequestIDMiddleware
 from web.lifespan import lifespan
 from web.routes.health import router as health_router
+from web.routes.metrics import router as metrics_router
 from web.routes.telegram import router as telegram_router
-from web.payments import router as payments_router
+from web.routes.payments import router as payments_router
+from web.routes.debug import router as debug_router
 
 
 def create_app() -> FastAPI:
@@ -24,8 +26,10 @@ def create_app() -> FastAPI:
 
     # Роуты
     app.include_router(health_router)
+    app.include_router(metrics_router)
     app.include_router(telegram_router)
     app.include_router(payments_router)
+    app.include_router(debug_router)
     app.add_middleware(RequestIDMiddleware)
 
     return app
@@ -0,0 +1,44 @@
+from typing import Literal
+
+from aiogram import Bot
+from aiogram.types import Update
+from fastapi import HTTPException, Request
+
+try:
+    import orjson  # опциональный быстрый JSON-бэкенд
+except ImportError:
+    orjson = None
+
+
+async def read_body(request: Request, limit: int) -> bytes:
+    """
+    Читает тело запроса, обрывая чтение сразу после превышения лимита.
+    Content-Length проверяется до чтения, chunked-тела — по ходу стрима.
+    """
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > limit:
+        raise HTTPException(status_code=413, detail="Payload too large")
+
+    chunks: list[bytes] = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(status_code=413, detail="Payload too large")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def decode_update(
+    body: bytes,
+    bot: Bot,
+    backend: Literal["pydantic", "orjson"] = "pydantic",
+) -> Update:
+    """
+    Валидирует Update прямо из байтов.
+    pydantic — один проход JSON-режимом pydantic-core без промежуточного dict;
+    orjson — быстрый парсинг в dict и model_validate (если orjson установлен).
+    """
+    if backend == "orjson" and orjson is not None:
+        return Update.model_validate(orjson.loads(body), context={"bot": bot})
+    return Update.model_validate_json(body, context={"bot": bot})
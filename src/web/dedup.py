@@ -0,0 +1,62 @@
+from redis.asyncio import Redis
+
+from utils.cache import TTLCache
+from utils.logger import get_logger
+from utils.metrics import registry
+
+logger = get_logger(__name__)
+
+DUPLICATES = registry.counter(
+    "telegram_updates_duplicate_total",
+    "Redelivered updates dropped before dp.feed_update",
+    ("source",),
+)
+
+
+class UpdateDeduplicator:
+    """
+    Отсекает повторную доставку одного update_id.
+
+    Первичный источник правды — атомарный SET NX EX в Redis (общий для всех
+    подов). Локальный LRU перед ним ловит повторы, уже виденные этим процессом,
+    без сетевого round trip.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        prefix: str = "tg:upd:",
+        ttl: int = 86400,
+        lru_size: int = 10000,
+    ):
+        self.redis = redis
+        self.prefix = prefix
+        self.ttl = ttl
+        self._seen: TTLCache[bool] = TTLCache(maxsize=lru_size, ttl=ttl)
+
+    async def seen(self, update_id: int) -> bool:
+        """True — апдейт уже был, обрабатывать не нужно."""
+        if update_id in self._seen:
+            DUPLICATES.labels("memory").inc()
+            return True
+        try:
+            fresh = await self.redis.set(
+                f"{self.prefix}{update_id}", 1, nx=True, ex=self.ttl
+            )
+        except Exception:
+            # Redis недоступен — лучше обработать дубль, чем потерять апдейт
+            logger.warning("dedup_redis_failed", update_id=update_id, exc_info=True)
+            fresh = True
+        self._seen.set(update_id, True)
+        if not fresh:
+            DUPLICATES.labels("redis").inc()
+            return True
+        return False
+
+    async def release(self, update_id: int) -> None:
+        """Снимает отметку, если обработка упала и Telegram должен переслать апдейт."""
+        self._seen.pop(update_id)
+        try:
+            await self.redis.delete(f"{self.prefix}{update_id}")
+        except Exception:
+            logger.warning("dedup_release_failed", update_id=update_id, exc_info=True)
@@ -1,68 +1,248 @@
-from contextlib import asynccontextmanager
+import asyncio, hashlib, time
+from contextlib import asynccontextmanager, contextmanager
 from fastapi import FastAPI
 
 from web.runtime import runtime
 from core.config import settings
 from utils.logger import setup_logging
-from core.storage.db_helper import db_helper, test_connection
-from middlewares import DbSessionMiddleware, LoggingContextMiddleware
+from core.storage.db_helper import db_helper, prewarm_pool, test_connection
+from middlewares import setup_middlewares
+from services.leader import LeaderElector
+from services.jobs import jobs
+from utils.loop_monitor import loop_monitor
+from web.readiness import (
+    check_db,
+    loop_lag_check,
+    pool_check,
+    readiness,
+    redis_check,
+)
 
-logger = setup_logging(__name__)
+logger = setup_logging(__name__, production=settings.log.production)
 
+# Ссылки на фоновые задачи: иначе их может собрать GC до завершения
+_background: set[asyncio.Task] = set()
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # --- Startup ---
-    await runtime.build()
+
+class StartupTimer:
+    """Длительность фаз старта — одним событием startup_timing в конце."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[f"{name}_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+
+    def report(self) -> dict:
+        total = round((time.perf_counter() - self.started) * 1000, 1)
+        return {"total_ms": total, **self.phases}
+
+
+def _webhook_fingerprint(
+    url: str, allowed_updates: list[str], secret: str | None
+) -> str:
+    # getWebhookInfo не возвращает секрет — сверяем его по отпечатку в Redis
+    raw = "|".join((url, ",".join(sorted(allowed_updates)), secret or ""))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+async def ensure_webhook() -> bool:
+    """
+    Регистрирует вебхук, только если он отличается от желаемого.
+    True — вызван set_webhook, False — уже актуален.
+    """
     bot, dp = runtime.bot, runtime.dp
+    url = settings.web.get_webhook_url()
+    allowed = dp.resolve_used_update_types()
+    secret = getattr(settings.web, "secret", None) or None
+    fingerprint = _webhook_fingerprint(url, allowed, secret)
+    key = f"webhook:fingerprint:{bot.id}"
+
+    info, stored = await asyncio.gather(bot.get_webhook_info(), runtime.redis.get(key))
+    if isinstance(stored, bytes):
+        stored = stored.decode()
+    if (
+        info.url == url
+        and sorted(info.allowed_updates or []) == sorted(allowed)
+        and stored == fingerprint
+    ):
+        return False
+
+    # Сбрасываем очередь только при первой регистрации (или смене URL):
+    # при переезде лидера апдейты, накопленные Telegram, не теряются
+    await bot.set_webhook(
+        url=url,
+        allowed_updates=allowed,
+        drop_pending_updates=info.url != url,
+        secret_token=secret,
+    )
+    await runtime.redis.set(key, fingerprint)
+    return True
+
+
+async def _notify_admin(text: str) -> None:
+    try:
+        await runtime.bot.send_message(settings.main.admin_id, text)
+    except Exception:
+        logger.warning("Admin notify failed", exc_info=True)
+
+
+async def on_elected():
+    """Обязанности, которые в кластере выполняет ровно один процесс."""
+    changed = await ensure_webhook()
+    logger.info("webhook_registered" if changed else "webhook_up_to_date")
+
+    # Планировщик (в не-распределённом режиме стартует на паузе)
+    if not settings.scheduler.distributed:
+        runtime.scheduler.resume()
+
+    # Рассылки ведёт лидер: незавершённые продолжаются, новые (/broadcast
+    # на любой реплике) подхватываются из bc:active
+    if runtime.broadcaster:
+        runtime.broadcaster.watch()
+
+    # Уведомление админу — в фоне, готовность к приёму апдейтов не ждёт его
+    task = asyncio.create_task(_notify_admin("🤖 Бот запущен (webhook)."))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
 
-    # Redis ping (если включён)
-    if runtime.redis:
+
+async def on_revoked():
+    if not settings.scheduler.distributed:
+        runtime.scheduler.pause()
+    if runtime.broadcaster:
+        await runtime.broadcaster.stop()
+
+
+async def _ping_redis(timer: StartupTimer) -> None:
+    with timer.phase("redis_ping"):
         try:
             pong = await runtime.redis.ping()
             logger.info(f"Redis PING: {pong}")
-        except Exception as e:
+        except Exception:
             logger.exception("Redis unavailable")
             raise
 
-    # Webhook register (с секретом, если задан)
-    secret = getattr(settings.web, "secret", None)
-    await bot.set_webhook(
-        url=settings.web.get_webhook_url(),
-        allowed_updates=dp.resolve_used_update_types(),
-        drop_pending_updates=True,
-        secret_token=secret if secret else None,
+
+async def _ping_db(timer: StartupTimer) -> None:
+    with timer.phase("db_ping"):
+        async with db_helper.session_factory() as s:
+            await test_connection(s)
+    with timer.phase("db_prewarm"):
+        await prewarm_pool(settings.db.prewarm)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # --- Startup ---
+    timer = StartupTimer()
+    monitor = settings.monitor
+    loop_monitor.start(
+        interval=monitor.loop_interval,
+        slow_callback=monitor.slow_callback,
+        window=monitor.lag_window,
     )
+    with timer.phase("build"):
+        await runtime.build()
+    bot, dp = runtime.bot, runtime.dp
 
-    # DB ping
-    async with db_helper.session_factory() as s:
-        await test_connection(s)
+    # Redis и БД проверяем параллельно: старт ждёт самый медленный, а не сумму
+    with timer.phase("probes"):
+        await asyncio.gather(_ping_redis(timer), _ping_db(timer))
 
-    # Aiogram DB middleware
-    dp.update.outer_middleware(
-        DbSessionMiddleware(session_pool=db_helper.session_factory)
+    # Aiogram middlewares (БД, контекст логов, имена хендлеров)
+    db_middleware = setup_middlewares(
+        dp, db_helper.session_factory, runtime.stats, runtime.limiter, runtime.activity
     )
 
-    # loging_ctx
-    dp.update.outer_middleware(LoggingContextMiddleware())
+    with timer.phase("workers"):
+        # Воркеры очереди апдейтов (если включён быстрый ACK)
+        if runtime.updates:
+            runtime.updates.start()
 
-    # Планировщик
-    runtime.scheduler.start()
+        # Доставка outbox
+        runtime.outbox.start()
 
-    # Уведомление админу
-    try:
-        await bot.send_message(settings.main.admin_id, "🤖 Бот запущен (webhook).")
-    except Exception:
-        logger.warning("Admin notify failed", exc_info=True)
+        # Отложенная запись активности
+        runtime.activity.start()
+
+        # Отправка почты
+        runtime.mailer.start()
+
+        # Фоновые проверки для /ready
+        readiness.register("db", check_db)
+        readiness.register("db_pool", pool_check(monitor.max_pool_saturation))
+        readiness.register("redis", redis_check(runtime.redis))
+        readiness.register("event_loop", loop_lag_check(monitor.max_loop_lag))
+        readiness.start()
+
+        # Планировщик: задачи пойдут только у лидера, либо во всех репликах
+        # с блокировкой на запуск (scheduler.distributed)
+        runtime.scheduler.start(paused=not settings.scheduler.distributed)
+        jobs.start_workers(settings.scheduler.chunk_workers)
+
+    # Лидер: в одиночном режиме — сам процесс, иначе выборы через Redis
+    elector = None
+    with timer.phase("leader"):
+        if settings.web.use_leader_election and runtime.redis:
+            elector = LeaderElector(
+                runtime.redis,
+                key=f"leader:{bot.id}",
+                ttl=settings.web.leader_ttl,
+                on_elected=on_elected,
+                on_revoked=on_revoked,
+            )
+            elector.start()
+        else:
+            await on_elected()
+
+    logger.info("startup_timing", **timer.report())
 
     yield
 
     # --- Shutdown ---
+    readiness.drain()
+    is_leader = elector.is_leader if elector else True
+    if elector:
+        await elector.stop()
+    else:
+        await on_revoked()
+
+    if runtime.updates:
+        await runtime.updates.stop(timeout=settings.queue.drain_timeout)
+        logger.info("update_queue_stopped", **runtime.updates.stats())
+
+    # Дописываем накопленную активность, пока пул БД ещё открыт
     try:
-        await bot.send_message(settings.main.admin_id, "🛑 Бот остановлен.")
+        await runtime.activity.stop()
     except Exception:
-        pass
+        logger.exception("write_behind_final_flush_failed")
+
+    # Письма из очереди уходят до закрытия Redis (dead-letter)
+    await runtime.mailer.stop()
+
+    # Сколько апдейтов реально ходили в БД — для подбора размера пула
+    logger.info("db_session_usage", **db_middleware.stats.snapshot())
+
+    if is_leader:
+        try:
+            await bot.send_message(settings.main.admin_id, "🛑 Бот остановлен.")
+        except Exception:
+            pass
+
+    # В кластере вебхук не снимаем: его продолжают обслуживать другие процессы
+    if elector is None:
+        await bot.delete_webhook()
 
-    await bot.delete_webhook()
+    if _background:
+        await asyncio.wait(_background, timeout=5)
 
+    await readiness.stop()
     await runtime.close()
+    await loop_monitor.stop()
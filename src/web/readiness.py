@@ -0,0 +1,140 @@
+"""
+Готовность реплики для /ready. Проверки зависимостей выполняет одна фоновая
+задача раз в ttl секунд, а эндпоинт отдаёт последний результат: сколько бы
+раз оркестратор ни дёргал пробу, в Postgres и Redis уходит один запрос за ttl.
+"""
+
+import asyncio, time
+from typing import Awaitable, Callable, Optional
+
+from core.config import MonitorConfig, settings
+from core.storage.db_helper import db_helper, test_connection
+from utils.loop_monitor import loop_monitor
+from utils.logger import get_logger
+from utils.metrics import registry
+
+logger = get_logger(__name__)
+
+READY_CHECK_DURATION = registry.histogram(
+    "readiness_check_duration_seconds",
+    "Readiness probe check duration",
+    ("check",),
+)
+READY_CHECK_FAILED = registry.counter(
+    "readiness_check_failures_total",
+    "Readiness probe checks that failed",
+    ("check",),
+)
+
+# Проверка: None — всё хорошо, строка — причина неготовности
+Check = Callable[[], Awaitable[Optional[str]]]
+
+
+class Readiness:
+    def __init__(self, cfg: MonitorConfig):
+        self.cfg = cfg
+        self._checks: dict[str, Check] = {}
+        self._results: dict[str, Optional[str]] = {}
+        self._checked_at = 0.0
+        self._draining = False
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, check: Check) -> None:
+        self._checks[name] = check
+
+    def start(self) -> None:
+        self._draining = False
+        self._task = asyncio.create_task(self._run(), name="readiness-probes")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def drain(self) -> None:
+        """Остановка: снять реплику с балансировки раньше, чем закроются пулы."""
+        self._draining = True
+
+    def snapshot(self) -> tuple[bool, dict]:
+        age = time.monotonic() - self._checked_at if self._checked_at else None
+        checks = {name: error or "ok" for name, error in self._results.items()}
+        # Пробы давно не обновлялись — значит, сам loop или фоновая задача встали
+        stale = age is None or age > self.cfg.ready_ttl * 3
+        ready = (
+            not self._draining
+            and not stale
+            and all(error is None for error in self._results.values())
+        )
+        return ready, {
+            "status": "ok" if ready else "unavailable",
+            "draining": self._draining,
+            "age_s": round(age, 2) if age is not None else None,
+            "checks": checks,
+        }
+
+    async def refresh(self) -> None:
+        names = list(self._checks)
+        results = await asyncio.gather(*(self._timed(n) for n in names))
+        self._results = dict(zip(names, results))
+        self._checked_at = time.monotonic()
+
+    async def _timed(self, name: str) -> Optional[str]:
+        started = time.perf_counter()
+        try:
+            error = await asyncio.wait_for(self._checks[name](), self.cfg.probe_timeout)
+        except asyncio.TimeoutError:
+            error = "timeout"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        READY_CHECK_DURATION.labels(name).observe(time.perf_counter() - started)
+        if error is not None:
+            READY_CHECK_FAILED.labels(name).inc()
+        return error
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("readiness_refresh_failed")
+            await asyncio.sleep(self.cfg.ready_ttl)
+
+
+async def check_db() -> Optional[str]:
+    async with db_helper.session_factory() as session:
+        await test_connection(session)
+    return None
+
+
+def pool_check(max_saturation: float) -> Check:
+    async def check() -> Optional[str]:
+        pool = db_helper.engine.pool
+        capacity = pool.size() + max(0, getattr(pool, "_max_overflow", 0))
+        used = pool.checkedout()
+        if capacity and used / capacity >= max_saturation:
+            return f"db pool saturated: {used}/{capacity}"
+        return None
+
+    return check
+
+
+def redis_check(redis) -> Check:
+    async def check() -> Optional[str]:
+        await redis.ping()
+        return None
+
+    return check
+
+
+def loop_lag_check(max_lag: float) -> Check:
+    async def check() -> Optional[str]:
+        p99 = loop_monitor.percentiles().get(99)
+        if p99 is not None and p99 > max_lag:
+            return f"event loop lag p99 {p99 * 1000:.0f} ms"
+        return None
+
+    return check
+
+
+readiness = Readiness(settings.monitor)
@@ -0,0 +1,42 @@
+import hmac
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+
+from core.config import settings
+from utils.profiling import MAX_SECONDS, ProfilerBusy, profiler
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+
+def _check_token(request: Request) -> None:
+    expected = settings.web.admin_token
+    if not expected:
+        # Без токена эндпоинта как будто нет
+        raise HTTPException(status_code=404)
+    got = request.headers.get("X-Admin-Token", "")
+    if not hmac.compare_digest(got.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@router.get("/profile")
+async def profile(
+    request: Request,
+    mode: Literal["sample", "cprofile", "tracemalloc"] = "sample",
+    seconds: float = Query(10.0, gt=0, le=MAX_SECONDS),
+    updates: int = Query(0, ge=0),
+    interval: float = Query(0.005, ge=0.001, le=1.0),
+):
+    """
+    Профиль этого процесса за окно seconds (или до updates апдейтов):
+      curl -H "X-Admin-Token: ..." "https://bot/debug/profile?seconds=30" > out.folded
+      flamegraph.pl out.folded > flame.svg
+    При нескольких воркерах uvicorn ответит тот, кому достался запрос.
+    """
+    _check_token(request)
+    try:
+        result = await profiler.run(mode, seconds, updates, interval)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(result)
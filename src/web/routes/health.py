@@ -1,5 +1,8 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
 from core.config import settings
+from web.readiness import readiness
 
 router = APIRouter(tags=["infra"])
 
@@ -9,6 +12,13 @@ async def health():
     return {"status": "ok"}
 
 
+@router.get("/ready")
+async def ready():
+    # Закэшированный результат фоновых проверок — проба не нагружает БД/Redis
+    is_ready, body = readiness.snapshot()
+    return JSONResponse(body, status_code=200 if is_ready else 503)
+
+
 @router.get("/version")
 async def version():
     return {
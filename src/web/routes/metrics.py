@@ -0,0 +1,73 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from core.storage.db_helper import db_helper
+from utils.metrics import registry
+from web.runtime import runtime
+
+router = APIRouter(tags=["infra"])
+
+
+def _db_pool() -> dict:
+    pool = db_helper.engine.pool
+    return {
+        ("size",): pool.size(),
+        ("checked_out",): pool.checkedout(),
+        ("checked_in",): pool.checkedin(),
+        ("overflow",): pool.overflow(),
+    }
+
+
+def _redis_pool() -> dict:
+    if runtime.redis is None:
+        return {}
+    pool = runtime.redis.connection_pool
+    return {
+        ("in_use",): len(getattr(pool, "_in_use_connections", ())),
+        ("available",): len(getattr(pool, "_available_connections", ())),
+        ("max",): getattr(pool, "max_connections", None),
+    }
+
+
+def _update_queue(key: str):
+    def collect():
+        return runtime.updates.stats()[key] if runtime.updates else None
+
+    return collect
+
+
+registry.gauge(
+    "db_pool_connections",
+    "SQLAlchemy pool state",
+    ("state",),
+    collect=_db_pool,
+)
+registry.gauge(
+    "redis_pool_connections",
+    "Redis client connection pool state",
+    ("state",),
+    collect=_redis_pool,
+)
+registry.gauge(
+    "update_queue_depth",
+    "Updates waiting in the in-process queue",
+    collect=_update_queue("depth"),
+)
+registry.counter(
+    "update_queue_rejected_total",
+    "Updates rejected because the queue was full",
+    collect=_update_queue("rejected"),
+)
+registry.gauge(
+    "update_queue_wait_max_ms",
+    "Max time an update waited in the queue",
+    collect=_update_queue("wait_max_ms"),
+)
+
+
+@router.get("/metrics")
+async def metrics():
+    return PlainTextResponse(
+        registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -1,19 +1,36 @@
-from fastapi import APIRouter, Request
+import json
 
-from web.runtime import runtime
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import PlainTextResponse
 
-# Импортируй свою реализацию обработчика:
-# from your_module import handle_payment_notification
+from core.config import settings
+from core.storage.db_helper import db_helper
+from services.payments import verify_token, record_notification, PAYMENT_NOTIFICATIONS
+from web.decoding import read_body
+from web.runtime import runtime
 
 router = APIRouter(tags=["payments"])
 
 
 @router.post("/payments/callback")
 async def payment_callback(request: Request):
-    # Пример: проксируем в общий обработчик
-    # return await handle_payment_notification(bot=runtime.bot, dp=runtime.dp, request=request)
-    # Пока просто заглушка:
-    data = await request.json()
-    # TODO: валидация подписи провайдера
-    # TODO: идемпотентность
-    return {"received": True, "size": len(str(data))}
+    # Подпись считается по полям сырого тела, без повторного парсинга
+    body = await read_body(request, settings.web.max_body_size)
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+    if not isinstance(payload, dict) or not verify_token(
+        payload, settings.pay.tinkoff_terminal_key, settings.pay.tinkoff_secret
+    ):
+        PAYMENT_NOTIFICATIONS.labels("bad_signature").inc()
+        raise HTTPException(status_code=403, detail="Invalid token")
+
+    # Идемпотентность + outbox в одной транзакции; уведомление уйдёт асинхронно
+    async with db_helper.session_factory() as session:
+        created = await record_notification(session, payload)
+    if created and runtime.outbox:
+        runtime.outbox.wake()
+
+    # Tinkoff ждёт ровно "OK", иначе будет повторять уведомление
+    return PlainTextResponse("OK")
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Request, HTTPException
-from aiogram.types import Update
 from web.runtime import runtime
+from web.decoding import read_body, decode_update
+from middlewares.logging_ctx import request_id_var
 from core.config import settings
 
 router = APIRouter(tags=["telegram"])
@@ -14,12 +15,42 @@ async def telegram_webhook(request: Request):
         got = request.headers.get("X-Telegram-Bot-Api-Secret-Token")
         if got != expected:
             raise HTTPException(status_code=401, detail="Invalid webhook secret")
-    rid = request.headers.get("X-Request-ID")
-    payload = await request.json()
-    update = Update.model_validate(payload, context={"bot": runtime.bot})
-    await runtime.dp.feed_update(
-        bot=runtime.bot,
-        update=update,
-        request_id=rid,
-    )
+    rid = request.headers.get("X-Request-ID") or request_id_var.get()
+    body = await read_body(request, settings.web.max_body_size)
+    try:
+        update = decode_update(body, runtime.bot, settings.web.json_backend)
+    except ValueError:
+        # pydantic.ValidationError и ошибки JSON-парсера — наследники ValueError
+        raise HTTPException(status_code=400, detail="Invalid update payload")
+    # Повторная доставка того же update_id — подтверждаем и не обрабатываем
+    dedup = runtime.dedup
+    if dedup and await dedup.seen(update.update_id):
+        return {"ok": True}
+    if runtime.stream:
+        # Режим stream: обработка — в воркерах (src/worker.py)
+        try:
+            await runtime.stream.publish(update, body, request_id=rid)
+        except Exception:
+            if dedup:
+                await dedup.release(update.update_id)
+            raise HTTPException(status_code=503, detail="Update stream unavailable")
+        return {"ok": True}
+    if runtime.updates:
+        # Быстрый ACK: обработка уйдёт в воркеры очереди
+        if not await runtime.updates.put(update, request_id=rid):
+            if dedup:
+                await dedup.release(update.update_id)
+            raise HTTPException(status_code=503, detail="Update queue is full")
+        return {"ok": True}
+    try:
+        await runtime.dp.feed_update(
+            bot=runtime.bot,
+            update=update,
+            request_id=rid,
+        )
+    except Exception:
+        # Telegram пришлёт апдейт повторно — он не должен отсеяться как дубль
+        if dedup:
+            await dedup.release(update.update_id)
+        raise
     return {"ok": True}
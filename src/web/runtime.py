@@ -9,8 +9,24 @@ from core.config import settings
 from utils.logger import setup_logging
 from routers import register_routers
 from utils.scheduler import schedule_tasks
+from utils.bot_session import build_session
+from web.update_queue import UpdateQueue
+from web.dedup import UpdateDeduplicator
+from core.storage.db_helper import db_helper
+from core.storage.fsm import CachedRedisStorage
+from core.storage.model_cache import caches
+from services.outbox import OutboxRelay
+from services.payments import PAYMENT_STATUS_KIND, payment_status_handler
+from services.broadcast import Broadcaster
+from services.write_behind import WriteBehindBuffer
+from services.mailer import Mailer
+from core.models import UserActivity
+from services.jobs import jobs
+from services.update_stream import UpdateStreamProducer
+from admin.stats import StatsRecorder, build_recorder
+from middlewares.throttling import RateLimiter
 
-logger = setup_logging(__name__)
+logger = setup_logging(__name__, production=settings.log.production)
 
 
 class Runtime:
@@ -19,11 +35,22 @@ class Runtime:
         self.dp: Optional[Dispatcher] = None
         self.redis: Optional[Redis] = None
         self.scheduler = None
+        self.updates: Optional[UpdateQueue] = None
+        self.stream: Optional[UpdateStreamProducer] = None
+        self.dedup: Optional[UpdateDeduplicator] = None
+        self.outbox: Optional[OutboxRelay] = None
+        self.broadcaster: Optional[Broadcaster] = None
+        self.activity: Optional[WriteBehindBuffer] = None
+        self.stats: Optional[StatsRecorder] = None
+        self.mailer: Optional[Mailer] = None
+        self.limiter: Optional[RateLimiter] = None
 
     async def build(self) -> "Runtime":
-        # Bot
+        # Bot: пул соединений, повторы и метрики исходящих вызовов
+        # (api_server — локальный Bot API сервер или фейк для тестов)
         self.bot = Bot(
             token=settings.bot.token,
+            session=build_session(settings.bot),
             default=DefaultBotProperties(parse_mode=settings.bot.parse_mode),
         )
 
@@ -35,9 +62,16 @@ class Runtime:
             )
             storage = RedisStorage(
                 redis=self.redis,
-                state_ttl=172800,
-                data_ttl=172800,
+                state_ttl=settings.fsm.state_ttl,
+                data_ttl=settings.fsm.data_ttl,
             )
+            if settings.fsm.cache:
+                storage = CachedRedisStorage(
+                    storage,
+                    ttl=settings.fsm.cache_ttl,
+                    maxsize=settings.fsm.cache_size,
+                )
+                storage.start()
         else:
             storage = MemoryStorage()
 
@@ -47,15 +81,111 @@ class Runtime:
         # Подключаем твои aiogram-роутеры тут (команды/сцены/прочее)
         register_routers(self.dp)
 
-        # Планировщик задач
+        # Отсев повторной доставки апдейтов (нужен общий Redis)
+        if self.redis and settings.dedup.enabled:
+            self.dedup = UpdateDeduplicator(
+                redis=self.redis,
+                prefix=f"tg:upd:{self.bot.id}:",
+                ttl=settings.dedup.ttl,
+                lru_size=settings.dedup.lru_size,
+            )
+
+        # Очередь апдейтов для быстрого ACK вебхука (опционально):
+        # Redis Streams с отдельными воркерами или in-process очередь
+        if settings.ingest.mode == "stream" and self.redis:
+            self.stream = UpdateStreamProducer(self.redis, settings.ingest)
+        elif settings.queue.enabled:
+            self.updates = UpdateQueue(
+                bot=self.bot,
+                dp=self.dp,
+                maxsize=settings.queue.maxsize,
+                workers=settings.queue.workers,
+                overflow=settings.queue.overflow,
+                block_timeout=settings.queue.block_timeout,
+                shard_size=settings.queue.shard_size,
+                redis=self.redis,
+                dead_letter_key=settings.queue.dead_letter_key,
+                dead_letter_maxlen=settings.queue.dead_letter_maxlen,
+            )
+
+        # Outbox: асинхронные побочные эффекты (уведомления об оплате)
+        self.outbox = OutboxRelay(
+            db_helper.session_factory,
+            interval=settings.outbox.interval,
+            batch_size=settings.outbox.batch_size,
+            max_attempts=settings.outbox.max_attempts,
+            claim_ttl=settings.outbox.claim_ttl,
+        )
+        self.outbox.register(PAYMENT_STATUS_KIND, payment_status_handler(self.bot))
+
+        # Активность пользователей: last_seen/счётчики пачками, а не UPDATE на апдейт;
+        # наполняет ActivityMiddleware (middlewares/activity.py)
+        self.activity = WriteBehindBuffer(
+            db_helper.session_factory,
+            UserActivity,
+            key_columns=("user_id",),
+            interval=settings.write_behind.interval,
+            max_keys=settings.write_behind.max_keys,
+            batch_size=settings.write_behind.batch_size,
+        )
+
+        # Антифлуд: лимиты на пользователя/чат/хендлер (нужен Redis)
+        if self.redis and settings.throttle.enabled:
+            self.limiter = RateLimiter(
+                self.redis,
+                prefix=f"throttle:{self.bot.id}",
+                cache_size=settings.throttle.blocked_cache_size,
+            )
+
+        # Почта: очередь и пул SMTP-соединений (await runtime.mailer.send(...))
+        self.mailer = Mailer(settings.email, self.redis)
+
+        # Админ-статистика: счётчики в Redis, /stats и ночной rollup
+        self.stats = build_recorder(self.redis)
+
+        # Рассылки с лимитами Telegram; прогресс — в Redis
+        if self.redis:
+            self.broadcaster = Broadcaster(
+                bot=self.bot,
+                redis=self.redis,
+                global_rate=settings.broadcast.global_rate,
+                per_chat_rate=settings.broadcast.per_chat_rate,
+                concurrency=settings.broadcast.concurrency,
+                max_retries=settings.broadcast.max_retries,
+                progress_interval=settings.broadcast.progress_interval,
+                lease_ttl=settings.broadcast.lease_ttl,
+                poll_interval=settings.broadcast.poll_interval,
+            )
+
+        # Кэши моделей: Redis-уровень и инвалидация между репликами
+        caches.bind(self.redis)
+        caches.start()
+
+        # Планировщик задач и координация запусков между репликами
+        jobs.bind(self.redis)
         self.scheduler = schedule_tasks(self.bot)
 
         return self
 
     async def close(self):
+        if self.outbox:
+            await self.outbox.stop()
+
+        if self.stats:
+            await self.stats.drain()
+
+        if self.broadcaster:
+            await self.broadcaster.stop()
+
+        if self.dp and isinstance(self.dp.storage, CachedRedisStorage):
+            await self.dp.storage.bus.stop()
+
         if self.scheduler and getattr(self.scheduler, "running", False):
             self.scheduler.shutdown()
 
+        await jobs.stop()
+        await caches.stop()
+
         if self.bot:
             await self.bot.session.close()
 
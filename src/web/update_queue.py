@@ -0,0 +1,191 @@
+import asyncio, time
+from dataclasses import dataclass, field
+from typing import Literal, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from redis.asyncio import Redis
+
+from middlewares.logging_ctx import extract_ctx
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass(slots=True)
+class _Item:
+    update: Update
+    request_id: Optional[str]
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class UpdateQueue:
+    """
+    Ограниченная очередь апдейтов для быстрого ACK вебхука.
+
+    Очередь разбита на шарды по числу воркеров: апдейты одного чата всегда
+    попадают в один шард и обрабатываются строго по порядку, разные чаты
+    обрабатываются параллельно.
+
+    maxsize ограничивает очередь целиком, shard_size — один шард (по
+    умолчанию равен maxsize). Делить maxsize на число воркеров нельзя: тогда
+    один активный чат упирается в maxsize / workers (62 при 1000 и 16), хотя
+    очередь почти пуста.
+
+    Вебхук уже ответил 200, и Telegram апдейт не повторит, поэтому апдейт,
+    на котором упал dp.feed_update, уходит в стрим dead_letter_key (если
+    есть Redis) и в лог целиком — для разбора и ручного повтора.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        dp: Dispatcher,
+        maxsize: int = 1000,
+        workers: int = 16,
+        overflow: Literal["reject", "block"] = "reject",
+        block_timeout: float = 5.0,
+        shard_size: Optional[int] = None,
+        redis: Optional[Redis] = None,
+        dead_letter_key: str = "updates:dead",
+        dead_letter_maxlen: int = 10000,
+    ):
+        self.bot = bot
+        self.dp = dp
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.workers = max(1, workers)
+        self.maxsize = max(1, maxsize)
+        self.redis = redis
+        self.dead_letter_key = dead_letter_key
+        self.dead_letter_maxlen = dead_letter_maxlen
+        # Общая ёмкость: слот занимается в put и освобождается после обработки
+        self._slots: asyncio.Queue[None] = asyncio.Queue(maxsize=self.maxsize)
+        shard_size = min(shard_size or self.maxsize, self.maxsize)
+        self._shards: list[asyncio.Queue[_Item]] = [
+            asyncio.Queue(maxsize=shard_size) for _ in range(self.workers)
+        ]
+        self._tasks: list[asyncio.Task] = []
+
+        # статистика
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.dead_lettered = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @property
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self._shards)
+
+    def _shard(self, update: Update) -> asyncio.Queue[_Item]:
+        ctx = extract_ctx(update)
+        key = ctx["chat_id"] or ctx["user_id"] or update.update_id
+        return self._shards[hash(key) % self.workers]
+
+    async def put(self, update: Update, request_id: Optional[str] = None) -> bool:
+        """Кладёт апдейт в очередь. False — очередь переполнена (отдаём 503)."""
+        shard = self._shard(update)
+        item = _Item(update=update, request_id=request_id)
+        try:
+            if self.overflow == "block":
+                await asyncio.wait_for(self._put(shard, item), self.block_timeout)
+            else:
+                self._slots.put_nowait(None)
+                try:
+                    shard.put_nowait(item)
+                except asyncio.QueueFull:
+                    self._slots.get_nowait()
+                    raise
+        except (asyncio.QueueFull, asyncio.TimeoutError):
+            self.rejected += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    async def _put(self, shard: asyncio.Queue[_Item], item: _Item) -> None:
+        await self._slots.put(None)
+        try:
+            await shard.put(item)
+        except BaseException:
+            self._slots.get_nowait()
+            raise
+
+    def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(self._worker(q), name=f"update-worker-{i}")
+            for i, q in enumerate(self._shards)
+        ]
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        # Дожидаемся обработки того, что уже принято, потом гасим воркеры
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(q.join() for q in self._shards)), timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("update_queue_drain_timeout", left=self.depth)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, queue: asyncio.Queue[_Item]) -> None:
+        while True:
+            item = await queue.get()
+            wait = time.perf_counter() - item.enqueued_at
+            self.wait_total += wait
+            if wait > self.wait_max:
+                self.wait_max = wait
+            try:
+                await self.dp.feed_update(
+                    bot=self.bot,
+                    update=item.update,
+                    request_id=item.request_id,
+                )
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                await self._dead_letter(item, e)
+            finally:
+                self._slots.get_nowait()
+                queue.task_done()
+
+    async def _dead_letter(self, item: _Item, error: Exception) -> None:
+        body = item.update.model_dump_json(exclude_unset=True)
+        logger.exception(
+            "update_queue_handler_failed",
+            update_id=item.update.update_id,
+            update=body,
+        )
+        if self.redis is None:
+            return
+        try:
+            await self.redis.xadd(
+                self.dead_letter_key,
+                {
+                    "body": body,
+                    "rid": item.request_id or "",
+                    "error": repr(error)[:1000],
+                },
+                maxlen=self.dead_letter_maxlen,
+                approximate=True,
+            )
+            self.dead_lettered += 1
+        except Exception:
+            logger.warning("update_queue_dead_letter_failed", exc_info=True)
+
+    def stats(self) -> dict:
+        done = self.processed + self.failed
+        return {
+            "depth": self.depth,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dead_lettered": self.dead_lettered,
+            "rejected": self.rejected,
+            "wait_avg_ms": round(self.wait_total / done * 1000, 2) if done else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 2),
+        }
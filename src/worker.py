@@ -0,0 +1,68 @@
+"""
+Роль-воркер для режима ingest=stream: обрабатывает апдейты из Redis Streams,
+которые складывает веб-роль. HTTP-приложения здесь нет — только Runtime.
+
+Запуск: python worker.py (из src), процессов — сколько нужно; партиции
+стримов распределяются между ними автоматически.
+"""
+
+import asyncio, signal
+
+from core.config import settings
+from core.storage.db_helper import db_helper, test_connection
+from middlewares import setup_middlewares
+from services.update_stream import UpdateStreamConsumer
+from utils.logger import setup_logging
+from utils.loop_monitor import loop_monitor
+from web.runtime import runtime
+
+logger = setup_logging(__name__, production=settings.log.production)
+
+
+async def _ping_db() -> None:
+    async with db_helper.session_factory() as s:
+        await test_connection(s)
+
+
+async def main() -> None:
+    monitor = settings.monitor
+    loop_monitor.start(
+        interval=monitor.loop_interval,
+        slow_callback=monitor.slow_callback,
+        window=monitor.lag_window,
+    )
+    await runtime.build()
+    await asyncio.gather(runtime.redis.ping(), _ping_db())
+    db_middleware = setup_middlewares(
+        runtime.dp,
+        db_helper.session_factory,
+        runtime.stats,
+        runtime.limiter,
+        runtime.activity,
+    )
+    runtime.activity.start()
+    runtime.mailer.start()
+
+    consumer = UpdateStreamConsumer(
+        runtime.bot, runtime.dp, runtime.redis, settings.ingest
+    )
+    consumer.start()
+    logger.info("worker_started", consumer=consumer.consumer)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    # Текущие апдейты дообрабатываются, партиции отдаются другим воркерам
+    await consumer.stop()
+    await runtime.activity.stop()
+    await runtime.mailer.stop()
+    logger.info("db_session_usage", **db_middleware.stats.snapshot())
+    await runtime.close()
+    await loop_monitor.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())